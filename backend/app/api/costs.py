@@ -1,7 +1,16 @@
 from fastapi import APIRouter, HTTPException, Depends
 from pydantic import BaseModel
-from typing import List, Dict, Any, Optional
-from app.api.settings import get_settings, Settings, VehicleType
+from typing import List, Dict, Any, Optional, Tuple
+from app.api.settings import get_settings, get_pricing_tables, get_settings_version, Settings, VehicleType
+from app.api.planning import load_planning_frame, load_planning_state
+from app.core.metrics import count_rows, stage
+from app.core.responses import fast_result
+from app.services import planning_store
+from app.services.compute_pool import compute_pool
+from app.services.planning_aggregates import PlanningAggregates, sort_by_employee
+from app.services.planning_schema import COVERAGE_ATTR, ZONE_COLUMN, planning_fingerprint
+from app.services.result_cache import result_cache
+import numpy as np
 import pandas as pd
 import math
 
@@ -40,94 +49,143 @@ class CostBreakdown(BaseModel):
     details_option_2: List[Dict[str, Any]]
 
 class CalculationRequest(BaseModel):
-    planning_data: List[Dict[str, Any]]
+    planning_data: Optional[List[Dict[str, Any]]] = None
+    planning_id: Optional[str] = None # Stored planning returned by /planning/upload
     override_coverage: Optional[str] = None # "ALLER", "ALLER_RETOUR"
 
 @router.post("/calculate", response_model=CostBreakdown)
 async def calculate_costs(request: CalculationRequest, settings: Settings = Depends(get_settings)):
-    planning_data = request.planning_data
-    if not planning_data:
-        raise HTTPException(status_code=400, detail="Planning data is required")
+    return await compute_pool.run(fast_result, calculate, request, settings)
 
-    df = pd.DataFrame(planning_data)
-    n_lines = len(df)
-    
+def calculate(request: CalculationRequest, settings: Settings) -> CostBreakdown:
+    if request.planning_id:
+        return compute_stored_costs(request.planning_id, settings, request.override_coverage)
+    df = load_planning_frame(request.planning_id, request.planning_data)
+    return compute_costs(df, settings, request.override_coverage)
+
+class CostInputs:
+    # Per-planning intermediates shared by the cost breakdown and the
+    # dashboard views (zones, summary), computed once per request
+    def __init__(self, df: pd.DataFrame, settings: Settings):
+        # Prices come from the tables compiled with the settings (see pricing)
+        pricing = get_pricing_tables(settings)
+        self.n_lines = n_lines = len(df)
+        self.employees = df["Employee ID"] if "Employee ID" in df.columns else pd.Series("Inconnu", index=df.index, name="Employee ID")
+        self.lines = df["Ligne_Bus_Option_2"] if "Ligne_Bus_Option_2" in df.columns else pd.Series("Ligne Indéfinie", index=df.index, name="Ligne_Bus_Option_2")
+
+        # Option 1 : max zone per employee -> forfait
+        with stage("costs.zones"):
+            self.employee_zones = sort_by_employee(df[ZONE_COLUMN].groupby(self.employees, observed=True).max().reset_index())
+            self.employee_zones["cost"] = pricing.forfait_costs(self.employee_zones[ZONE_COLUMN])
+
+        # Option 2 : price per pickup
+        with stage("costs.pickups"):
+            self.pickup_cost = pricing.pickup_costs(self.lines) if n_lines else np.empty(0)
+        self.pickup_total = self.pickup_cost.sum()
+        self.nb_jours_observes = df["Date"].nunique() if "Date" in df.columns else 1
+        self.coverage_direction = df.attrs.get(COVERAGE_ATTR, "ALLER_RETOUR")
+
+    def line_counts(self) -> Dict[Any, int]:
+        # Pickups per option 2 line (missing lines pay the default price)
+        return self.lines.value_counts(dropna=False, sort=False).to_dict()
+
+    def pickup_details(self, rows: slice) -> pd.DataFrame:
+        return pd.DataFrame({
+            "Employee ID": self.employees.iloc[rows].to_numpy(),
+            "Ligne_Bus_Option_2": self.lines.iloc[rows].to_numpy(),
+            "pickup_cost": self.pickup_cost[rows]
+        })
+
+class StoredCostInputs:
+    # Same intermediates for a stored planning, from the row counts kept up
+    # to date by its patches (see planning_aggregates): no row is read but
+    # the few detail rows
+    def __init__(self, planning_id: str, meta: Dict[str, Any], aggregates: PlanningAggregates, settings: Settings):
+        self.planning_id = planning_id
+        self.pricing = pricing = get_pricing_tables(settings)
+        self.lines = aggregates.lines
+        self.n_lines = aggregates.n_rows
+        with stage("costs.zones"):
+            self.employee_zones = aggregates.employee_max_zones()
+            self.employee_zones["cost"] = pricing.forfait_costs(self.employee_zones[ZONE_COLUMN])
+        with stage("costs.pickups"):
+            self.pickup_total = sum(count * pricing.pickup_price(line) for line, count in aggregates.lines.items())
+        self.nb_jours_observes = aggregates.observed_days if aggregates.dates else 1
+        self.coverage_direction = meta.get(COVERAGE_ATTR) or aggregates.coverage_direction
+
+    def line_counts(self) -> Dict[Any, int]:
+        return dict(self.lines)
+
+    def pickup_details(self, rows: slice) -> pd.DataFrame:
+        page, _ = planning_store.query_planning(self.planning_id, ["Employee ID", "Ligne_Bus_Option_2"], limit=rows.stop)
+        return pd.DataFrame({
+            "Employee ID": page["Employee ID"].to_numpy(),
+            "Ligne_Bus_Option_2": page["Ligne_Bus_Option_2"].to_numpy(),
+            "pickup_cost": self.pricing.pickup_costs(page["Ligne_Bus_Option_2"]) if len(page) else np.empty(0)
+        })
+
+def compute_costs(df: pd.DataFrame, settings: Settings, override_coverage: Optional[str] = None,
+                  details_limit: Optional[int] = 50, inputs: Optional[CostInputs] = None) -> CostBreakdown:
+    # Same planning content + settings version + parameters -> cached breakdown
+    key = ("costs", planning_fingerprint(df), get_settings_version(settings), override_coverage, details_limit)
+    return result_cache.get_or_compute(key, lambda: _compute_costs(inputs or CostInputs(df, settings), settings,
+                                                                   override_coverage, details_limit))
+
+def compute_stored_costs(planning_id: str, settings: Settings, override_coverage: Optional[str] = None,
+                         details_limit: Optional[int] = 50, inputs: Optional[StoredCostInputs] = None) -> CostBreakdown:
+    # Stored planning: same cache entry as compute_costs for the same content
+    meta, aggregates = load_planning_state(planning_id)
+    key = ("costs", aggregates.fingerprint, get_settings_version(settings), override_coverage, details_limit)
+    return result_cache.get_or_compute(key, lambda: _compute_costs(inputs or StoredCostInputs(planning_id, meta, aggregates, settings),
+                                                                   settings, override_coverage, details_limit))
+
+def check_cost_volume(n_lines: int):
     if n_lines < 5:
         raise HTTPException(
             status_code=400, 
             detail=f"Audit invalidé : Volume insuffisant ({n_lines}/5). Un minimum de 5 lignes est requis pour l'analyse."
         )
 
-    # Pre-processing Zone
-    def parse_zone(val):
-        try: return int(val)
-        except:
-            s = str(val).upper()
-            import re
-            digits = re.findall(r'\d+', s)
-            if digits: return int(digits[0])
-            if 'A' in s: return 1
-            if 'B' in s: return 2
-            if 'C' in s: return 3
-            return 1
-
-    df["Zone_Int"] = df["Zone"].apply(parse_zone) if "Zone" in df.columns else 1
-    if "Employee ID" not in df.columns: df["Employee ID"] = "Inconnu"
-    if "Ligne_Bus_Option_2" not in df.columns: df["Ligne_Bus_Option_2"] = "Ligne Indéfinie"
-    if "Time" not in df.columns: df["Time"] = "00:00"
-
+def contract_terms(inputs, override_coverage: Optional[str]) -> Tuple[str, bool, float]:
+    # (coverage, can_recommend, factor bringing the observed option 2 cost
+    # to a contractual month) of a planning
     # Périmètre & Directions (Auto-détection ou Manuel)
-    nb_jours_observes = df["Date"].nunique() if "Date" in df.columns else 1
-    nb_jours_ref = 22 
-    
-    if request.override_coverage:
-        coverage_direction = request.override_coverage
+    nb_jours_observes = inputs.nb_jours_observes
+    nb_jours_ref = 22
+
+    if override_coverage:
+        coverage_direction = override_coverage
         facteur_direction = 2 if coverage_direction == "ALLER" else 1
     else:
-        try:
-            hours = pd.to_datetime(df["Time"], format='%H:%M').dt.hour
-            has_morning = any(hours < 12)
-            has_evening = any(hours >= 12)
-            if has_morning and has_evening: 
-                coverage_direction = "ALLER_RETOUR"
-                facteur_direction = 1
-            elif has_morning: 
-                coverage_direction = "ALLER"
-                facteur_direction = 2
-            elif has_evening: 
-                coverage_direction = "RETOUR"
-                facteur_direction = 2
-            else: 
-                coverage_direction = "ALLER_RETOUR"
-                facteur_direction = 1
-        except:
-            coverage_direction = "ALLER_RETOUR"
-            facteur_direction = 1
+        coverage_direction = inputs.coverage_direction
+        facteur_direction = 1 if coverage_direction == "ALLER_RETOUR" else 2
 
     # RÈGLE D'OR : Comparaison engageante uniquement sur périmètre complet
     can_recommend = (nb_jours_observes >= nb_jours_ref and coverage_direction == "ALLER_RETOUR")
+    if can_recommend:
+        return coverage_direction, can_recommend, 1.0
+    # Extrapolation estimative
+    return coverage_direction, can_recommend, nb_jours_ref / nb_jours_observes * facteur_direction
+
+def _compute_costs(inputs, settings: Settings, override_coverage: Optional[str],
+                   details_limit: Optional[int]) -> CostBreakdown:
+    n_lines = inputs.n_lines
+    check_cost_volume(n_lines)
+    count_rows("costs", n_lines)
+
+    # inputs: CostInputs (planning rows) or StoredCostInputs (maintained counts)
+
+    nb_jours_observes = inputs.nb_jours_observes
+    coverage_direction, can_recommend, option_2_factor = contract_terms(inputs, override_coverage)
     is_extrapolated = not can_recommend
 
     # Option 1 : Toujours contractuel mensuel (Forfait)
-    employee_zones = df.groupby("Employee ID")["Zone_Int"].max().reset_index()
-    def map_forfait(z):
-        return settings.option_1_forfait_prices.get(z, settings.option_1_forfait_prices[1])
-    employee_zones["cost"] = employee_zones["Zone_Int"].apply(map_forfait)
+    employee_zones = inputs.employee_zones
     op1_total = employee_zones["cost"].sum()
 
-    # Option 2 : Coût à la prise en charge
-    def map_pickup(line):
-        return settings.option_2_line_prices.get(line, settings.option_2_default_pickup_price)
-    
-    df["pickup_cost"] = df["Ligne_Bus_Option_2"].apply(map_pickup)
-    op2_brut = df["pickup_cost"].sum()
-    
-    # Extrapolation estimative
-    if is_extrapolated:
-        extrapol_factor_jours = nb_jours_ref / nb_jours_observes
-        op2_contractual = op2_brut * extrapol_factor_jours * facteur_direction
-    else:
-        op2_contractual = op2_brut
+    # Option 2 : Coût à la prise en charge (extrapolation estimative si partiel)
+    op2_brut = inputs.pickup_total
+    op2_contractual = op2_brut * option_2_factor
 
     n_employees = employee_zones["Employee ID"].nunique()
     savings = abs(op2_contractual - op1_total)
@@ -153,6 +211,12 @@ async def calculate_costs(request: CalculationRequest, settings: Settings = Depe
         total_vehicles=n_lines
     )
 
+    # Details are truncated for the UI unless details_limit is None (exports)
+    rows = slice(None) if details_limit is None else slice(0, details_limit)
+    with stage("costs.details"):
+        details_1 = employee_zones.iloc[rows].to_dict(orient="records")
+        details_2 = inputs.pickup_details(rows).to_dict(orient="records")
+
     return CostBreakdown(
         option_1_contractual_total=op1_total,
         option_2_contractual_total=op2_contractual,
@@ -168,6 +232,6 @@ async def calculate_costs(request: CalculationRequest, settings: Settings = Depe
         avg_cost_per_pickup=avg_pickup,
         kpi_option_1=op1_kpi,
         kpi_option_2=op2_kpi,
-        details_option_1=employee_zones.head(50).to_dict(orient="records"),
-        details_option_2=df[["Employee ID", "Ligne_Bus_Option_2", "pickup_cost"]].head(50).to_dict(orient="records")
+        details_option_1=details_1,
+        details_option_2=details_2
     )
@@ -1,15 +1,23 @@
-from fastapi import APIRouter, HTTPException, Depends
-from fastapi.responses import StreamingResponse
+from fastapi import APIRouter, HTTPException, Depends, Body
+from fastapi.responses import FileResponse, StreamingResponse
 from pydantic import BaseModel
-from typing import List, Dict, Any
-from app.api.settings import get_settings, Settings
-from app.api.costs import calculate_costs
+from typing import List, Dict, Any, Iterator, Optional, Tuple
+from app.api.settings import get_settings, get_settings_version, Settings
+from app.api.planning import load_planning_frame, load_planning_state
+from app.api.costs import CostBreakdown, CostInputs, StoredCostInputs, compute_costs, compute_stored_costs
+from app.api.optimization import (OptimizationResult, Simulation, check_simulation_volume, run_optimization,
+                                  run_stored_optimization)
+from app.core.metrics import count_rows, stage
+from app.core.responses import fast_result
+from app.services.compute_pool import compute_pool
+from app.services.jobs import JobError, QueueFullError
+from app.services.pdf_reports import pdf_reports, write_pdf_report
+from app.services.planning_schema import ZONE_COLUMN, planning_fingerprint
+from app.services.report_export import EXPORT_CHUNK_ROWS, frame_chunks, iter_csv, iter_file, xlsx_tempfile
+from app.services.result_cache import result_cache
+import asyncio
 import pandas as pd
-import io
-from reportlab.lib import colors
-from reportlab.lib.pagesizes import letter
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-from reportlab.lib.styles import getSampleStyleSheet
+from concurrent.futures import BrokenExecutor
 
 router = APIRouter(prefix="/dashboard", tags=["Dashboard"])
 
@@ -28,140 +36,267 @@ class ZoneAnalysis(BaseModel):
     zone_2_cost: float
     zone_3_cost: float
 
+class DashboardSummaryRequest(BaseModel):
+    planning_data: Optional[List[Dict[str, Any]]] = None
+    planning_id: Optional[str] = None # Stored planning returned by /planning/upload
+    window_minutes: Optional[int] = None
+    override_coverage: Optional[str] = None # "ALLER", "ALLER_RETOUR"
+
+class DashboardSummary(BaseModel):
+    kpi: KPIResult
+    zones: ZoneAnalysis
+    costs: CostBreakdown
+    optimization: OptimizationResult
+
+def build_kpis(results: CostBreakdown, optimization: OptimizationResult) -> KPIResult:
+    # Vehicles and occupancy come from the grouping simulation (1 vehicle per group)
+    return KPIResult(
+        total_cost=results.option_1_contractual_total,
+        total_savings=results.savings,
+        avg_occupancy=round(optimization.avg_occupancy_rate, 1),
+        total_employees=results.n_employees,
+        total_vehicles=optimization.total_vehicles
+    )
+
+def build_zone_analysis(employee_zones: pd.DataFrame) -> ZoneAnalysis:
+    # Option 1 (forfait) is attributed to the max zone of each employee:
+    # count employees and sum their forfait per zone
+    per_zone = employee_zones.groupby(ZONE_COLUMN)["cost"].agg(["count", "sum"])
+
+    def zone_count(zone):
+        return int(per_zone.loc[zone, "count"]) if zone in per_zone.index else 0
+
+    def zone_cost(zone):
+        return float(per_zone.loc[zone, "sum"]) if zone in per_zone.index else 0.0
+
+    return ZoneAnalysis(
+        zone_1_count=zone_count(1),
+        zone_2_count=zone_count(2),
+        zone_3_count=zone_count(3),
+        zone_1_cost=zone_cost(1),
+        zone_2_cost=zone_cost(2),
+        zone_3_cost=zone_cost(3)
+    )
+
 @router.post("/kpi", response_model=KPIResult)
-async def get_kpis(planning_data: List[Dict[str, Any]], settings: Settings = Depends(get_settings)):
-    if not planning_data:
+async def get_kpis(planning_data: Optional[List[Dict[str, Any]]] = Body(None), planning_id: Optional[str] = None,
+                   settings: Settings = Depends(get_settings)):
+    if not planning_data and not planning_id:
         return KPIResult(total_cost=0, total_savings=0, avg_occupancy=0, total_employees=0, total_vehicles=0)
     
-    # Re-use cost calculation logic
+    # Re-use cost calculation and optimization logic
     try:
-        results = await calculate_costs(planning_data, settings)
-        
-        # Calculate avg occupancy from details if possible, or approximate
-        # For this MVP, we will use the Option 1 occupancy data if available or recalculate
-        
-        # Simple aggregated stats from the cost breakdown
-        # Note: 'total_vehicles' is sum of vehicles in Option 1
-        
-        total_vehicles = sum(1 for _ in results.details_option_1) # 1 vehicle per group
-        total_employees = len(planning_data)
-        
-        # Avg occupancy... we need the capacity of each vehicle used.
-        # In details_option_1 we have 'count'. We don't have capacity explicitly there but can infer or re-compute.
-        # Let's simple approximate: sum(count) / sum(capacity_used). 
-        # Since we don't carry capacity in details_option_1 easily, let's skip strict occupancy here 
-        # OR better: Assume Berline=4, Hiace=13 based on count
-        
-        capacity_sum = 0
-        for item in results.details_option_1:
-            cnt = item['count']
-            if cnt <= 4: capacity_sum += 4 
-            else: capacity_sum += 13 # Simplified
-            
-        avg_occ = (total_employees / capacity_sum * 100) if capacity_sum > 0 else 0
-        
-        return KPIResult(
-            total_cost=results.option_1_total,
-            total_savings=results.savings,
-            avg_occupancy=round(avg_occ, 1),
-            total_employees=total_employees,
-            total_vehicles=total_vehicles
-        )
+        return await compute_pool.run(compute_kpis, planning_id, planning_data, settings)
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Error calculating KPIs: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+def compute_kpis(planning_id: Optional[str], planning_data: Optional[List[Dict[str, Any]]], settings: Settings) -> KPIResult:
+    if planning_id:
+        return build_kpis(compute_stored_costs(planning_id, settings), run_stored_optimization(planning_id, settings))
+    df = load_planning_frame(planning_id, planning_data)
+    return build_kpis(compute_costs(df, settings), run_optimization(df, settings))
+
 @router.post("/zones", response_model=ZoneAnalysis)
-async def get_zone_analysis(planning_data: List[Dict[str, Any]], settings: Settings = Depends(get_settings)):
-    if not planning_data:
+async def get_zone_analysis(planning_data: Optional[List[Dict[str, Any]]] = Body(None), planning_id: Optional[str] = None,
+                            settings: Settings = Depends(get_settings)):
+    if not planning_data and not planning_id:
         return ZoneAnalysis(zone_1_count=0, zone_2_count=0, zone_3_count=0, zone_1_cost=0, zone_2_cost=0, zone_3_cost=0)
 
-    df = pd.DataFrame(planning_data)
-    
-    # Count per zone
-    z1 = df[df['Zone'] == 1]
-    z2 = df[df['Zone'] == 2]
-    z3 = df[df['Zone'] == 3]
-    
-    # Cost per zone (Option 2 approximation for per-person cost, or derived form Op 1)
-    # The requirement is "Cost Analysis by Zone". 
-    # Let's assume Option 1 (Vehicle) cost allocated to zone.
-    # Actually, vehicles are mixed. A vehicle going to Zone 3 carries people from Zone 1 too potentially?
-    # No, Zone is usually a destination or max distance.
-    # Let's stick to the simpler metric: Option 2 (Per pickup) is easiest to attribute to zone.
-    # OR: Option 1 cost grouped by "max_zone" of the vehicle.
-    
-    # We will compute Option 1 breakdown by max_zone
-    results = await calculate_costs(planning_data, settings)
-    
-    z1_cost = sum(item['cost'] for item in results.details_option_1 if item['max_zone'] == 1)
-    z2_cost = sum(item['cost'] for item in results.details_option_1 if item['max_zone'] == 2)
-    z3_cost = sum(item['cost'] for item in results.details_option_1 if item['max_zone'] == 3)
+    return await compute_pool.run(compute_zone_analysis, planning_id, planning_data, settings)
 
-    return ZoneAnalysis(
-        zone_1_count=len(z1),
-        zone_2_count=len(z2),
-        zone_3_count=len(z3),
-        zone_1_cost=z1_cost,
-        zone_2_cost=z2_cost,
-        zone_3_cost=z3_cost
+def compute_zone_analysis(planning_id: Optional[str], planning_data: Optional[List[Dict[str, Any]]], settings: Settings) -> ZoneAnalysis:
+    if planning_id:
+        meta, aggregates = load_planning_state(planning_id)
+        return build_zone_analysis(StoredCostInputs(planning_id, meta, aggregates, settings).employee_zones)
+    df = load_planning_frame(planning_id, planning_data)
+    return build_zone_analysis(CostInputs(df, settings).employee_zones)
+
+@router.post("/summary", response_model=DashboardSummary)
+async def get_dashboard_summary(request: DashboardSummaryRequest, settings: Settings = Depends(get_settings)):
+    return await compute_pool.run(fast_result, summarize, request, settings)
+
+def summarize(request: DashboardSummaryRequest, settings: Settings) -> DashboardSummary:
+    # Everything the dashboard shows, from a single load of the planning
+    if request.planning_id:
+        return compute_stored_dashboard_summary(request.planning_id, settings, request.window_minutes,
+                                                request.override_coverage)
+    df = load_planning_frame(request.planning_id, request.planning_data)
+    return compute_dashboard_summary(df, settings, request.window_minutes, request.override_coverage)
+
+def compute_dashboard_summary(df: pd.DataFrame, settings: Settings, window_minutes: Optional[int] = None,
+                              override_coverage: Optional[str] = None) -> DashboardSummary:
+    key = ("dashboard_summary", planning_fingerprint(df), get_settings_version(settings), window_minutes, override_coverage)
+    return result_cache.get_or_compute(key, lambda: _compute_dashboard_summary(df, settings, window_minutes, override_coverage))
+
+def _compute_dashboard_summary(df: pd.DataFrame, settings: Settings, window_minutes: Optional[int],
+                               override_coverage: Optional[str]) -> DashboardSummary:
+    # employee_zones / pickup costs are shared by the cost breakdown and the
+    # zone view; the grouping result feeds both the KPIs and the optimization block
+    count_rows("dashboard", len(df))
+    inputs = CostInputs(df, settings)
+    results = compute_costs(df, settings, override_coverage, inputs=inputs)
+    optimization = run_optimization(df, settings, window_minutes, override_coverage)
+    return DashboardSummary(
+        kpi=build_kpis(results, optimization),
+        zones=build_zone_analysis(inputs.employee_zones),
+        costs=results,
+        optimization=optimization
     )
 
+def compute_stored_dashboard_summary(planning_id: str, settings: Settings, window_minutes: Optional[int] = None,
+                                     override_coverage: Optional[str] = None) -> DashboardSummary:
+    # Stored planning: built from its maintained row counts (see planning_aggregates)
+    meta, aggregates = load_planning_state(planning_id)
+    key = ("dashboard_summary", aggregates.fingerprint, get_settings_version(settings), window_minutes, override_coverage)
+
+    def compute() -> DashboardSummary:
+        inputs = StoredCostInputs(planning_id, meta, aggregates, settings)
+        results = compute_stored_costs(planning_id, settings, override_coverage, inputs=inputs)
+        optimization = run_stored_optimization(planning_id, settings, window_minutes, override_coverage)
+        return DashboardSummary(
+            kpi=build_kpis(results, optimization),
+            zones=build_zone_analysis(inputs.employee_zones),
+            costs=results,
+            optimization=optimization
+        )
+    return result_cache.get_or_compute(key, compute)
+
+class ReportData:
+    # Full-fidelity report content: every option 1 / option 2 detail row and
+    # every optimization group, produced in chunks (see report_export)
+    def __init__(self, df: pd.DataFrame, settings: Settings):
+        count_rows("export", len(df))
+        self.inputs = CostInputs(df, settings)
+        self.results = compute_costs(df, settings, inputs=self.inputs)
+        self.simulation = Simulation(df, settings)
+
+    def summary_chunks(self) -> Iterator[pd.DataFrame]:
+        results = self.results
+        yield pd.DataFrame([{'Option': 'Vehicle Forfait (Op 1)', 'Total Cost': results.option_1_contractual_total},
+                            {'Option': 'Per Pickup (Op 2)', 'Total Cost': results.option_2_contractual_total},
+                            {'Option': 'Savings', 'Total Cost': results.savings}])
+
+    def option_1_chunks(self) -> Iterator[pd.DataFrame]:
+        return frame_chunks(self.inputs.employee_zones)
+
+    def option_2_chunks(self) -> Iterator[pd.DataFrame]:
+        inputs = self.inputs
+        for start in range(0, len(inputs.lines), EXPORT_CHUNK_ROWS):
+            rows = slice(start, start + EXPORT_CHUNK_ROWS)
+            yield pd.DataFrame({
+                "Employee ID": inputs.employees.iloc[rows].to_numpy(),
+                "Ligne_Bus_Option_2": inputs.lines.iloc[rows].to_numpy(),
+                "pickup_cost": inputs.pickup_cost[rows]
+            })
+
+    def group_chunks(self) -> Iterator[pd.DataFrame]:
+        for start in range(0, len(self.simulation.grouping), EXPORT_CHUNK_ROWS):
+            groups = pd.DataFrame(self.simulation.group_records(start, EXPORT_CHUNK_ROWS))
+            groups["employees"] = groups["employees"].map(lambda ids: ", ".join(map(str, ids)))
+            yield groups
+
+    def tables(self) -> Dict[str, Iterator[pd.DataFrame]]:
+        return {
+            "summary": self.summary_chunks(),
+            "option_1": self.option_1_chunks(),
+            "option_2": self.option_2_chunks(),
+            "groups": self.group_chunks()
+        }
+
+# Sheet names of the Excel export, in order
+EXCEL_SHEETS = {"summary": "Summary", "option_1": "Details Op1", "option_2": "Details Op2", "groups": "Groups"}
+
 @router.post("/export/{format}")
-async def export_report(format: str, planning_data: List[Dict[str, Any]], settings: Settings = Depends(get_settings)):
-    if not planning_data:
+async def export_report(format: str, planning_data: Optional[List[Dict[str, Any]]] = Body(None), planning_id: Optional[str] = None,
+                        table: str = "option_1", settings: Settings = Depends(get_settings)):
+    if not planning_data and not planning_id:
         raise HTTPException(status_code=400, detail="No data to export")
-        
-    results = await calculate_costs(planning_data, settings)
+    if format not in ("excel", "csv", "pdf"):
+        raise HTTPException(status_code=400, detail="Unsupported format")
+    if format == "csv" and table not in EXCEL_SHEETS:
+        raise HTTPException(status_code=400, detail=f"Unknown table: {table} ({', '.join(EXCEL_SHEETS)})")
+
+    if format == "csv":
+        # Costs and grouping are computed on the compute pool; rows are then
+        # formatted and sent chunk by chunk while the client downloads
+        data = await compute_pool.run(load_report_data, planning_id, planning_data, settings)
+        return StreamingResponse(iter_csv(data.tables()[table]), media_type="text/csv; charset=utf-8",
+                                 headers={"Content-Disposition": f"attachment; filename=report_{table}.csv"})
+
+    if format == "pdf":
+        return await export_pdf(planning_id, planning_data, settings)
+
+    # Excel rendering is blocking: done on the compute pool
+    return await compute_pool.run(build_report, format, planning_id, planning_data, settings)
+
+async def export_pdf(planning_id: Optional[str], planning_data: Optional[List[Dict[str, Any]]],
+                     settings: Settings) -> FileResponse:
+    # Served from the report cache; otherwise rendered on the job process pool
+    # (off the API worker) and awaited, concurrent requests sharing one render
+    fingerprint, n_rows = await compute_pool.run(planning_identity, planning_id, planning_data)
+    check_simulation_volume(n_rows)
+    key = f"{fingerprint}_{get_settings_version(settings)}"
+    path = pdf_reports.cached(key)
+    if path is None:
+        try:
+            job = pdf_reports.render(key, pdf_report_job, planning_id, planning_data, settings.dict())
+        except QueueFullError as e:
+            raise HTTPException(status_code=429, detail=f"File de simulations pleine : {e}")
+        try:
+            with stage("export.pdf"):
+                await asyncio.wrap_future(job.future)
+        except (JobError, BrokenExecutor):
+            # Failed render (the job's error) or worker process died
+            raise HTTPException(status_code=500, detail=f"Erreur de génération du rapport : {job.error()}")
+        except asyncio.CancelledError:
+            if not job.future.cancelled():
+                raise # this request was cancelled, not the render
+            raise HTTPException(status_code=500, detail="Erreur de génération du rapport : rendu annulé")
+        if job.status != "completed":
+            # Cancelled while running: its result is discarded
+            raise HTTPException(status_code=500, detail="Erreur de génération du rapport : rendu annulé")
+        path = job.result()
+    return FileResponse(path, media_type='application/pdf', filename="report.pdf")
+
+def planning_identity(planning_id: Optional[str], planning_data: Optional[List[Dict[str, Any]]]) -> Tuple[str, int]:
+    # Fingerprint and row count of the planning: a stored one is not read
+    # (meta and aggregates), its rows are only loaded by the render job
+    if planning_id:
+        _, aggregates = load_planning_state(planning_id)
+        return aggregates.fingerprint, aggregates.n_rows
+    df = load_planning_frame(None, planning_data)
+    return planning_fingerprint(df), len(df)
+
+def pdf_report_job(planning_id: Optional[str], planning_data: Optional[List[Dict[str, Any]]],
+                   settings_data: Dict[str, Any], path: str) -> str:
+    # Runs inside a worker process (see app.services.jobs)
+    data = load_report_data(planning_id, planning_data, Settings(**settings_data))
+    results = data.results
+    write_pdf_report(path, [
+        f"Total Cost (Option 1): {results.option_1_contractual_total:,.0f} FCFA",
+        f"Total Cost (Option 2): {results.option_2_contractual_total:,.0f} FCFA",
+        f"Potential Savings: {results.savings:,.0f} FCFA"
+    ], data.group_chunks())
+    return path
+
+def load_report_data(planning_id: Optional[str], planning_data: Optional[List[Dict[str, Any]]],
+                     settings: Settings) -> ReportData:
+    return ReportData(load_planning_frame(planning_id, planning_data), settings)
+
+def build_report(format: str, planning_id: Optional[str], planning_data: Optional[List[Dict[str, Any]]],
+                 settings: Settings) -> StreamingResponse:
+    df = load_planning_frame(planning_id, planning_data)
     
     if format == "excel":
-        # Create Excel
-        output = io.BytesIO()
-        with pd.ExcelWriter(output, engine='openpyxl') as writer:
-            # Sheet 1: Summary
-            summary_data = [{'Option': 'Vehicle Forfait (Op 1)', 'Total Cost': results.option_1_total},
-                            {'Option': 'Per Pickup (Op 2)', 'Total Cost': results.option_2_total},
-                            {'Option': 'Savings', 'Total Cost': results.savings}]
-            pd.DataFrame(summary_data).to_excel(writer, sheet_name='Summary', index=False)
-            
-            # Sheet 2: Detailed Plan (Option 1)
-            pd.DataFrame(results.details_option_1).to_excel(writer, sheet_name='Details Op1', index=False)
-            
-        output.seek(0)
-        return StreamingResponse(output, media_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', headers={"Content-Disposition": "attachment; filename=report.xlsx"})
-        
-    elif format == "pdf":
-        output = io.BytesIO()
-        doc = SimpleDocTemplate(output, pagesize=letter)
-        elements = []
-        styles = getSampleStyleSheet()
-        
-        elements.append(Paragraph("Transport Optimization Report", styles['Title']))
-        elements.append(Spacer(1, 12))
+        # Streamed write-only workbook in a temporary file, removed once sent
+        data = ReportData(df, settings)
+        tables = data.tables()
+        with stage("export.xlsx"):
+            path = xlsx_tempfile([(sheet, tables[key]) for key, sheet in EXCEL_SHEETS.items()])
+        return StreamingResponse(iter_file(path, remove=True), media_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', headers={"Content-Disposition": "attachment; filename=report.xlsx"})
         
-        elements.append(Paragraph(f"Total Cost (Option 1): {results.option_1_total:,.0f} FCFA", styles['Normal']))
-        elements.append(Paragraph(f"Total Cost (Option 2): {results.option_2_total:,.0f} FCFA", styles['Normal']))
-        elements.append(Paragraph(f"Potential Savings: {results.savings:,.0f} FCFA", styles['Normal']))
-        elements.append(Spacer(1, 24))
-        
-        # Table of Details
-        data = [['Date', 'Time', 'Count', 'Zone', 'Cost']]
-        for cx in results.details_option_1[:20]: # Limit to 20 for PDF preview
-            data.append([str(cx['date']), str(cx['time']), str(cx['count']), str(cx['max_zone']), str(cx['cost'])])
-            
-        t = Table(data)
-        t.setStyle(TableStyle([('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-                               ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-                               ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-                               ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                               ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-                               ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-                               ('GRID', (0, 0), (-1, -1), 1, colors.black)]))
-        elements.append(t)
-        
-        doc.build(elements)
-        output.seek(0)
-        return StreamingResponse(output, media_type='application/pdf', headers={"Content-Disposition": "attachment; filename=report.pdf"})
-    
     else:
         raise HTTPException(status_code=400, detail="Unsupported format")
@@ -1,17 +1,13 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Query
 from pydantic import BaseModel
-from typing import List, Dict, Any, Optional
-import json
-import os
-from datetime import datetime
+from typing import List, Dict, Any, Literal, Optional
+import uuid
+from datetime import date, datetime
 from app.api.auth import get_current_user
+from app.services.history_store import InvalidCursorError, history_store
 
 router = APIRouter(prefix="/history", tags=["History"])
 
-# Global to ensure directory exists
-DATA_DIR = os.path.join(os.getcwd(), "data")
-DATA_FILE = os.path.join(DATA_DIR, "history.json")
-
 class HistoryEntry(BaseModel):
     id: Optional[str] = None
     date: str  # ISO format date of archive
@@ -19,7 +15,20 @@ class HistoryEntry(BaseModel):
     savings: float
     total_vehicles: int
     total_employees: int
-    data_snapshot: Dict[str, Any] # simplified snapshot or metadata
+    data_snapshot: Optional[Dict[str, Any]] = None # simplified snapshot or metadata (single entry only)
+
+class HistoryPage(BaseModel):
+    entries: List[HistoryEntry]
+    next_cursor: Optional[str] = None # Pass back as ?cursor= for the next (older) page
+
+class HistoryStats(BaseModel):
+    period_start: str # First day of the period (ISO)
+    label: str # e.g. "Jan 2024", "2024-W03", "Q1 2024"
+    entries: int
+    total_cost: float
+    savings: float
+    total_vehicles: int
+    total_employees: int
 
 class ArchiveRequest(BaseModel):
     total_cost: float
@@ -28,39 +37,22 @@ class ArchiveRequest(BaseModel):
     total_employees: int
     details: Dict[str, Any] # e.g. the full analysis or optimization result
 
-def ensure_data_dir():
-    if not os.path.exists(DATA_DIR):
-        os.makedirs(DATA_DIR, exist_ok=True)
-
-def load_history():
-    ensure_data_dir()
-    if not os.path.exists(DATA_FILE):
-        return []
+@router.get("/", response_model=HistoryPage)
+def get_history(limit: int = Query(50, ge=1, le=500), cursor: Optional[str] = None,
+                current_user: Any = Depends(get_current_user)):
+    # Newest first, without the snapshots (see /history/{entry_id})
     try:
-        with open(DATA_FILE, "r") as f:
-            return json.load(f)
-    except:
-        return []
-
-def save_history(history):
-    ensure_data_dir()
-    with open(DATA_FILE, "w") as f:
-        json.dump(history, f, indent=2)
-
-@router.get("/", response_model=List[HistoryEntry])
-def get_history(current_user: Any = Depends(get_current_user)):
-    data = load_history()
-    # Sort by date desc
-    data.sort(key=lambda x: x['date'], reverse=True)
-    return data
+        entries, next_cursor = history_store.list(limit, cursor)
+    except InvalidCursorError:
+        raise HTTPException(status_code=400, detail="Curseur invalide")
+    return HistoryPage(entries=entries, next_cursor=next_cursor)
 
 @router.post("/")
 def archive_report(request: ArchiveRequest, current_user: Any = Depends(get_current_user)):
-    history = load_history()
-    
+    now = datetime.now()
     new_entry = {
-        "id": f"arch_{int(datetime.now().timestamp())}",
-        "date": datetime.now().isoformat(),
+        "id": f"arch_{int(now.timestamp())}_{uuid.uuid4().hex[:6]}",
+        "date": now.isoformat(),
         "total_cost": request.total_cost,
         "savings": request.savings,
         "total_vehicles": request.total_vehicles,
@@ -68,18 +60,19 @@ def archive_report(request: ArchiveRequest, current_user: Any = Depends(get_curr
         "data_snapshot": request.details
     }
     
-    history.append(new_entry)
-    save_history(history)
+    history_store.append(new_entry)
     return {"message": "Report archived successfully", "id": new_entry["id"]}
 
-@router.get("/stats")
-def get_stats(current_user: Any = Depends(get_current_user)):
-    history = load_history()
-    stats = {}
-    for entry in history:
-        dt = datetime.fromisoformat(entry['date'])
-        month_key = dt.strftime("%b %Y")
-        if month_key not in stats:
-            stats[month_key] = 0
-        stats[month_key] += entry['total_cost']
-    return stats
+@router.get("/stats", response_model=List[HistoryStats])
+def get_stats(granularity: Literal["day", "week", "month", "quarter"] = "month",
+              start: Optional[date] = None, end: Optional[date] = None,
+              current_user: Any = Depends(get_current_user)):
+    # Read from the rollups maintained at archive time: no scan of the archive
+    return history_store.rollups(granularity, start, end)
+
+@router.get("/{entry_id}", response_model=HistoryEntry)
+def get_history_entry(entry_id: str, current_user: Any = Depends(get_current_user)):
+    entry = history_store.get(entry_id)
+    if entry is None:
+        raise HTTPException(status_code=404, detail="Archive introuvable")
+    return entry
@@ -1,12 +1,29 @@
 from fastapi import APIRouter, HTTPException, Depends
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from typing import List, Dict, Any, Optional
-from app.api.settings import get_settings, Settings, VehicleType
+from typing import List, Dict, Any, Optional, Tuple
+from app.api.settings import get_settings, get_pricing_tables, get_settings_version, Settings
+from app.api.planning import decode_offset_cursor, encode_offset_cursor, load_planning_frame, load_planning_state
+from app.core.metrics import count_rows, stage
+from app.core.responses import fast_result, ndjson_lines
+from app.services import planning_store
+from app.services.compute_pool import compute_pool
+from app.services.grouping import GroupListing, group_pickups, key_value_order, partition_order
+from app.services.jobs import Job, QueueFullError, job_manager
+from app.services.planning_aggregates import PlanningAggregates, partition_key
+from app.services.planning_schema import (COVERAGE_ATTR, DATETIME_COLUMN, FINGERPRINT_ATTR, PARTITION_COLUMNS,
+                                          ZONE_COLUMN, planning_fingerprint)
+from app.services.result_cache import result_cache
+import numpy as np
 import pandas as pd
-from datetime import datetime, timedelta
 
 router = APIRouter(prefix="/optimization", tags=["Optimization"])
 
+# Upper bound on the windows evaluated by one /sweep call
+MAX_SWEEP_WINDOWS = 120
+# Upper bound on the groups returned by one /groups page
+MAX_GROUPS_PAGE = 5000
+
 class OptimizationResult(BaseModel):
     total_vehicles: int
     avg_occupancy_rate: float
@@ -15,173 +32,365 @@ class OptimizationResult(BaseModel):
     details: Dict[str, Any]
 
 class OptimizationRequest(BaseModel):
-    planning_data: List[Dict[str, Any]]
+    planning_data: Optional[List[Dict[str, Any]]] = None
+    planning_id: Optional[str] = None # Stored planning returned by /planning/upload
     window_minutes: Optional[int] = None
     override_coverage: Optional[str] = None # "ALLER", "ALLER_RETOUR"
 
+class WindowSweepRequest(BaseModel):
+    planning_data: Optional[List[Dict[str, Any]]] = None
+    planning_id: Optional[str] = None
+    windows: Optional[List[int]] = None # Explicit windows, else window_start..window_end by window_step
+    window_start: int = 5
+    window_end: int = 60
+    window_step: int = 5
+    override_coverage: Optional[str] = None
+
+class WindowSweepPoint(BaseModel):
+    window_minutes: int
+    total_vehicles: int
+    avg_occupancy_rate: float
+    estimated_logistic_budget: float
+
+class WindowSweepResult(BaseModel):
+    points: List[WindowSweepPoint]
+
+class GroupsRequest(BaseModel):
+    planning_data: Optional[List[Dict[str, Any]]] = None
+    planning_id: Optional[str] = None
+    window_minutes: Optional[int] = None
+    cursor: Optional[str] = None # next_cursor of the previous page
+    limit: int = 500
+
+class GroupsPage(BaseModel):
+    groups: List[Dict[str, Any]]
+    total_groups: int
+    next_cursor: Optional[str] = None
+
+class OptimizationJob(BaseModel):
+    job_id: str
+    status: str # "queued", "running", "completed", "failed", "cancelled"
+    created_at: str
+    finished_at: Optional[str] = None
+    result: Optional[OptimizationResult] = None
+    error: Optional[str] = None
+
+def job_response(job: Job) -> OptimizationJob:
+    return OptimizationJob(
+        job_id=job.id,
+        status=job.status,
+        created_at=job.created_at,
+        finished_at=job.finished_at,
+        result=job.result(),
+        error=job.error()
+    )
+
+def optimization_job(planning_id: Optional[str], planning_data: Optional[List[Dict[str, Any]]],
+                     settings_data: Dict[str, Any], window_minutes: Optional[int],
+                     override_coverage: Optional[str]) -> OptimizationResult:
+    # Runs inside a worker process (see app.services.jobs)
+    return analyze(planning_id, planning_data, Settings(**settings_data), window_minutes, override_coverage)
+
+@router.post("/jobs", response_model=OptimizationJob, status_code=202)
+async def submit_optimization_job(request: OptimizationRequest, settings: Settings = Depends(get_settings)):
+    if request.planning_id:
+        if not planning_store.planning_exists(request.planning_id):
+            raise HTTPException(status_code=404, detail=f"Planning introuvable : {request.planning_id}")
+    elif not request.planning_data:
+        raise HTTPException(status_code=400, detail="Planning data is required")
+    try:
+        job = job_manager.submit(optimization_job, request.planning_id, request.planning_data, settings.dict(),
+                                 request.window_minutes, request.override_coverage)
+    except QueueFullError as e:
+        raise HTTPException(status_code=429, detail=f"File de simulations pleine : {e}")
+    return job_response(job)
+
+@router.get("/jobs/{job_id}", response_model=OptimizationJob)
+async def get_optimization_job(job_id: str):
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job_response(job)
+
+@router.delete("/jobs/{job_id}", response_model=OptimizationJob)
+async def cancel_optimization_job(job_id: str):
+    job = job_manager.cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job_response(job)
+
 @router.post("/analyze", response_model=OptimizationResult)
 async def analyze_optimization(request: OptimizationRequest, settings: Settings = Depends(get_settings)):
-    planning_data = request.planning_data
-    if not planning_data:
-        raise HTTPException(status_code=400, detail="Planning data is required")
+    return await compute_pool.run(fast_result, analyze, request.planning_id, request.planning_data, settings,
+                                  request.window_minutes, request.override_coverage)
+
+def analyze(planning_id: Optional[str], planning_data: Optional[List[Dict[str, Any]]], settings: Settings,
+            window_minutes: Optional[int], override_coverage: Optional[str]) -> OptimizationResult:
+    if planning_id:
+        return run_stored_optimization(planning_id, settings, window_minutes, override_coverage)
+    df = load_planning_frame(planning_id, planning_data)
+    return run_optimization(df, settings, window_minutes, override_coverage)
+
+def run_optimization(df: pd.DataFrame, settings: Settings, window_minutes: Optional[int] = None,
+                     override_coverage: Optional[str] = None) -> OptimizationResult:
+    # Same planning content + settings version + parameters -> cached result
+    key = ("optimization", planning_fingerprint(df), get_settings_version(settings), window_minutes, override_coverage)
+    return result_cache.get_or_compute(key, lambda: _run_optimization(df, settings, window_minutes, override_coverage))
 
-    df = pd.DataFrame(planning_data)
-    n_lines = len(df)
+def run_stored_optimization(planning_id: str, settings: Settings, window_minutes: Optional[int] = None,
+                            override_coverage: Optional[str] = None) -> OptimizationResult:
+    # Stored planning: same cache entry as run_optimization for the same content
+    meta, aggregates = load_planning_state(planning_id)
+    key = ("optimization", aggregates.fingerprint, get_settings_version(settings), window_minutes, override_coverage)
+    return result_cache.get_or_compute(key, lambda: _run_stored_optimization(planning_id, meta, aggregates, settings,
+                                                                             window_minutes, override_coverage))
 
+def check_simulation_volume(n_lines: int):
     # Ajustement du garde-fou pour le test final (Seuil abaissé à 5)
     if n_lines < 5:
         raise HTTPException(
             status_code=400, 
             detail=f"Simulation refusée : Volume insuffisant ({n_lines}/5). L'optimisation requiert un jeu de données minimal."
         )
-    
-    # Use provided window or default from settings
-    grouping_window = request.window_minutes if request.window_minutes is not None else settings.grouping_window_minutes
-    
-    # Direction Coverage Factor
+
+def budget_factor(nb_jours_obs: int, coverage_direction: Optional[str], override_coverage: Optional[str]) -> float:
+    # Direction Coverage Factor (auto-detected coverage comes with the planning)
     facteur_direction = 1
-    if request.override_coverage == "ALLER":
+    if override_coverage == "ALLER":
         facteur_direction = 2
-    elif not request.override_coverage:
-        # Simple auto-detect for facteur_direction only
-        try:
-            hours = pd.to_datetime(df["Time"], format='%H:%M').dt.hour
-            has_morning = any(hours < 12)
-            has_evening = any(hours >= 12)
-            if (has_morning and not has_evening) or (not has_morning and has_evening):
-                facteur_direction = 2
-        except:
-            pass
-    
-    # Preprocessing
-    # ensure Time is comparable. We assume Date + Time
-    # detailed logic: combine Date and Time to a datetime object
-    # For simulation, we might strictly look at Time if Date is consistent, but robust way is Date+Time
-    
-    # Let's perform a simple Parse
-    try:
-        df['datetime'] = pd.to_datetime(df['Date'] + ' ' + df['Time'])
-    except:
-        # Fallback if format issues, just try to parse Time for a single day assumption or similar
-        # But let's assume valid ISO or consistent format from previous steps
-        pass
-
-    # Sort by datetime
-    df = df.sort_values(by='datetime')
-    
-    # Drivers/Groups
-    groups = []
-    
-    # Process Zone to always be integer
-    def parse_zone(val):
-        try:
-            # 1. Try direct int conversion
-            return int(val)
-        except:
-            # 2. Try cleaning string (Zone A -> A -> 1 ?)
-            # Let's assume standard mapping A=1, B=2, C=3 or extract digit
-            s = str(val).upper()
-            import re
-            # Extract first digit found
-            digits = re.findall(r'\d+', s)
-            if digits:
-                return int(digits[0])
-            
-            # Map A, B, C
-            if 'A' in s: return 1
-            if 'B' in s: return 2
-            if 'C' in s: return 3
-            
-            return 1 # Default
-
-    # Apply parsing to dataframe to avoid repeating logic
-    if 'Zone' in df.columns:
-        df['Zone_Int'] = df['Zone'].apply(parse_zone)
-    else:
-        df['Zone_Int'] = 1
-
-    # ... [Rest of grouping logic] ...
-    
-    # We will prioritize the largest vehicle to minimize count, or use logic.
-    # Constraint: "Deterministic".
-    # Greedy Strategy:
-    # 1. Take first person. Start a group.
-    # 2. Look ahead. Anyone fitting in [Time, Time + Window] AND matching route constraints?
-    
-    max_capacity = 13 # default Hiace
-    # Find active Hiace capacity
-    hiace = next((v for v in settings.vehicle_types if "hiace" in v.name.lower()), None)
-    if hiace: max_capacity = hiace.capacity
-    
-    # Optimized Grouping Strategy
-    # Instead of O(N^2) search, we use a single pass with index tracking
-    
-    i = 0
-    while i < len(df):
-        current_emp = df.iloc[i]
-        start_time = current_emp['datetime']
-        
-        # Current group start
-        group_indices = [i]
-        
-        # Look ahead for candidates in window
-        # J starts from i + 1
-        j = i + 1
-        while j < len(df) and len(group_indices) < max_capacity:
-            candidate = df.iloc[j]
-            time_diff = (candidate['datetime'] - start_time).total_seconds() / 60.0
-            
-            if time_diff <= grouping_window:
-                group_indices.append(j)
-                j += 1
-            else:
-                break
-        
-        # Finalize group
-        current_group = df.iloc[group_indices]
-        group_count = len(current_group)
-        
-        # Select Vehicle
-        sorted_vehicles = sorted(settings.vehicle_types, key=lambda x: x.capacity)
-        selected_vehicle = next((v for v in sorted_vehicles if group_count <= v.capacity), sorted_vehicles[-1] if sorted_vehicles else None)
-        
-        if selected_vehicle:
-            vehicle_name = selected_vehicle.name
-            max_zone = int(current_group['Zone_Int'].max())
-            cost = selected_vehicle.zone_prices.get(max_zone, selected_vehicle.base_price)
-            capacity = selected_vehicle.capacity
-        else:
-            vehicle_name, cost, capacity = "Inconnu", 0, group_count
-            
-        groups.append({
-            "start_time": str(start_time),
-            "count": group_count,
-            "vehicle": vehicle_name,
-            "cost": cost,
-            "occupancy": (group_count / capacity) * 100 if capacity > 0 else 0,
-            "capacity": capacity,
-            "employees": current_group['Employee ID'].tolist()
-        })
-        
-        # Move i to the next unprocessed employee (j)
-        i = j
-
-    total_vehicles = len(groups)
+    elif not override_coverage:
+        if (coverage_direction or "ALLER_RETOUR") != "ALLER_RETOUR":
+            facteur_direction = 2
     # Appliquer le facteur de direction au budget logistique mensuel estimé
     nb_jours_ref = 22
+    return nb_jours_ref / nb_jours_obs * facteur_direction
+
+def monthly_factor(df: pd.DataFrame, override_coverage: Optional[str]) -> float:
     nb_jours_obs = df['Date'].nunique() if 'Date' in df.columns else 1
-    extrapol_factor = nb_jours_ref / nb_jours_obs
-    
-    total_cost = sum(g['cost'] for g in groups) * extrapol_factor * facteur_direction
-    avg_occupancy = sum(g['occupancy'] for g in groups) / total_vehicles if total_vehicles > 0 else 0
+    return budget_factor(nb_jours_obs, df.attrs.get(COVERAGE_ATTR), override_coverage)
+
+def sort_pickups(df: pd.DataFrame) -> Tuple[pd.DataFrame, np.ndarray]:
+    # Groups never span two days nor mix drop-off sites: pickups are sorted by
+    # (Date, Dropoff Point) partition, then by pickup datetime (Date + Time,
+    # parsed once in the canonical schema)
+    partition_keys = [df[col] for col in PARTITION_COLUMNS if col in df.columns]
+    order, partitions = partition_order(df[DATETIME_COLUMN].to_numpy(dtype='datetime64[ns]'), partition_keys)
+    return df.iloc[order], partitions
+
+class Simulation:
+    # One greedy grouping run on the sorted planning, with the arrays needed
+    # to list its groups (UI preview, exports)
+    def __init__(self, df: pd.DataFrame, settings: Settings, window_minutes: Optional[int] = None,
+                 check_volume: bool = True):
+        # check_volume=False: some partitions of a planning checked as a whole
+        if check_volume:
+            check_simulation_volume(len(df))
+        count_rows("optimization", len(df))
+
+        # Use provided window or default from settings
+        self.grouping_window = window_minutes if window_minutes is not None else settings.grouping_window_minutes
+
+        with stage("optimization.sort"):
+            self.df, self.partitions = sort_pickups(df)
+
+        # Greedy Strategy (deterministic), inside each partition:
+        # 1. Take first person. Start a group.
+        # 2. Add everyone within [Time, Time + Window] until the Hiace is full.
+        # Window ends are found with searchsorted on the sorted datetimes and
+        # groups are aggregated on arrays (see app.services.grouping).
+        # Groups are capped at the Hiace capacity; the capacity-sorted vehicle
+        # table is compiled with the settings (see pricing)
+        self.vehicles = get_pricing_tables(settings).vehicles
+        self.times = self.df[DATETIME_COLUMN].to_numpy(dtype='datetime64[ns]')
+        self.employees = (self.df['Employee ID'].to_numpy() if 'Employee ID' in self.df.columns
+                          else np.full(len(self.df), None))
+        with stage("optimization.group"):
+            self.grouping = group_pickups(self.times, self.df[ZONE_COLUMN].to_numpy(), self.grouping_window,
+                                          self.vehicles, self.partitions)
+        self.listing = GroupListing(self.grouping, self.times, self.employees, self.vehicles)
+
+    @property
+    def partition_count(self) -> int:
+        return int(self.partitions[-1]) + 1 if len(self.partitions) else 0
+
+    def group_records(self, offset: int = 0, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        return self.listing.records(offset, limit)
+
+def _run_optimization(df: pd.DataFrame, settings: Settings, window_minutes: Optional[int],
+                      override_coverage: Optional[str]) -> OptimizationResult:
+    simulation = Simulation(df, settings, window_minutes)
+    grouping = simulation.grouping
+
+    total_vehicles = len(grouping)
+    total_cost = grouping.total_cost * monthly_factor(simulation.df, override_coverage)
+    avg_occupancy = grouping.avg_occupancy
+    with stage("optimization.records"):
+        groups = simulation.group_records(limit=100) # Return first 100 groups for UI
     
     return OptimizationResult(
         total_vehicles=total_vehicles,
         avg_occupancy_rate=round(avg_occupancy, 2),
         estimated_logistic_budget=float(total_cost),
-        groups=groups[:100], # Return first 100 groups for UI
+        groups=groups,
+        details={
+            "grouping_window": simulation.grouping_window,
+            "total_groups": total_vehicles,
+            "partitions": simulation.partition_count
+        }
+    )
+
+def partition_listings(planning_id: str, aggregates: PlanningAggregates, settings: Settings,
+                       window_minutes: int) -> Optional[List[Tuple[Tuple, GroupListing]]]:
+    # Groups of every (Date, Dropoff Point) partition, cached per partition
+    # revision: after a patch only the partitions it touched are grouped
+    # again. None when the planning changed since `aggregates` were read.
+    version = get_settings_version(settings)
+    partitions = aggregates.partition_list()
+    keys = {partition: ("partition_groups", planning_id, partition, revision, version, window_minutes)
+            for partition, revision in partitions}
+    listings = {partition: result_cache.get(key) for partition, key in keys.items()}
+    missing = [partition for partition, listing in listings.items() if listing is None]
+    if missing:
+        with planning_store.patch_lock:
+            if planning_store.load_planning_meta(planning_id).get(FINGERPRINT_ATTR) != aggregates.fingerprint:
+                return None
+            with stage("load"):
+                df = load_partitions(planning_id, missing, len(partitions))
+        simulation = Simulation(df, settings, window_minutes, check_volume=False)
+        columns = [c for c in PARTITION_COLUMNS if c in simulation.df.columns]
+        split = simulation.listing.split(simulation.partitions)
+        # Key values of each partition, read from its first row (one take for all)
+        first_rows = simulation.df[columns].iloc[[first_row for first_row, _ in split]]
+        # Loaded partitions are complete: all of them are cached, not only the missing ones
+        for values, (_, listing) in zip(first_rows.itertuples(index=False, name=None), split):
+            partition = partition_key(values)
+            if partition in keys:
+                listings[partition] = listing
+                result_cache.put(keys[partition], listing)
+    return [(partition, listings[partition]) for partition, _ in partitions]
+
+def load_partitions(planning_id: str, partitions: List[Tuple], n_partitions: int) -> pd.DataFrame:
+    # Rows of the given partitions (and of the other partitions crossing
+    # their dates and sites); the whole planning when most are needed
+    keyed = all(len(p) == len(PARTITION_COLUMNS) and None not in p for p in partitions)
+    if not keyed or len(partitions) * 2 > n_partitions:
+        return planning_store.load_planning(planning_id)
+    filters = {column: sorted({p[i] for p in partitions}) for i, column in enumerate(PARTITION_COLUMNS)}
+    df, _ = planning_store.query_planning(planning_id, filters=filters)
+    return df
+
+def _run_stored_optimization(planning_id: str, meta: Dict[str, Any], aggregates: PlanningAggregates, settings: Settings,
+                             window_minutes: Optional[int], override_coverage: Optional[str]) -> OptimizationResult:
+    check_simulation_volume(aggregates.n_rows)
+    grouping_window = window_minutes if window_minutes is not None else settings.grouping_window_minutes
+    with stage("optimization.group"):
+        listings = partition_listings(planning_id, aggregates, settings, grouping_window)
+    if listings is None:
+        # Patched meanwhile: computed on the rows read now
+        return _run_optimization(load_planning_frame(planning_id, None), settings, window_minutes, override_coverage)
+
+    # Partitions in order of their first pickup, then of their key, like sort_pickups
+    def first_pickup(item):
+        partition, listing = item
+        times = listing.times
+        first = int(times[0].astype(np.int64)) if len(times) and not np.isnat(times[0]) else np.iinfo(np.int64).max
+        return first, [key_value_order(value) for value in partition]
+    listings = [listing for _, listing in sorted(listings, key=first_pickup)]
+
+    total_vehicles = sum(len(listing) for listing in listings)
+    nb_jours_obs = aggregates.observed_days if aggregates.dates else 1
+    factor = budget_factor(nb_jours_obs, meta.get(COVERAGE_ATTR) or aggregates.coverage_direction, override_coverage)
+    total_cost = sum(listing.grouping.total_cost for listing in listings) * factor
+    occupancy = sum(float(listing.grouping.occupancy.sum()) for listing in listings)
+    avg_occupancy = occupancy / total_vehicles if total_vehicles else 0.0
+    groups = []
+    with stage("optimization.records"):
+        for listing in listings:
+            if len(groups) >= 100:
+                break
+            groups.extend(listing.records(0, 100 - len(groups))) # First 100 groups for UI
+
+    return OptimizationResult(
+        total_vehicles=total_vehicles,
+        avg_occupancy_rate=round(avg_occupancy, 2),
+        estimated_logistic_budget=float(total_cost),
+        groups=groups,
         details={
             "grouping_window": grouping_window,
-            "total_groups": len(groups)
+            "total_groups": total_vehicles,
+            "partitions": len(listings)
         }
     )
+
+@router.post("/sweep", response_model=WindowSweepResult)
+async def sweep_windows(request: WindowSweepRequest, settings: Settings = Depends(get_settings)):
+    if not request.windows and request.window_step <= 0:
+        raise HTTPException(status_code=400, detail=f"Pas de fenêtre invalide ({request.window_step}) : il doit être positif")
+    windows = request.windows or list(range(request.window_start, request.window_end + 1, request.window_step))
+    if not windows or min(windows) < 0:
+        raise HTTPException(status_code=400, detail="Fenêtres de regroupement invalides")
+    if len(windows) > MAX_SWEEP_WINDOWS:
+        raise HTTPException(status_code=400, detail=f"Trop de fenêtres ({len(windows)}/{MAX_SWEEP_WINDOWS})")
+    return await compute_pool.run(sweep, request.planning_id, request.planning_data, settings,
+                                  windows, request.override_coverage)
+
+def sweep(planning_id: Optional[str], planning_data: Optional[List[Dict[str, Any]]], settings: Settings,
+          windows: List[int], override_coverage: Optional[str]) -> WindowSweepResult:
+    df = load_planning_frame(planning_id, planning_data)
+    key = ("optimization_sweep", planning_fingerprint(df), get_settings_version(settings), tuple(windows), override_coverage)
+    return result_cache.get_or_compute(key, lambda: _sweep_windows(df, settings, windows, override_coverage))
+
+def _sweep_windows(df: pd.DataFrame, settings: Settings, windows: List[int],
+                   override_coverage: Optional[str]) -> WindowSweepResult:
+    check_simulation_volume(len(df))
+
+    # The planning is sorted and encoded once; each window only re-runs the
+    # vectorized grouping on the same arrays
+    df, partitions = sort_pickups(df)
+    vehicles = get_pricing_tables(settings).vehicles
+    times = df[DATETIME_COLUMN].to_numpy(dtype='datetime64[ns]')
+    zones = df[ZONE_COLUMN].to_numpy()
+    factor = monthly_factor(df, override_coverage)
+
+    points = []
+    for window in windows:
+        grouping = group_pickups(times, zones, window, vehicles, partitions)
+        points.append(WindowSweepPoint(
+            window_minutes=window,
+            total_vehicles=len(grouping),
+            avg_occupancy_rate=round(grouping.avg_occupancy, 2),
+            estimated_logistic_budget=float(grouping.total_cost * factor)
+        ))
+    return WindowSweepResult(points=points)
+
+def group_listing(df: pd.DataFrame, settings: Settings, window_minutes: Optional[int]) -> GroupListing:
+    # Every group of a simulation, cached so pages and streams reuse one grouping
+    key = ("optimization_groups", planning_fingerprint(df), get_settings_version(settings), window_minutes)
+    return result_cache.get_or_compute(key, lambda: Simulation(df, settings, window_minutes).listing)
+
+def load_group_listing(request: GroupsRequest, settings: Settings) -> GroupListing:
+    df = load_planning_frame(request.planning_id, request.planning_data)
+    return group_listing(df, settings, request.window_minutes)
+
+@router.post("/groups", response_model=GroupsPage)
+async def list_groups(request: GroupsRequest, settings: Settings = Depends(get_settings)):
+    # Cursor pagination over the cached group listing
+    offset = decode_offset_cursor(request.cursor)
+    limit = min(max(request.limit, 1), MAX_GROUPS_PAGE)
+    return await compute_pool.run(fast_result, groups_page, request, settings, offset, limit)
+
+def groups_page(request: GroupsRequest, settings: Settings, offset: int, limit: int) -> GroupsPage:
+    listing = load_group_listing(request, settings)
+    next_offset = offset + limit
+    return GroupsPage(
+        groups=listing.records(offset, limit),
+        total_groups=len(listing),
+        next_cursor=encode_offset_cursor(next_offset) if next_offset < len(listing) else None
+    )
+
+@router.post("/groups/stream")
+async def stream_groups(request: GroupsRequest, settings: Settings = Depends(get_settings)):
+    # Every group as newline-delimited JSON, built and sent batch by batch
+    offset = decode_offset_cursor(request.cursor)
+    listing = await compute_pool.run(load_group_listing, request, settings)
+    return StreamingResponse(ndjson_lines(listing.iter_records(offset)), media_type="application/x-ndjson")
@@ -1,118 +1,255 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException
+from fastapi import APIRouter, UploadFile, File, HTTPException, Query
+from pydantic import BaseModel
+import numpy as np
 import pandas as pd
+import asyncio
+import base64
 import io
 import json
 import os
-from typing import List, Dict, Any
+import re
+import unicodedata
+from typing import List, Dict, Any, BinaryIO, Iterator, Optional, Tuple
 from datetime import datetime
+from app.core.config import settings as config_settings
+from app.core.metrics import count_rows, stage, timed
+from app.core.responses import fast_response, fast_result
+from app.services import planning_reader, planning_schema, planning_store
+from app.services.compute_pool import compute_pool
+from app.services.planning_aggregates import PlanningAggregates
+from app.services.result_cache import result_cache
+from app.services.worker_pool import WorkerError, worker_pool
 
 router = APIRouter(prefix="/planning", tags=["Planning"])
 
 REQUIRED_COLUMNS = ["Employee ID", "Date", "Time", "Pickup Point", "Dropoff Point", "Zone"]
 REQUIRED_OP2_COLUMN = "Ligne_Bus_Option_2"
+# Batch uploads: name of the file each row comes from
+SOURCE_COLUMN = "Source File"
+# Legacy JSON copy of the last upload, imported into the store when no stored planning exists
 CURRENT_PLANNING_FILE = "data/current_planning.json"
+# Rows per /planning/current page by default, and the largest page allowed
+CURRENT_PAGE_ROWS = 1000
+MAX_PAGE_ROWS = 10000
 
-@router.get("/current")
-def get_current_planning():
+def frame_to_records(df: pd.DataFrame) -> List[Dict[str, Any]]:
+    # Only the uploaded columns are exposed, not the derived typed ones
+    df = df[planning_schema.raw_columns(df)]
+    # Replace NaN with None for JSON compliance
+    return df.astype(object).where(df.notna(), None).to_dict(orient="records")
+
+def load_planning_frame(planning_id: Optional[str], planning_data: Optional[List[Dict[str, Any]]]) -> pd.DataFrame:
+    # Compute endpoints accept either a stored planning_id or the raw rows,
+    # and always get the canonical typed schema (see planning_schema)
+    if planning_id:
+        if not planning_store.planning_exists(planning_id):
+            raise HTTPException(status_code=404, detail=f"Planning introuvable : {planning_id}")
+        meta = planning_store.load_planning_meta(planning_id)
+        with stage("load"):
+            df = planning_store.load_planning(planning_id)
+        with stage("canonicalize"):
+            return planning_schema.canonicalize(df, meta.get(planning_schema.COVERAGE_ATTR),
+                                                meta.get(planning_schema.FINGERPRINT_ATTR))
+    if not planning_data:
+        raise HTTPException(status_code=400, detail="Planning data is required")
+    with stage("load"):
+        df = pd.DataFrame(planning_data)
+    with stage("canonicalize"):
+        return planning_schema.canonicalize(df)
+
+def _read_aggregates(planning_id: str, meta: Dict[str, Any]) -> PlanningAggregates:
+    # Row counts saved with the planning; rebuilt once from the rows for
+    # plannings stored before they existed (meta completed with a fingerprint)
+    fingerprint = meta.get(planning_schema.FINGERPRINT_ATTR)
+    aggregates = planning_store.load_aggregates(planning_id, fingerprint) if fingerprint else None
+    if aggregates is None:
+        df = load_planning_frame(planning_id, None)
+        if not fingerprint:
+            fingerprint = meta[planning_schema.FINGERPRINT_ATTR] = planning_schema.planning_fingerprint(df)
+            planning_store.write_planning_meta(planning_id, meta)
+        aggregates = PlanningAggregates.from_frame(df, int(meta.get("revision", 0)))
+        aggregates.fingerprint = fingerprint
+        planning_store.save_aggregates(planning_id, aggregates)
+    return aggregates
+
+def load_planning_state(planning_id: str) -> Tuple[Dict[str, Any], PlanningAggregates]:
+    # Meta and maintained row counts of a stored planning: what the cost and
+    # optimization endpoints need without reading its rows
+    if not planning_store.planning_exists(planning_id):
+        raise HTTPException(status_code=404, detail=f"Planning introuvable : {planning_id}")
+    meta = planning_store.load_planning_meta(planning_id)
+    key = ("planning_aggregates", planning_id, meta.get(planning_schema.FINGERPRINT_ATTR))
+    aggregates = result_cache.get(key) if key[2] else None
+    if aggregates is None:
+        with planning_store.patch_lock:
+            meta = planning_store.load_planning_meta(planning_id)
+            aggregates = _read_aggregates(planning_id, meta)
+        result_cache.put(("planning_aggregates", planning_id, aggregates.fingerprint), aggregates)
+    return meta, aggregates
+
+def encode_offset_cursor(offset: int) -> str:
+    return base64.urlsafe_b64encode(str(offset).encode()).decode()
+
+def decode_offset_cursor(cursor: Optional[str]) -> int:
+    if not cursor:
+        return 0
+    try:
+        offset = int(base64.urlsafe_b64decode(cursor.encode()).decode())
+    except (ValueError, UnicodeDecodeError):
+        offset = -1
+    if offset < 0:
+        raise HTTPException(status_code=400, detail="Curseur invalide")
+    return offset
+
+def import_legacy_planning() -> Optional[str]:
+    # The JSON copy written by older versions is moved once into the
+    # columnar store, then kept as <file>.imported
     if not os.path.exists(CURRENT_PLANNING_FILE):
-        return {"rows": [], "row_count": 0}
+        return None
     try:
         with open(CURRENT_PLANNING_FILE, "r") as f:
-            data = json.load(f)
-            return {
-                "rows": data,
-                "row_count": len(data)
-            }
-    except:
-        return {"rows": [], "row_count": 0}
+            df = pd.DataFrame(json.load(f))
+    except (OSError, ValueError):
+        return None
+    coverage = planning_schema.CoverageTracker()
+    fingerprint = planning_schema.PlanningFingerprint()
+    if "Time" in df.columns:
+        coverage.update(df["Time"])
+    fingerprint.update(df)
+    df = planning_schema.add_canonical_columns(df)
+    with planning_store.PlanningWriter() as writer:
+        writer.write(df)
+        writer.aggregates = PlanningAggregates.from_frame(df)
+        writer.meta[planning_schema.COVERAGE_ATTR] = coverage.direction
+        writer.meta[planning_schema.FINGERPRINT_ATTR] = fingerprint.hexdigest()
+    os.replace(CURRENT_PLANNING_FILE, CURRENT_PLANNING_FILE + ".imported")
+    return writer.planning_id
 
-@router.post("/upload")
-async def upload_planning(file: UploadFile = File(...)):
-    if not file.filename.lower().endswith(('.xlsx', '.xls', '.csv')):
-        raise HTTPException(status_code=400, detail="Format de fichier invalide. Veuillez utiliser des fichiers Excel (.xlsx, .xls) ou CSV (.csv).")
-    
-    COLUMN_MAPPING = {
-        "Employee ID": ["employeeid", "employee_id", "matricule", "employe", "id", "employee", "nom", "name", "salarie", "agent", "personne", "id_salarie"],
-        "Date": ["date", "jour", "day", "periode", "date_vire", "date_transport"],
-        "Time": ["time", "heure", "horaire", "pickuptime", "heure_passage", "heure_depart", "depart", "h_depart", "heure_service", "h_service", "h_passage"],
-        "Pickup Point": ["pickuppoint", "pickup_point", "origine", "point_depart", "pickup", "point_ramassage", "lieu_depart", "domicile", "lieu_prise", "zone_domicile", "point_de_ramassage", "depart_lieu"],
-        "Dropoff Point": ["dropoffpoint", "dropoff_point", "destination", "point_arrivee", "dropoff", "point_depot", "lieu_arrivee", "lieu_depot_zone", "lieu_depot", "site", "zone_depot", "lieu_de_depot", "arrivee_lieu"],
-        "Zone": ["zone", "secteur", "area", "zone_domicile", "zone_lieu_depot", "zone_max", "zone_geo", "zone_residence"]
-    }
+def planning_filters(date: Optional[List[str]], zone: Optional[List[str]], dropoff: Optional[List[str]]) -> Dict[str, list]:
+    # Zones are matched on their parsed code: "2", "Zone B" and "zone 2" select the same rows
+    filters = {}
+    if date:
+        filters["Date"] = [value.strip() for value in date]
+    if zone:
+        filters[planning_schema.ZONE_COLUMN] = planning_schema.parse_zone_codes(pd.Series(zone, dtype="string")).tolist()
+    if dropoff:
+        filters["Dropoff Point"] = dropoff
+    return filters
+
+@router.get("/current")
+def get_current_planning(limit: int = Query(CURRENT_PAGE_ROWS, ge=1, le=MAX_PAGE_ROWS),
+                         offset: int = Query(0, ge=0), cursor: Optional[str] = None,
+                         columns: Optional[str] = None,
+                         date: Optional[List[str]] = Query(None), zone: Optional[List[str]] = Query(None),
+                         dropoff: Optional[List[str]] = Query(None)):
+    # One page of the current planning, read from the memory-mapped Arrow
+    # file: ?columns=Date,Zone projects, repeated date/zone/dropoff filter,
+    # next_cursor (or offset) moves to the following page
+    planning_id = planning_store.get_current_planning_id() or import_legacy_planning()
+    if not planning_id:
+        return {"rows": [], "row_count": 0, "matched_rows": 0, "next_cursor": None}
+
+    meta = planning_store.load_planning_meta(planning_id)
+    stored_columns = meta.get("columns") or planning_store.read_planning_table(planning_id).column_names
+    available = [c for c in stored_columns if c not in planning_schema.DERIVED_COLUMNS]
+    selected = available
+    if columns:
+        selected = [c.strip() for c in columns.split(",") if c.strip()]
+        unknown = [c for c in selected if c not in available]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Colonnes inconnues : {', '.join(unknown)}")
+    if cursor:
+        offset = decode_offset_cursor(cursor)
 
     try:
-        content = await file.read()
-        file_ext = file.filename.lower()
-        
-        if file_ext.endswith(('.xlsx', '.xls')):
-            df = pd.read_excel(io.BytesIO(content))
-        elif file_ext.endswith('.csv'):
-            # Try parsing with different separators and encodings
-            try:
-                # First attempt: semicolon separator (common in FR), utf-8
-                df = pd.read_csv(io.BytesIO(content), sep=';')
-                if len(df.columns) <= 1: # Fallback if semicolon didn't work well
-                    df = pd.read_csv(io.BytesIO(content), sep=',')
-            except UnicodeDecodeError:
-                # Fallback to latin-1 for Excel-generated CSVs
-                try:
-                    df = pd.read_csv(io.BytesIO(content), sep=';', encoding='latin-1')
-                    if len(df.columns) <= 1:
-                        df = pd.read_csv(io.BytesIO(content), sep=',', encoding='latin-1')
-                except:
-                     raise HTTPException(status_code=400, detail="Erreur d'encodage CSV. Veuillez utiliser UTF-8 ou Latin-1.")
-        else:
-            raise HTTPException(status_code=400, detail="Type de fichier non supporté.")
+        with stage("query"):
+            page, matched = planning_store.query_planning(planning_id, selected, planning_filters(date, zone, dropoff),
+                                                          offset, limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Filtre invalide : {e}")
+    next_offset = offset + len(page)
+    return fast_response({
+        "planning_id": planning_id,
+        "columns": selected,
+        "rows": frame_to_records(page),
+        "row_count": meta.get("row_count", matched),
+        "matched_rows": matched,
+        "offset": offset,
+        "next_cursor": encode_offset_cursor(next_offset) if next_offset < matched else None
+    })
+
+COLUMN_MAPPING = {
+    "Employee ID": ["employeeid", "employee_id", "matricule", "employe", "id", "employee", "nom", "name", "salarie", "agent", "personne", "id_salarie"],
+    "Date": ["date", "jour", "day", "periode", "date_vire", "date_transport"],
+    "Time": ["time", "heure", "horaire", "pickuptime", "heure_passage", "heure_depart", "depart", "h_depart", "heure_service", "h_service", "h_passage"],
+    "Pickup Point": ["pickuppoint", "pickup_point", "origine", "point_depart", "pickup", "point_ramassage", "lieu_depart", "domicile", "lieu_prise", "zone_domicile", "point_de_ramassage", "depart_lieu"],
+    "Dropoff Point": ["dropoffpoint", "dropoff_point", "destination", "point_arrivee", "dropoff", "point_depot", "lieu_arrivee", "lieu_depot_zone", "lieu_depot", "site", "zone_depot", "lieu_de_depot", "arrivee_lieu"],
+    "Zone": ["zone", "secteur", "area", "zone_domicile", "zone_lieu_depot", "zone_max", "zone_geo", "zone_residence"]
+}
+
+# Bytes read from the head of the upload to detect encoding and separator
+SNIFF_SAMPLE_SIZE = 64 * 1024
+
+def normalize_text(text: str) -> str:
+    text = str(text).lower().strip()
+    text = "".join(c for c in unicodedata.normalize('NFD', text) if unicodedata.category(c) != 'Mn')
+    text = re.sub(r'[\_\-\s]', '', text)
+    return text
+
+def map_columns(columns: List[str]) -> Dict[str, str]:
+    # File header -> canonical column, exact name first then aliases
+    file_headers_map = {normalize_text(col): col for col in columns}
+    renamed_columns = {}
+    
+    for target_col, aliases in COLUMN_MAPPING.items():
+        found = False
+        target_norm = normalize_text(target_col)
+        if target_norm in file_headers_map:
+            renamed_columns[file_headers_map[target_norm]] = target_col
+            found = True
         
-        def normalize_text(text: str) -> str:
-            import re
-            import unicodedata
-            text = str(text).lower().strip()
-            text = "".join(c for c in unicodedata.normalize('NFD', text) if unicodedata.category(c) != 'Mn')
-            text = re.sub(r'[\_\-\s]', '', text)
-            return text
-
-        file_headers_map = {normalize_text(col): col for col in df.columns}
-        renamed_columns = {}
+        if not found:
+            for alias in aliases:
+                alias_norm = normalize_text(alias)
+                if alias_norm in file_headers_map:
+                    renamed_columns[file_headers_map[alias_norm]] = target_col
+                    found = True
+                    break
+    return renamed_columns
+
+class PlanningNormalizer:
+    # Applies the header mapping and default values chunk by chunk. Everything
+    # that depends on the whole file (header, fallback columns, upload date,
+    # running row number) is fixed once so every chunk is treated identically.
+    def __init__(self, columns: List[str]):
+        self.renamed_columns = map_columns(columns)
+        renamed = [self.renamed_columns.get(c, c) for c in columns]
+        available_columns = [c for c in renamed if c not in COLUMN_MAPPING.keys()]
         
-        for target_col, aliases in COLUMN_MAPPING.items():
-            found = False
-            target_norm = normalize_text(target_col)
-            if target_norm in file_headers_map:
-                renamed_columns[file_headers_map[target_norm]] = target_col
-                found = True
-            
-            if not found:
-                for alias in aliases:
-                    alias_norm = normalize_text(alias)
-                    if alias_norm in file_headers_map:
-                        renamed_columns[file_headers_map[alias_norm]] = target_col
-                        found = True
-                        break
-
-        df.rename(columns=renamed_columns, inplace=True)
+        self.fallback_columns = {}
+        for target_col in ["Pickup Point", "Dropoff Point"]:
+            if target_col not in renamed:
+                self.fallback_columns[target_col] = available_columns.pop(0) if available_columns else None
         
-        available_columns = [c for c in df.columns if c not in COLUMN_MAPPING.keys()]
+        self.default_date = datetime.now().strftime("%Y-%m-%d")
+        self.rows_seen = 0
+
+    def normalize(self, df: pd.DataFrame) -> pd.DataFrame:
+        df = df.rename(columns=self.renamed_columns)
         
         if "Pickup Point" not in df.columns:
-            if available_columns:
-                col = available_columns.pop(0)
-                df["Pickup Point"] = df[col]
-            else:
-                df["Pickup Point"] = "Domicile par défaut"
+            col = self.fallback_columns["Pickup Point"]
+            df["Pickup Point"] = df[col] if col else "Domicile par défaut"
 
         if "Dropoff Point" not in df.columns:
-            if available_columns:
-                col = available_columns.pop(0)
-                df["Dropoff Point"] = df[col]
-            else:
-                df["Dropoff Point"] = "Site par défaut"
+            col = self.fallback_columns["Dropoff Point"]
+            df["Dropoff Point"] = df[col] if col else "Site par défaut"
 
         if "Employee ID" not in df.columns:
-            df["Employee ID"] = [f"Salarié {i+1}" for i in range(len(df))]
+            df["Employee ID"] = [f"Salarié {self.rows_seen + i + 1}" for i in range(len(df))]
             
         if "Date" not in df.columns:
-            df["Date"] = datetime.now().strftime("%Y-%m-%d")
+            df["Date"] = self.default_date
             
         if "Time" not in df.columns:
             df["Time"] = "08:00"
@@ -130,23 +267,308 @@ async def upload_planning(file: UploadFile = File(...)):
             "Dropoff Point": "Inconnu",
             "Zone": "Zone A"
         })
+        self.rows_seen += len(df)
+        return df
 
-        # Save full data for persistence
-        # Replace NaN with None for JSON compliance
-        df = df.where(pd.notnull(df), None)
-        
-        full_data = df.to_dict(orient="records")
-        os.makedirs(os.path.dirname(CURRENT_PLANNING_FILE), exist_ok=True)
-        with open(CURRENT_PLANNING_FILE, "w") as f:
-            json.dump(full_data, f, indent=2)
-
-        return {
-            "filename": file.filename,
-            "row_count": len(df),
-            "preview": df.head(50).to_dict(orient="records"),
-            "mapped_columns": renamed_columns 
-        }
+def planning_columns(columns: List[str]) -> List[str]:
+    # Header columns the normalizer reads (mapped, Option 2 line, fallback
+    # points); empty when nothing in the header maps to the planning schema
+    normalizer = PlanningNormalizer(columns)
+    if not normalizer.renamed_columns:
+        return []
+    used = set(normalizer.renamed_columns) | {c for c in normalizer.fallback_columns.values() if c}
+    used.add(REQUIRED_OP2_COLUMN)
+    return [c for c in columns if c in used]
+
+def iter_planning_chunks(filename: str, source: BinaryIO, sample: bytes, chunk_rows: int,
+                         **csv_options) -> Iterator[pd.DataFrame]:
+    # csv_options: see iter_csv_chunks. A CSV that cannot be read as sniffed
+    # (latin-1 bytes past the sample, rows with missing fields) raises
+    # CsvReread: read it again from the start with the options it carries
+    file_ext = filename.lower()
+    if file_ext.endswith(('.xlsx', '.xls')):
+        # Workbooks cannot be read incrementally: single chunk, planning sheet/columns only
+        yield planning_reader.read_workbook(source, planning_columns)
+    else:
+        try:
+            yield from planning_reader.iter_csv_chunks(source, sample, chunk_rows, **csv_options)
+        except planning_reader.CsvReread:
+            raise
+        except UnicodeError:
+            raise HTTPException(status_code=400, detail="Erreur d'encodage CSV. Veuillez utiliser UTF-8 ou Latin-1.")
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=f"Fichier CSV invalide : {e}")
+
+def is_planning_file(filename: str) -> bool:
+    return filename.lower().endswith(('.xlsx', '.xls', '.csv'))
+
+@router.post("/upload")
+async def upload_planning(file: UploadFile = File(...)):
+    if not is_planning_file(file.filename):
+        raise HTTPException(status_code=400, detail="Format de fichier invalide. Veuillez utiliser des fichiers Excel (.xlsx, .xls) ou CSV (.csv).")
+
+    try:
+        # The upload is already spooled to a temporary file: only a small
+        # sample is read before parsing the file in bounded-size chunks
+        sample = await file.read(SNIFF_SAMPLE_SIZE)
+        await file.seek(0)
+        # Parsing is blocking (Arrow / calamine / openpyxl): done on the compute pool
+        return await compute_pool.run(fast_result, ingest_planning, file, sample)
     except Exception as e:
         if isinstance(e, HTTPException):
             raise e
         raise HTTPException(status_code=500, detail=f"Erreur d'importation : {str(e)}")
+
+def ingest_planning(file: UploadFile, sample: bytes) -> Dict[str, Any]:
+    csv_options = {}
+    while True:
+        try:
+            return _ingest_planning(file, sample, csv_options)
+        except planning_reader.CsvReread as e:
+            # Latin-1 bytes past the sample or short rows: the partial planning
+            # was discarded (writer aborted), the spooled upload is read again
+            csv_options = {**csv_options, **e.options}
+            file.file.seek(0)
+
+def _ingest_planning(file: UploadFile, sample: bytes, csv_options: Dict[str, Any]) -> Dict[str, Any]:
+    normalizer = None
+    coverage = planning_schema.CoverageTracker()
+    fingerprint = planning_schema.PlanningFingerprint()
+    aggregates = PlanningAggregates()
+    preview = []
+    with planning_store.PlanningWriter() as writer:
+        chunks = iter_planning_chunks(file.filename, file.file, sample, config_settings.PLANNING_CHUNK_ROWS, **csv_options)
+        for chunk in timed(chunks, "parse"):
+            with stage("normalize"):
+                if normalizer is None:
+                    normalizer = PlanningNormalizer(list(chunk.columns))
+                chunk = normalizer.normalize(chunk)
+                if len(preview) < 50:
+                    preview.extend(frame_to_records(chunk.head(50 - len(preview))))
+                # Typed zone codes / timestamps are derived once, here
+                coverage.update(chunk["Time"])
+                fingerprint.update(chunk)
+                chunk = planning_schema.add_canonical_columns(chunk)
+                aggregates.add(chunk)
+            # Save full data for persistence (columnar store, referenced by planning_id)
+            with stage("store"):
+                writer.write(chunk)
+        writer.meta[planning_schema.COVERAGE_ATTR] = coverage.direction
+        writer.meta[planning_schema.FINGERPRINT_ATTR] = fingerprint.hexdigest()
+        writer.aggregates = aggregates
+    count_rows("upload", writer.row_count)
+
+    return {
+        "planning_id": writer.planning_id,
+        "filename": file.filename,
+        "row_count": writer.row_count,
+        "preview": preview,
+        "mapped_columns": normalizer.renamed_columns if normalizer else {}
+    }
+
+@router.post("/upload/batch")
+async def upload_planning_batch(files: List[UploadFile] = File(...)):
+    # Several files (e.g. one per site) merged into one stored planning
+    if len(files) > config_settings.PLANNING_BATCH_MAX_FILES:
+        raise HTTPException(status_code=400, detail=f"Trop de fichiers : {len(files)} (maximum {config_settings.PLANNING_BATCH_MAX_FILES}).")
+    invalid = [file.filename for file in files if not is_planning_file(file.filename)]
+    if invalid:
+        raise HTTPException(status_code=400, detail=f"Format de fichier invalide : {', '.join(invalid)}. Veuillez utiliser des fichiers Excel (.xlsx, .xls) ou CSV (.csv).")
+
+    try:
+        contents = [await file.read() for file in files]
+        # Files are parsed side by side in worker processes, then merged in upload order
+        with stage("parse"):
+            parsed = await asyncio.gather(*(worker_pool.run(parse_planning_file, file.filename, content)
+                                            for file, content in zip(files, contents)))
+        return await compute_pool.run(fast_result, merge_planning_files, list(parsed))
+    except WorkerError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    except Exception as e:
+        if isinstance(e, HTTPException):
+            raise e
+        raise HTTPException(status_code=500, detail=f"Erreur d'importation : {str(e)}")
+
+class PlanningFile:
+    # One file of a batch upload, parsed in a worker process: normalized
+    # with its own header mapping, rows tagged with the file name and kept as
+    # Arrow tables until the merge, with the file's fingerprint and counts
+    def __init__(self, filename: str):
+        self.filename = filename
+        self.mapped_columns = {}
+        self.row_count = 0
+        self.tables = []
+        self.fingerprint = None
+        self.aggregates = PlanningAggregates()
+
+    def report(self) -> Dict[str, Any]:
+        return {"filename": self.filename, "row_count": self.row_count, "mapped_columns": self.mapped_columns}
+
+def parse_planning_file(filename: str, content: bytes, csv_options: Optional[Dict[str, Any]] = None) -> PlanningFile:
+    parsed = PlanningFile(filename)
+    fingerprint = planning_schema.PlanningFingerprint()
+    normalizer = None
+    try:
+        chunks = iter_planning_chunks(filename, io.BytesIO(content), content[:SNIFF_SAMPLE_SIZE],
+                                      config_settings.PLANNING_CHUNK_ROWS, **(csv_options or {}))
+        for chunk in chunks:
+            if normalizer is None:
+                normalizer = PlanningNormalizer(list(chunk.columns))
+                parsed.mapped_columns = normalizer.renamed_columns
+            chunk = normalizer.normalize(chunk)
+            chunk[SOURCE_COLUMN] = filename
+            fingerprint.update(chunk)
+            chunk = planning_schema.add_canonical_columns(chunk)
+            parsed.aggregates.add(chunk)
+            parsed.tables.append(planning_store.to_arrow_table(chunk))
+            parsed.row_count += len(chunk)
+    except planning_reader.CsvReread as e:
+        # Latin-1 bytes past the sample or short rows: parsed again from the start
+        return parse_planning_file(filename, content, {**(csv_options or {}), **e.options})
+    except HTTPException as e:
+        raise HTTPException(status_code=e.status_code, detail=f"{filename} : {e.detail}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"{filename} : Erreur d'importation : {str(e)}")
+    parsed.fingerprint = fingerprint.hexdigest()
+    return parsed
+
+def merge_planning_files(files: List[PlanningFile]) -> Dict[str, Any]:
+    # Files are stored one after the other. Columns typed differently by two
+    # files (e.g. Excel numbers / CSV text) are stored as text; the counts of
+    # a file with such columns are taken again from its stored values.
+    schema = planning_store.merged_schema([table for parsed in files for table in parsed.tables])
+    aggregates = PlanningAggregates()
+    preview = []
+    with planning_store.PlanningWriter() as writer:
+        for parsed in files:
+            retyped = any(planning_store.retyped_columns(table, schema) for table in parsed.tables)
+            if retyped:
+                parsed.aggregates = PlanningAggregates()
+            for i, table in enumerate(parsed.tables):
+                with stage("merge"):
+                    table = planning_store.conform_table(table, schema)
+                    if len(preview) < 50:
+                        head = table.slice(0, 50 - len(preview)).to_pandas()
+                        preview.extend(frame_to_records(head[planning_schema.raw_columns(head)]))
+                    if retyped:
+                        parsed.aggregates.add(table.to_pandas())
+                with stage("store"):
+                    writer.write_table(table)
+                # Each table is released once written
+                parsed.tables[i] = None
+            aggregates.merge(parsed.aggregates)
+        writer.meta[planning_schema.COVERAGE_ATTR] = aggregates.coverage_direction
+        writer.meta[planning_schema.FINGERPRINT_ATTR] = planning_schema.combine_fingerprints(
+            [parsed.fingerprint for parsed in files])
+        writer.aggregates = aggregates
+    count_rows("upload", writer.row_count)
+
+    return {
+        "planning_id": writer.planning_id,
+        "row_count": writer.row_count,
+        "preview": preview,
+        "files": [parsed.report() for parsed in files]
+    }
+
+class RowUpdate(BaseModel):
+    match: Dict[str, Any] # column -> value, e.g. {"Employee ID": "E12"}
+    set: Dict[str, Any]   # column -> new value, e.g. {"Zone": "3"}
+
+class PlanningPatch(BaseModel):
+    # Rows are matched on column values (every given column must be equal)
+    append: List[Dict[str, Any]] = []
+    delete: List[Dict[str, Any]] = []
+    update: List[RowUpdate] = []
+
+@router.patch("/{planning_id}")
+async def patch_planning(planning_id: str, patch: PlanningPatch):
+    if not planning_store.planning_exists(planning_id):
+        raise HTTPException(status_code=404, detail=f"Planning introuvable : {planning_id}")
+    if not (patch.append or patch.delete or patch.update):
+        raise HTTPException(status_code=400, detail="Modification vide : rien à ajouter, supprimer ou modifier.")
+    return await compute_pool.run(fast_result, apply_planning_patch, planning_id, patch)
+
+def _match_mask(table, live: Optional[np.ndarray], match: Dict[str, Any]) -> np.ndarray:
+    mask = planning_store.row_mask(table, {column: [value] for column, value in match.items()})
+    if mask is None:
+        # An empty match would select every row
+        raise HTTPException(status_code=400, detail="Critère de sélection vide")
+    mask = mask.to_numpy(zero_copy_only=False)
+    return mask if live is None else mask & live
+
+def apply_planning_patch(planning_id: str, patch: PlanningPatch) -> Dict[str, Any]:
+    # Deleted and updated rows become tombstones, updated and appended rows a
+    # new segment; the row counts (costs, coverage, grouping partitions) are
+    # updated from these rows only (see planning_aggregates)
+    with planning_store.patch_lock:
+        meta = planning_store.load_planning_meta(planning_id)
+        aggregates = _read_aggregates(planning_id, meta)
+        # Stored rows (deleted ones masked out): positions are stored positions
+        table, live = planning_store.read_stored_rows(planning_id)
+        stored_columns = [c for c in table.column_names if c not in planning_schema.DERIVED_COLUMNS]
+        referenced = {c for match in patch.delete for c in match}
+        referenced |= {c for update in patch.update for c in list(update.match) + list(update.set)}
+        unknown = sorted(referenced - set(stored_columns))
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Colonnes inconnues : {', '.join(unknown)}")
+
+        try:
+            with stage("patch.match"):
+                deleted = np.zeros(table.num_rows, dtype=bool)
+                for match in patch.delete:
+                    deleted |= _match_mask(table, live, match)
+                update_masks = [_match_mask(table, live, update.match) & ~deleted for update in patch.update]
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=f"Critère invalide : {e}")
+        updated = np.logical_or.reduce(update_masks) if update_masks else np.zeros(table.num_rows, dtype=bool)
+        updated_rows = np.flatnonzero(updated)
+        removed_rows = np.flatnonzero(deleted | updated)
+
+        with stage("patch.rows"):
+            removed = planning_store.take_rows(table, removed_rows).to_pandas()
+            # Updated rows: stored values, then each update's new values in order
+            # (object columns: new values may not be of the stored type yet)
+            changed = planning_store.take_rows(table, updated_rows).select(stored_columns).to_pandas().astype(object)
+            for update, mask in zip(patch.update, update_masks):
+                rows = mask[updated_rows]
+                for column, value in update.set.items():
+                    changed.loc[rows, column] = value
+            added = [changed] if len(changed) else []
+            if patch.append:
+                appended = pd.DataFrame(patch.append)
+                added.append(PlanningNormalizer(list(appended.columns)).normalize(appended))
+            if added:
+                added = pd.concat(added, ignore_index=True)
+                try:
+                    added = planning_store.conform_rows(planning_id, planning_schema.add_canonical_columns(
+                        planning_store.conform_rows(planning_id, added)[stored_columns]))
+                except ValueError as e:
+                    raise HTTPException(status_code=400, detail=f"Lignes invalides : {e}")
+            else:
+                added = None
+
+        aggregates.revision = int(meta.get("revision", 0)) + 1
+        aggregates.remove(removed)
+        if added is not None:
+            aggregates.add(added)
+        fingerprint = planning_schema.PlanningFingerprint(meta.get(planning_schema.FINGERPRINT_ATTR))
+        fingerprint.section(b"-", len(removed))
+        fingerprint.update(removed)
+        fingerprint.section(b"+", len(added) if added is not None else 0)
+        if added is not None:
+            fingerprint.update(added)
+        with stage("patch.store"):
+            meta = planning_store.commit_patch(planning_id, added, removed_rows, aggregates, {
+                planning_schema.FINGERPRINT_ATTR: fingerprint.hexdigest(),
+                planning_schema.COVERAGE_ATTR: aggregates.coverage_direction
+            })
+    count_rows("patch", len(removed_rows) + (len(added) if added is not None else 0))
+
+    return {
+        "planning_id": planning_id,
+        "row_count": meta["row_count"],
+        "appended": len(patch.append),
+        "deleted": int(deleted.sum()),
+        "updated": len(updated_rows),
+        "revision": meta["revision"]
+    }
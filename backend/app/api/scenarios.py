@@ -0,0 +1,185 @@
+from fastapi import APIRouter, HTTPException, Depends
+from pydantic import BaseModel, ValidationError
+from typing import List, Dict, Any, Callable, Optional, Tuple
+from app.api.settings import get_settings, get_pricing_tables, get_settings_version, Settings, VehicleType
+from app.api.planning import load_planning_frame, load_planning_state
+from app.api.costs import CostInputs, StoredCostInputs, check_cost_volume, contract_terms
+from app.api.optimization import Simulation, budget_factor, partition_listings
+from app.core.metrics import count_rows, stage
+from app.core.responses import fast_result
+from app.services.compute_pool import compute_pool
+from app.services.grouping import VehicleTable
+from app.services.planning_aggregates import PlanningAggregates
+from app.services.planning_schema import ZONE_COLUMN, planning_fingerprint
+from app.services.result_cache import result_cache
+import numpy as np
+import pandas as pd
+
+router = APIRouter(prefix="/scenarios", tags=["Scenarios"])
+
+# Upper bound on the tariff variants compared by one /compare call
+MAX_SCENARIOS = 200
+# Name of the current settings in the comparison
+CURRENT_SCENARIO = "Paramètres actuels"
+
+class PricingScenario(BaseModel):
+    # Tariff proposal: the given fields replace those of the current settings
+    name: str
+    option_1_forfait_prices: Optional[dict[int, float]] = None
+    option_2_default_pickup_price: Optional[float] = None
+    option_2_line_prices: Optional[dict[str, float]] = None
+    vehicle_types: Optional[List[VehicleType]] = None
+
+class ScenarioRequest(BaseModel):
+    planning_data: Optional[List[Dict[str, Any]]] = None
+    planning_id: Optional[str] = None # Stored planning returned by /planning/upload
+    scenarios: List[PricingScenario]
+    override_coverage: Optional[str] = None # "ALLER", "ALLER_RETOUR"
+    window_minutes: Optional[int] = None
+    include_logistics: bool = True # Simulation budget of each scenario (grouping)
+
+class ScenarioResult(BaseModel):
+    rank: int
+    name: str
+    is_current: bool
+    option_1_contractual_total: float
+    option_2_contractual_total: float
+    best_option: str
+    best_total: float
+    savings: float
+    delta_vs_current: float # best_total minus that of the current settings
+    estimated_logistic_budget: Optional[float] = None
+
+class ScenarioComparison(BaseModel):
+    n_lines: int
+    n_employees: int
+    nb_jours_observes: int
+    coverage_type: str
+    is_extrapolated: bool
+    can_recommend: bool
+    scenarios: List[ScenarioResult] # Current settings included, cheapest first
+
+@router.post("/compare", response_model=ScenarioComparison)
+async def compare_scenarios(request: ScenarioRequest, settings: Settings = Depends(get_settings)):
+    if not request.scenarios:
+        raise HTTPException(status_code=400, detail="Aucun scénario à comparer")
+    if len(request.scenarios) > MAX_SCENARIOS:
+        raise HTTPException(status_code=400, detail=f"Trop de scénarios ({len(request.scenarios)}/{MAX_SCENARIOS})")
+    return await compute_pool.run(fast_result, compare, request, settings)
+
+def scenario_settings(settings: Settings, scenario: PricingScenario) -> Settings:
+    overrides = scenario.dict(exclude={"name"}, exclude_none=True)
+    try:
+        return Settings(**{**settings.dict(), **overrides})
+    except ValidationError as e:
+        raise HTTPException(status_code=400, detail=f"Scénario invalide ({scenario.name}) : {e}")
+
+def compare(request: ScenarioRequest, settings: Settings) -> ScenarioComparison:
+    variants = [scenario_settings(settings, scenario) for scenario in request.scenarios]
+    names = [CURRENT_SCENARIO] + [scenario.name for scenario in request.scenarios]
+    all_settings = [settings] + variants
+    window = request.window_minutes if request.window_minutes is not None else settings.grouping_window_minutes
+    versions = tuple((name, get_settings_version(s)) for name, s in zip(names, all_settings))
+
+    if request.planning_id:
+        meta, aggregates = load_planning_state(request.planning_id)
+        fingerprint = aggregates.fingerprint
+        make_inputs = lambda: StoredCostInputs(request.planning_id, meta, aggregates, settings)
+        groupings = lambda s: stored_groupings(request.planning_id, aggregates, s, window)
+    else:
+        df = load_planning_frame(None, request.planning_data)
+        fingerprint = planning_fingerprint(df)
+        make_inputs = lambda: CostInputs(df, settings)
+        groupings = lambda s: frame_groupings(df, s, window)
+
+    key = ("scenarios", fingerprint, versions, request.override_coverage, window, request.include_logistics)
+    return result_cache.get_or_compute(key, lambda: _compare(make_inputs(), names, all_settings, request,
+                                                             groupings if request.include_logistics else None))
+
+def frame_groupings(df: pd.DataFrame, settings: Settings, window: int) -> Tuple[np.ndarray, np.ndarray]:
+    grouping = Simulation(df, settings, window, check_volume=False).grouping
+    return grouping.vehicle_idx, grouping.max_zone
+
+def stored_groupings(planning_id: str, aggregates: PlanningAggregates, settings: Settings,
+                     window: int) -> Tuple[np.ndarray, np.ndarray]:
+    # Cached partition groupings (shared with /optimization/analyze)
+    listings = partition_listings(planning_id, aggregates, settings, window)
+    if listings is None:
+        # Patched meanwhile: grouped on the rows read now
+        return frame_groupings(load_planning_frame(planning_id, None), settings, window)
+    groups = [listing.grouping for _, listing in listings]
+    return (np.concatenate([g.vehicle_idx for g in groups] or [np.empty(0, dtype=np.int64)]),
+            np.concatenate([g.max_zone for g in groups] or [np.empty(0, dtype=np.int64)]))
+
+def capacity_profile(vehicles: VehicleTable) -> Tuple:
+    # Groups (and the vehicle index of each) only depend on the capacities
+    return tuple(vehicles.capacities.tolist()), vehicles.max_capacity
+
+def _compare(inputs, names: List[str], all_settings: List[Settings], request: ScenarioRequest,
+             groupings: Optional[Callable[[Settings], Tuple[np.ndarray, np.ndarray]]]) -> ScenarioComparison:
+    # Every tariff is applied to quantities computed once for the planning:
+    # employees per max zone (option 1), pickups per line (option 2) and
+    # groups per (vehicle, zone) for each capacity profile (logistics), so a
+    # scenario costs a few dot products
+    check_cost_volume(inputs.n_lines)
+    count_rows("scenarios", inputs.n_lines)
+    tables = [get_pricing_tables(s) for s in all_settings]
+
+    with stage("scenarios.basis"):
+        zones, employees = np.unique(inputs.employee_zones[ZONE_COLUMN].to_numpy(dtype=np.int64), return_counts=True)
+        line_counts = inputs.line_counts()
+        lines = list(line_counts)
+        pickups = np.array([line_counts[line] for line in lines], dtype=np.float64)
+
+    coverage_direction, can_recommend, option_2_factor = contract_terms(inputs, request.override_coverage)
+    with stage("scenarios.prices"):
+        forfait_prices = np.array([pricing.forfait_costs(zones) for pricing in tables]).reshape(len(tables), len(zones))
+        line_prices = np.array([[pricing.pickup_price(line) for line in lines] for pricing in tables]).reshape(len(tables), len(lines))
+        op1_totals = forfait_prices @ employees.astype(np.float64)
+        op2_totals = line_prices @ pickups * option_2_factor
+
+    logistic_budgets = None
+    if groupings is not None:
+        factor = budget_factor(inputs.nb_jours_observes, inputs.coverage_direction, request.override_coverage)
+        profiles = {}
+        for i, pricing in enumerate(tables):
+            profiles.setdefault(capacity_profile(pricing.vehicles), []).append(i)
+        logistic_budgets = np.zeros(len(tables))
+        for indices in profiles.values():
+            if not len(tables[indices[0]].vehicles):
+                continue
+            # Grouped once per profile, with the settings of its first scenario
+            # (the current settings when they share it)
+            with stage("scenarios.groups"):
+                vehicle_idx, max_zone = groupings(all_settings[indices[0]])
+            group_zones, zone_pos = np.unique(max_zone, return_inverse=True)
+            group_counts = np.zeros((len(tables[indices[0]].vehicles), len(group_zones)))
+            np.add.at(group_counts, (vehicle_idx, zone_pos), 1)
+            for i in indices:
+                logistic_budgets[i] = float((tables[i].vehicles.price_matrix(group_zones) * group_counts).sum()) * factor
+
+    best_totals = np.minimum(op1_totals, op2_totals)
+    results = []
+    for rank, i in enumerate(np.argsort(best_totals, kind="stable"), start=1):
+        results.append(ScenarioResult(
+            rank=rank,
+            name=names[i],
+            is_current=bool(i == 0),
+            option_1_contractual_total=op1_totals[i],
+            option_2_contractual_total=op2_totals[i],
+            best_option="Option 1 (Forfait)" if op1_totals[i] < op2_totals[i] else "Option 2 (Prise en charge)",
+            best_total=best_totals[i],
+            savings=abs(op2_totals[i] - op1_totals[i]),
+            delta_vs_current=best_totals[i] - best_totals[0],
+            estimated_logistic_budget=logistic_budgets[i] if logistic_budgets is not None else None
+        ))
+
+    return ScenarioComparison(
+        n_lines=inputs.n_lines,
+        n_employees=inputs.employee_zones["Employee ID"].nunique(),
+        nb_jours_observes=inputs.nb_jours_observes,
+        coverage_type=coverage_direction,
+        is_extrapolated=not can_recommend,
+        can_recommend=can_recommend,
+        scenarios=results
+    )
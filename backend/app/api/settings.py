@@ -39,8 +39,12 @@ class Settings(BaseModel):
         VehicleType(name="Hiace", capacity=13, base_price=25000.0, zone_prices={1: 25000.0, 2: 35000.0, 3: 45000.0})
     ]
 
+import hashlib
 import json
 import os
+import threading
+
+from app.services.pricing import PricingTables
 
 SETTINGS_FILE = "data/settings.json"
 
@@ -59,13 +63,68 @@ def save_settings_file(settings: Settings):
     with open(SETTINGS_FILE, "w") as f:
         json.dump(settings.dict(), f, indent=2)
 
+def settings_version(settings: Settings) -> str:
+    # Content hash: identical settings share a version across restarts/workers
+    payload = json.dumps(settings.dict(), sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode()).hexdigest()[:16]
+
+class SettingsCache:
+    # Process-wide copy of the settings file with its compiled pricing tables.
+    # Reloaded when update_settings writes the file or its mtime changes.
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._mtime = None
+        self.settings = None
+        self.version = None
+        self.pricing = None
+
+    def _file_mtime(self):
+        try:
+            return os.stat(SETTINGS_FILE).st_mtime_ns
+        except OSError:
+            return None
+
+    def _install(self, settings: Settings, mtime):
+        self.settings = settings
+        self.version = settings_version(settings)
+        self.pricing = PricingTables(settings)
+        self._mtime = mtime
+
+    def get(self) -> Settings:
+        mtime = self._file_mtime()
+        if self.settings is None or mtime != self._mtime:
+            with self._lock:
+                if self.settings is None or mtime != self._mtime:
+                    self._install(load_settings_file(), mtime)
+        return self.settings
+
+    def replace(self, settings: Settings):
+        with self._lock:
+            save_settings_file(settings)
+            self._install(settings, self._file_mtime())
+
+settings_cache = SettingsCache()
+
+def get_pricing_tables(settings: Settings) -> PricingTables:
+    # Compiled tables of the cached settings; ad-hoc settings are compiled on the fly
+    settings_cache.get()
+    if settings is settings_cache.settings:
+        return settings_cache.pricing
+    return PricingTables(settings)
+
+def get_settings_version(settings: Settings) -> str:
+    settings_cache.get()
+    if settings is settings_cache.settings:
+        return settings_cache.version
+    return settings_version(settings)
+
 @router.get("/", response_model=Settings)
 async def get_settings():
-    return load_settings_file()
+    return settings_cache.get()
 
 @router.post("/", response_model=Settings)
 async def update_settings(settings: Settings):
     if settings.grouping_window_minutes <= 0:
         raise HTTPException(status_code=400, detail="Grouping window must be positive")
-    save_settings_file(settings)
+    settings_cache.replace(settings)
     return settings
@@ -8,9 +8,37 @@ class Settings(BaseSettings):
     SECRET_KEY: str = "super_secret_key_change_me_in_prod"
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60
+    # Verified tokens kept in memory until their expiry
+    TOKEN_CACHE_SIZE: int = 10000
+    # User store backend: "memory" (built-in admin) or "json" (USERS_FILE)
+    USER_STORE: str = "memory"
+    USERS_FILE: str = "data/users.json"
     
     # Server
     DEBUG: bool = False
+    # orjson-rendered responses for the large payloads (planning, costs, optimization)
+    FAST_JSON_RESPONSES: bool = True
+    # Responses above this size are compressed (brotli or gzip, negotiated)
+    COMPRESSION_MIN_BYTES: int = 1024
+    # Per-stage durations (load, parse, grouping, serialize...) sent as a Server-Timing header
+    SERVER_TIMING: bool = True
+    
+    # Planning ingestion: rows parsed per chunk when streaming an upload
+    PLANNING_CHUNK_ROWS: int = 50000
+    # Batch upload (one file per site, merged into one planning): max files per request
+    PLANNING_BATCH_MAX_FILES: int = 20
+    # Worker processes parsing the files of a batch upload side by side
+    PLANNING_PARSE_WORKERS: int = 4
+    
+    # Cost / optimization result cache (approximate memory budget, bytes)
+    RESULT_CACHE_MAX_BYTES: int = 256 * 1024 * 1024
+    
+    # Optimization jobs: worker processes and max queued + running jobs
+    OPTIMIZATION_WORKERS: int = 2
+    OPTIMIZATION_QUEUE_DEPTH: int = 8
+    
+    # Threads running the blocking part of the async endpoints (parsing, pandas, reports)
+    COMPUTE_THREADS: int = 4
     
     class Config:
         env_file = ".env"
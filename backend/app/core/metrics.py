@@ -0,0 +1,194 @@
+import contextvars
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, Iterator, List, Tuple
+
+from starlette.datastructures import MutableHeaders
+
+# Upper bounds (seconds) of the latency histogram buckets
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Stage durations of the current request (name -> seconds), see stage()
+_request_stages: contextvars.ContextVar = contextvars.ContextVar("request_stages", default=None)
+
+
+def _label_value(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{_label_value(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = ()):
+        self.name, self.help, self.labels = name, help, labels
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, *label_values: str):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for values, total in sorted(self._values.items()):
+                lines.append(f"{self.name}{_labels(self.labels, values)} {total}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = (), buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.name, self.help, self.labels, self.buckets = name, help, labels, buckets
+        self._series: Dict[Tuple[str, ...], list] = {}  # labels -> [bucket counts, sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values: str):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [[0] * len(self.buckets), 0.0, 0]
+            if index < len(self.buckets):
+                series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for values, (counts, total, count) in sorted(self._series.items()):
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets, counts):
+                    cumulative += bucket_count
+                    le = 'le="%s"' % bound
+                    lines.append(f"{self.name}_bucket{_labels(self.labels, values, le)} {cumulative}")
+                le = 'le="+Inf"'
+                lines.append(f"{self.name}_bucket{_labels(self.labels, values, le)} {count}")
+                lines.append(f"{self.name}_sum{_labels(self.labels, values)} {total}")
+                lines.append(f"{self.name}_count{_labels(self.labels, values)} {count}")
+        return lines
+
+
+# Gauge values read at scrape time: name, help, [(labels dict, value)]
+GaugeFamily = Tuple[str, str, List[Tuple[Dict[str, str], float]]]
+
+
+class MetricsRegistry:
+    # Prometheus text exposition of the counters / histograms below plus the
+    # gauges of the registered collectors (pools, caches)
+    def __init__(self):
+        self._metrics = []
+        self._collectors: List[Callable[[], Iterable[GaugeFamily]]] = []
+
+    def counter(self, *args, **kwargs) -> Counter:
+        metric = Counter(*args, **kwargs)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, *args, **kwargs) -> Histogram:
+        metric = Histogram(*args, **kwargs)
+        self._metrics.append(metric)
+        return metric
+
+    def add_collector(self, collector: Callable[[], Iterable[GaugeFamily]]):
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        for collector in self._collectors:
+            for name, help, samples in collector():
+                lines.append(f"# HELP {name} {help}")
+                lines.append(f"# TYPE {name} gauge")
+                for labels, value in samples:
+                    names = tuple(labels)
+                    lines.append(f"{name}{_labels(names, tuple(labels[n] for n in names))} {float(value)}")
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
+request_seconds = metrics.histogram("http_request_duration_seconds", "Request latency until the response headers",
+                                    ("method", "route", "status"))
+stage_seconds = metrics.histogram("stage_duration_seconds", "Duration of the timed request stages", ("stage",))
+rows_processed = metrics.counter("rows_processed_total", "Planning rows processed per pipeline", ("pipeline",))
+
+
+@contextmanager
+def stage(name: str):
+    # Times a block (or, as a decorator, a function): reported in the
+    # Server-Timing header of the current request and in stage_seconds.
+    # Repeated stages (e.g. once per upload chunk) are summed.
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        stages = _request_stages.get()
+        if stages is not None:
+            stages[name] = stages.get(name, 0.0) + elapsed
+        stage_seconds.observe(elapsed, name)
+
+
+def timed(iterable: Iterable, name: str) -> Iterator:
+    # Times the production of each item (e.g. chunks parsed by a reader)
+    iterator = iter(iterable)
+    while True:
+        with stage(name):
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+        yield item
+
+
+def count_rows(pipeline: str, rows: int):
+    rows_processed.inc(rows, pipeline)
+
+
+def server_timing(stages: Dict[str, float], total: float) -> str:
+    entries = [f"{name};dur={seconds * 1000:.1f}" for name, seconds in stages.items()]
+    entries.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(entries)
+
+
+class TimingMiddleware:
+    # Outermost middleware: collects the stages of each request, adds them as
+    # a Server-Timing header and records the latency per route template
+    def __init__(self, app, server_timing_header: bool = True):
+        self.app = app
+        self.server_timing_header = server_timing_header
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stages: Dict[str, float] = {}
+        token = _request_stages.set(stages)
+        start = time.perf_counter()
+        response = {"status": 500, "elapsed": None}
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                response["status"] = message["status"]
+                response["elapsed"] = time.perf_counter() - start
+                if self.server_timing_header:
+                    MutableHeaders(scope=message).append("Server-Timing", server_timing(stages, response["elapsed"]))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _request_stages.reset(token)
+            # Route template, not the raw path: one series per endpoint
+            route = getattr(scope.get("route"), "path", "unmatched")
+            elapsed = response["elapsed"] if response["elapsed"] is not None else time.perf_counter() - start
+            request_seconds.observe(elapsed, scope["method"], route, str(response["status"]))
@@ -0,0 +1,66 @@
+import json
+from typing import Any, Callable, Iterable, Iterator
+
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+from starlette.middleware.gzip import GZipMiddleware
+
+from app.core.config import settings
+from app.core.metrics import stage
+
+try:
+    import orjson
+except ImportError:  # standard JSON encoder fallback
+    orjson = None
+
+
+class FastJSONResponse(JSONResponse):
+    def render(self, content: Any) -> bytes:
+        if orjson is None:
+            return super().render(content)
+        # NaN -> null, numpy scalars/arrays serialized natively
+        return orjson.dumps(content, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+
+
+def fast_response(result: Any) -> Any:
+    # Opt-in fast path for large payloads: the result is dumped once and
+    # returned as a ready response, so FastAPI skips re-validating it against
+    # the response_model. The body is rendered here, on the calling thread.
+    if not settings.FAST_JSON_RESPONSES:
+        return result
+    with stage("serialize"):
+        if isinstance(result, BaseModel):
+            result = result.model_dump()
+        return FastJSONResponse(result)
+
+
+def fast_result(fn: Callable, *args) -> Any:
+    # fn(*args) and its serialization in one call, e.g. on the compute pool
+    return fast_response(fn(*args))
+
+
+def ndjson_lines(records: Iterable[Any], batch: int = 1000) -> Iterator[bytes]:
+    # One JSON document per line, sent in blocks of `batch` lines
+    lines = []
+    for record in records:
+        if orjson is not None:
+            lines.append(orjson.dumps(record, option=orjson.OPT_SERIALIZE_NUMPY))
+        else:
+            lines.append(json.dumps(record, default=str).encode())
+        if len(lines) >= batch:
+            yield b"\n".join(lines) + b"\n"
+            lines = []
+    if lines:
+        yield b"\n".join(lines) + b"\n"
+
+
+def add_compression(app: FastAPI):
+    # Brotli when brotli-asgi is installed (gzip fallback for other clients),
+    # else gzip; small responses are sent as is
+    try:
+        from brotli_asgi import BrotliMiddleware
+    except ImportError:
+        app.add_middleware(GZipMiddleware, minimum_size=settings.COMPRESSION_MIN_BYTES)
+    else:
+        app.add_middleware(BrotliMiddleware, minimum_size=settings.COMPRESSION_MIN_BYTES, gzip_fallback=True)
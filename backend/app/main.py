@@ -1,11 +1,29 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
-from app.api import planning, settings, costs, optimization, dashboard, history, auth
+from app.api import planning, settings, costs, optimization, scenarios, dashboard, history, auth
 
 from app.core.config import settings as config_settings
+from app.core.metrics import TimingMiddleware, metrics
+from app.core.responses import add_compression
+from app.services.compute_pool import compute_pool
+from app.services.history_store import history_store
+from app.services.jobs import job_manager
+from app.services.result_cache import result_cache
+from app.services.worker_pool import worker_pool
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    job_manager.shutdown()
+    compute_pool.shutdown()
+    worker_pool.shutdown()
+    history_store.close()
 
 app = FastAPI(
     title='Transport Cost Optimization API',
+    lifespan=lifespan,
     debug=config_settings.DEBUG,
     docs_url="/docs" if config_settings.DEBUG else None,
     redoc_url="/redoc" if config_settings.DEBUG else None,
@@ -19,15 +37,48 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+add_compression(app)
+# Added last: outermost, so its timings cover the other middlewares
+app.add_middleware(TimingMiddleware, server_timing_header=config_settings.SERVER_TIMING)
 
 app.include_router(auth.router)
 app.include_router(planning.router)
 app.include_router(settings.router)
 app.include_router(costs.router)
 app.include_router(optimization.router)
+app.include_router(scenarios.router)
 app.include_router(dashboard.router)
 app.include_router(history.router)
 
 @app.get('/')
 def read_root():
     return {'message': 'Welcome to the Transport Cost Optimization API'}
+
+def runtime_gauges():
+    # Read at each /metrics scrape
+    pool = compute_pool.stats()
+    cache = result_cache.stats()
+    yield ('compute_pool_active_threads', 'Compute pool threads running a task', [({}, pool['active'])])
+    yield ('compute_pool_queued_tasks', 'Tasks waiting for a compute pool thread', [({}, pool['queued'])])
+    yield ('optimization_jobs_pending', 'Optimization jobs queued or running', [({}, job_manager.pending_count())])
+    yield ('result_cache_hit_rate', 'Result cache hits / lookups since start', [({}, cache['hit_rate'])])
+    yield ('result_cache_lookups', 'Result cache lookups since start',
+           [({'result': 'hit'}, cache['hits']), ({'result': 'miss'}, cache['misses'])])
+    yield ('result_cache_bytes', 'Approximate size of the cached results', [({}, cache['bytes'])])
+
+metrics.add_collector(runtime_gauges)
+
+@app.get('/metrics', response_class=PlainTextResponse)
+def read_metrics():
+    # Prometheus text format
+    return PlainTextResponse(metrics.render(), media_type='text/plain; version=0.0.4; charset=utf-8')
+
+@app.get('/status')
+def read_status():
+    # Compute pool saturation: saturation 1.0 with queued > 0 means heavy
+    # requests are waiting for a thread (see COMPUTE_THREADS)
+    return {
+        'compute_pool': compute_pool.stats(),
+        'optimization_jobs': {'pending': job_manager.pending_count(), 'queue_depth': job_manager.queue_depth},
+        'result_cache': result_cache.stats()
+    }
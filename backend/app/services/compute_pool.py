@@ -0,0 +1,71 @@
+import asyncio
+import contextvars
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable
+
+from app.core.config import settings as config_settings
+
+
+class ComputePool:
+    # Blocking work of the async endpoints (pandas, Excel parsing, ReportLab)
+    # runs on this bounded thread pool, so the event loop keeps serving the
+    # light endpoints (/token, /settings) while heavy requests are in flight.
+    def __init__(self, max_workers: int):
+        self.max_workers = max(1, max_workers)
+        self._executor = None
+        self._lock = threading.Lock()
+        self.active = 0
+        self.queued = 0
+        self.completed = 0
+        self.total_wait_seconds = 0.0
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="compute")
+            return self._executor
+
+    async def run(self, fn: Callable, *args) -> Any:
+        submitted_at = time.perf_counter()
+        with self._lock:
+            self.queued += 1
+        # The request context (e.g. its stage timings) follows fn on the thread
+        context = contextvars.copy_context()
+
+        def task():
+            with self._lock:
+                self.queued -= 1
+                self.active += 1
+                self.total_wait_seconds += time.perf_counter() - submitted_at
+            try:
+                return context.run(fn, *args)
+            finally:
+                with self._lock:
+                    self.active -= 1
+                    self.completed += 1
+
+        return await asyncio.get_running_loop().run_in_executor(self._get_executor(), task)
+
+    def stats(self) -> dict:
+        with self._lock:
+            started = self.completed + self.active
+            return {
+                "max_workers": self.max_workers,
+                "active": self.active,
+                "queued": self.queued,
+                "completed": self.completed,
+                # 1.0 = every thread busy; queued > 0 means requests are waiting
+                "saturation": self.active / self.max_workers,
+                "avg_wait_ms": 1000 * self.total_wait_seconds / started if started else 0.0
+            }
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False)
+                self._executor = None
+
+
+compute_pool = ComputePool(config_settings.COMPUTE_THREADS)
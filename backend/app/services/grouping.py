@@ -0,0 +1,227 @@
+import sys
+import numpy as np
+import pandas as pd
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+
+class VehicleTable:
+    # Vehicles sorted by capacity, with a count -> vehicle lookup precomputed
+    # for every group size the grouping can produce (1..max_capacity).
+    def __init__(self, vehicle_types: Sequence[Any], max_capacity: int):
+        ordered = sorted(vehicle_types, key=lambda v: v.capacity)
+        self.names = [v.name for v in ordered]
+        self.capacities = np.array([v.capacity for v in ordered], dtype=np.int64)
+        self.base_prices = [float(v.base_price) for v in ordered]
+        self.zone_prices = [dict(v.zone_prices) for v in ordered]
+        self.max_capacity = max(int(max_capacity), 1)
+
+        counts = np.arange(self.max_capacity + 1)
+        if ordered:
+            # Smallest vehicle able to carry the group, else the largest one
+            by_count = np.searchsorted(self.capacities, counts, side="left")
+            self.by_count = np.minimum(by_count, len(ordered) - 1)
+        else:
+            self.by_count = np.full(len(counts), -1, dtype=np.int64)
+
+    def __len__(self):
+        return len(self.names)
+
+    def price_matrix(self, zones: np.ndarray) -> np.ndarray:
+        # prices[v, k] = price of vehicle v for zone zones[k] (base price if unlisted)
+        prices = np.empty((len(self), len(zones)), dtype=np.float64)
+        for v in range(len(self)):
+            zone_prices, base = self.zone_prices[v], self.base_prices[v]
+            prices[v] = [zone_prices.get(int(z), base) for z in zones]
+        return prices
+
+
+class GroupingResult:
+    def __init__(self, starts, counts, max_zone, vehicle_idx, cost, capacity, occupancy):
+        self.starts = starts
+        self.counts = counts
+        self.max_zone = max_zone
+        self.vehicle_idx = vehicle_idx
+        self.cost = cost
+        self.capacity = capacity
+        self.occupancy = occupancy
+
+    def __len__(self):
+        return len(self.starts)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(a.nbytes for a in (self.starts, self.counts, self.max_zone, self.vehicle_idx, self.cost,
+                                      self.capacity, self.occupancy))
+
+    @property
+    def total_cost(self) -> float:
+        return float(self.cost.sum())
+
+    @property
+    def avg_occupancy(self) -> float:
+        return float(self.occupancy.mean()) if len(self) else 0.0
+
+    def take(self, groups: slice, first_row: int) -> "GroupingResult":
+        # Contiguous groups, their starts made relative to first_row
+        return GroupingResult(self.starts[groups] - first_row, self.counts[groups], self.max_zone[groups],
+                              self.vehicle_idx[groups], self.cost[groups], self.capacity[groups],
+                              self.occupancy[groups])
+
+    def to_records(self, times: np.ndarray, employees: np.ndarray, vehicles: VehicleTable,
+                   limit: Optional[int] = None, offset: int = 0) -> List[Dict[str, Any]]:
+        stop = len(self) if limit is None else min(offset + limit, len(self))
+        records = []
+        for g in range(offset, stop):
+            start, count = int(self.starts[g]), int(self.counts[g])
+            v = int(self.vehicle_idx[g])
+            records.append({
+                "start_time": str(pd.Timestamp(times[start])),
+                "count": count,
+                "vehicle": vehicles.names[v] if v >= 0 else "Inconnu",
+                "cost": float(self.cost[g]),
+                "occupancy": float(self.occupancy[g]),
+                "capacity": int(self.capacity[g]),
+                "employees": employees[start:start + count].tolist()
+            })
+        return records
+
+
+class GroupListing:
+    # Groups of one simulation with the sorted pickup arrays needed to list
+    # them, page by page or as a stream (picklable: kept in the result cache)
+    def __init__(self, grouping: GroupingResult, times: np.ndarray, employees: np.ndarray, vehicles: VehicleTable):
+        self.grouping = grouping
+        self.times = times
+        self.employees = employees
+        self.vehicles = vehicles
+
+    def __len__(self):
+        return len(self.grouping)
+
+    @property
+    def nbytes(self) -> int:
+        # Approximate footprint (result cache budget): the arrays, employee IDs
+        # sized like the first one, the shared vehicle table left out
+        ids = self.employees
+        return (self.grouping.nbytes + self.times.nbytes + ids.nbytes
+                + (sys.getsizeof(ids[0]) * len(ids) if len(ids) else 0))
+
+    def records(self, offset: int = 0, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        return self.grouping.to_records(self.times, self.employees, self.vehicles, limit=limit, offset=offset)
+
+    def iter_records(self, offset: int = 0, batch: int = 1000) -> Iterator[Dict[str, Any]]:
+        # Group dicts (with their employee lists) are only built batch by batch
+        for start in range(offset, len(self), batch):
+            yield from self.records(start, batch)
+
+    def split(self, partitions: np.ndarray) -> List[Tuple[int, "GroupListing"]]:
+        # One listing per partition, `partitions` being the partition code of
+        # each sorted row (groups never span two partitions): [(first row, listing)]
+        if not len(partitions):
+            return []
+        bounds = np.flatnonzero(np.diff(partitions)) + 1
+        row_starts = np.concatenate(([0], bounds))
+        row_ends = np.concatenate((bounds, [len(partitions)]))
+        group_starts = np.searchsorted(self.grouping.starts, row_starts)
+        group_ends = np.searchsorted(self.grouping.starts, row_ends)
+        return [(int(first), GroupListing(self.grouping.take(slice(g0, g1), first), self.times[first:last],
+                                          self.employees[first:last], self.vehicles))
+                for first, last, g0, g1 in zip(row_starts, row_ends, group_starts, group_ends)]
+
+
+def key_value_order(value: Any) -> Tuple[bool, str]:
+    # Order of partition key values: by text, missing values last
+    return (True, "") if value is None or pd.isna(value) else (False, str(value))
+
+
+def partition_order(times: np.ndarray, keys: Sequence[pd.Series]) -> Tuple[np.ndarray, np.ndarray]:
+    # Row order grouping the pickups by partition (e.g. Date x Dropoff Point),
+    # chronological inside each partition (NaT last), with partitions ordered
+    # by their first pickup, then by key (key_value_order of each column).
+    # Returns (order, partition code of each sorted row).
+    times = times.astype("datetime64[ns]")
+    sort_key = times.view(np.int64).copy()
+    sort_key[np.isnat(times)] = np.iinfo(np.int64).max
+    if keys:
+        # Combined key codes in key order, kept dense after each column
+        # (missing values are a partition too)
+        codes = np.zeros(len(times), dtype=np.int64)
+        for key in keys:
+            key_codes, uniques = pd.factorize(key, use_na_sentinel=False)
+            ranks = np.empty(len(uniques), dtype=np.int64)
+            ranks[sorted(range(len(uniques)), key=lambda i: key_value_order(uniques[i]))] = np.arange(len(uniques))
+            codes = pd.factorize(codes * (len(uniques) + 1) + ranks[key_codes], sort=True)[0]
+        first_pickup = np.full(codes.max() + 1, np.iinfo(np.int64).max)
+        np.minimum.at(first_pickup, codes, sort_key)
+        rank = np.empty(len(first_pickup), dtype=np.int64)
+        rank[np.argsort(first_pickup, kind="stable")] = np.arange(len(first_pickup))
+        codes = rank[codes]
+    else:
+        codes = np.zeros(len(times), dtype=np.int64)
+    order = np.lexsort((sort_key, codes))
+    return order, codes[order]
+
+
+def group_boundaries(times: np.ndarray, window_minutes: float, max_capacity: int,
+                     partitions: Optional[np.ndarray] = None) -> np.ndarray:
+    # Same greedy rule as the historical loop: a group opens on the first free
+    # pickup and takes every following pickup within `window_minutes` of it,
+    # up to `max_capacity` people. `times` must be sorted (NaT last) inside
+    # each partition; groups never span two partitions (rows sorted by partition).
+    n = len(times)
+    if n == 0:
+        return np.empty(0, dtype=np.int64)
+    times = times.astype("datetime64[ns]")
+    cap = max(int(max_capacity), 1)
+    idx = np.arange(n)
+
+    window = np.timedelta64(int(round(window_minutes * 60 * 1_000_000_000)), "ns")
+    if partitions is None:
+        ends = np.searchsorted(times, times + window, side="right")
+    else:
+        # Window ends searched inside each partition, so they stop at its last row
+        bounds = np.concatenate(([0], np.flatnonzero(np.diff(partitions)) + 1, [n]))
+        ends = np.empty(n, dtype=np.int64)
+        for lo, hi in zip(bounds[:-1], bounds[1:]):
+            part = times[lo:hi]
+            ends[lo:hi] = lo + np.searchsorted(part, part + window, side="right")
+    ends = np.clip(ends, idx + 1, idx + cap)
+    # A pickup without timestamp never matches anything
+    ends[np.isnat(times)] = idx[np.isnat(times)] + 1
+
+    next_start = ends.tolist()
+    starts = []
+    i = 0
+    while i < n:
+        starts.append(i)
+        i = next_start[i]
+    return np.asarray(starts, dtype=np.int64)
+
+
+def aggregate_groups(starts: np.ndarray, n_rows: int, zones: np.ndarray,
+                     vehicles: VehicleTable) -> GroupingResult:
+    counts = np.diff(np.append(starts, n_rows))
+    if len(starts) == 0:
+        empty = np.empty(0)
+        return GroupingResult(starts, counts, empty.astype(np.int64), empty.astype(np.int64), empty, empty.astype(np.int64), empty)
+
+    max_zone = np.maximum.reduceat(zones.astype(np.int64), starts)
+
+    if len(vehicles):
+        vehicle_idx = vehicles.by_count[counts]
+        capacity = vehicles.capacities[vehicle_idx]
+        unique_zones, zone_pos = np.unique(max_zone, return_inverse=True)
+        cost = vehicles.price_matrix(unique_zones)[vehicle_idx, zone_pos]
+    else:
+        vehicle_idx = np.full(len(starts), -1, dtype=np.int64)
+        capacity = counts.copy()
+        cost = np.zeros(len(starts))
+
+    occupancy = np.divide(counts, capacity, out=np.zeros(len(starts)), where=capacity > 0) * 100
+    return GroupingResult(starts, counts, max_zone, vehicle_idx, cost, capacity, occupancy)
+
+
+def group_pickups(times: np.ndarray, zones: np.ndarray, window_minutes: float,
+                  vehicles: VehicleTable, partitions: Optional[np.ndarray] = None) -> GroupingResult:
+    starts = group_boundaries(times, window_minutes, vehicles.max_capacity, partitions)
+    return aggregate_groups(starts, len(times), zones, vehicles)
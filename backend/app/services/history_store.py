@@ -0,0 +1,217 @@
+import base64
+import json
+import os
+import sqlite3
+import threading
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+# Archived reports live in an embedded SQLite database: appends are single
+# inserts and list views read an index on date, without the snapshots.
+HISTORY_DB = "data/history.db"
+# Whole-file JSON store used before, imported once on first use
+LEGACY_HISTORY_FILE = "data/history.json"
+
+SUMMARY_FIELDS = ["id", "date", "total_cost", "savings", "total_vehicles", "total_employees"]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS history (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    id TEXT NOT NULL,
+    date TEXT NOT NULL,
+    total_cost REAL NOT NULL,
+    savings REAL NOT NULL,
+    total_vehicles INTEGER NOT NULL,
+    total_employees INTEGER NOT NULL,
+    data_snapshot TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS history_date ON history (date, seq);
+CREATE INDEX IF NOT EXISTS history_id ON history (id);
+CREATE TABLE IF NOT EXISTS history_rollups (
+    granularity TEXT NOT NULL,
+    period_start TEXT NOT NULL,
+    entries INTEGER NOT NULL,
+    total_cost REAL NOT NULL,
+    savings REAL NOT NULL,
+    total_vehicles INTEGER NOT NULL,
+    total_employees INTEGER NOT NULL,
+    PRIMARY KEY (granularity, period_start)
+);
+"""
+
+# Aggregates kept per period, updated in the same transaction as each append
+ROLLUP_GRANULARITIES = ["day", "week", "month", "quarter"]
+ROLLUP_FIELDS = ["entries", "total_cost", "savings", "total_vehicles", "total_employees"]
+
+
+def period_start(day: date, granularity: str) -> date:
+    if granularity == "week":
+        return day - timedelta(days=day.weekday())
+    if granularity == "month":
+        return day.replace(day=1)
+    if granularity == "quarter":
+        return day.replace(month=(day.month - 1) // 3 * 3 + 1, day=1)
+    return day
+
+
+def period_label(start: date, granularity: str) -> str:
+    if granularity == "week":
+        iso_year, iso_week, _ = start.isocalendar()
+        return f"{iso_year}-W{iso_week:02d}"
+    if granularity == "month":
+        return start.strftime("%b %Y")
+    if granularity == "quarter":
+        return f"Q{(start.month - 1) // 3 + 1} {start.year}"
+    return start.isoformat()
+
+
+class InvalidCursorError(ValueError):
+    pass
+
+
+def encode_cursor(date: str, seq: int) -> str:
+    return base64.urlsafe_b64encode(f"{date}|{seq}".encode()).decode()
+
+
+def decode_cursor(cursor: str) -> Tuple[str, int]:
+    try:
+        date, seq = base64.urlsafe_b64decode(cursor.encode()).decode().rsplit("|", 1)
+        return date, int(seq)
+    except (ValueError, UnicodeDecodeError):
+        raise InvalidCursorError(cursor)
+
+
+class HistoryStore:
+    def __init__(self, path: str, legacy_path: Optional[str] = None):
+        self.path = path
+        self.legacy_path = legacy_path
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        # Opened lazily (and shared between threads, behind the lock)
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+            # Kept only once both steps succeeded: a failed import is retried
+            # on next use (each step is a single transaction)
+            try:
+                self._backfill_rollups(conn)
+                self._import_legacy(conn)
+            except Exception:
+                conn.close()
+                raise
+            self._conn = conn
+        return self._conn
+
+    def _import_legacy(self, conn: sqlite3.Connection):
+        if not self.legacy_path or not os.path.exists(self.legacy_path):
+            return
+        try:
+            with open(self.legacy_path, "r") as f:
+                entries = json.load(f)
+        except (OSError, ValueError):
+            entries = []
+        with conn:
+            for entry in entries:
+                self._insert(conn, entry)
+        os.replace(self.legacy_path, self.legacy_path + ".imported")
+
+    def _backfill_rollups(self, conn: sqlite3.Connection):
+        # Databases created before the rollups existed: aggregate them once
+        if conn.execute("SELECT 1 FROM history_rollups LIMIT 1").fetchone() is not None:
+            return
+        with conn:
+            for row in conn.execute(f"SELECT date, {', '.join(ROLLUP_FIELDS[1:])} FROM history"):
+                self._add_to_rollups(conn, dict(row))
+
+    def _insert(self, conn: sqlite3.Connection, entry: Dict[str, Any]):
+        conn.execute(
+            "INSERT INTO history (id, date, total_cost, savings, total_vehicles, total_employees, data_snapshot) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (entry["id"], entry["date"], entry["total_cost"], entry["savings"],
+             entry.get("total_vehicles", 0), entry.get("total_employees", 0),
+             json.dumps(entry.get("data_snapshot", {})))
+        )
+        self._add_to_rollups(conn, entry)
+
+    def _add_to_rollups(self, conn: sqlite3.Connection, entry: Dict[str, Any]):
+        day = datetime.fromisoformat(entry["date"]).date()
+        values = [1, entry["total_cost"], entry["savings"], entry.get("total_vehicles", 0), entry.get("total_employees", 0)]
+        for granularity in ROLLUP_GRANULARITIES:
+            conn.execute(
+                f"INSERT INTO history_rollups (granularity, period_start, {', '.join(ROLLUP_FIELDS)}) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (granularity, period_start) DO UPDATE SET "
+                + ", ".join(f"{field} = {field} + excluded.{field}" for field in ROLLUP_FIELDS),
+                [granularity, period_start(day, granularity).isoformat()] + values
+            )
+
+    def append(self, entry: Dict[str, Any]):
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                self._insert(conn, entry)
+
+    def list(self, limit: int, cursor: Optional[str] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        # Newest first; the cursor is the (date, seq) position of the last row returned
+        query = f"SELECT seq, {', '.join(SUMMARY_FIELDS)} FROM history"
+        params: list = []
+        if cursor:
+            date, seq = decode_cursor(cursor)
+            query += " WHERE (date, seq) < (?, ?)"
+            params += [date, seq]
+        query += " ORDER BY date DESC, seq DESC LIMIT ?"
+        params.append(limit + 1)
+        with self._lock:
+            rows = self._connect().execute(query, params).fetchall()
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(rows[-1]["date"], rows[-1]["seq"])
+        return [{field: row[field] for field in SUMMARY_FIELDS} for row in rows], next_cursor
+
+    def get(self, entry_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._connect().execute(
+                f"SELECT {', '.join(SUMMARY_FIELDS)}, data_snapshot FROM history WHERE id = ? ORDER BY seq DESC LIMIT 1",
+                (entry_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        entry = {field: row[field] for field in SUMMARY_FIELDS}
+        entry["data_snapshot"] = json.loads(row["data_snapshot"])
+        return entry
+
+    def rollups(self, granularity: str, start: Optional[date] = None,
+                end: Optional[date] = None) -> List[Dict[str, Any]]:
+        # Periods overlapping [start, end], oldest first
+        query = f"SELECT period_start, {', '.join(ROLLUP_FIELDS)} FROM history_rollups WHERE granularity = ?"
+        params: list = [granularity]
+        if start is not None:
+            query += " AND period_start >= ?"
+            params.append(period_start(start, granularity).isoformat())
+        if end is not None:
+            query += " AND period_start <= ?"
+            params.append(end.isoformat())
+        query += " ORDER BY period_start"
+        with self._lock:
+            rows = self._connect().execute(query, params).fetchall()
+        periods = []
+        for row in rows:
+            start_day = date.fromisoformat(row["period_start"])
+            periods.append({"period_start": row["period_start"], "label": period_label(start_day, granularity),
+                            **{field: row[field] for field in ROLLUP_FIELDS}})
+        return periods
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+history_store = HistoryStore(HISTORY_DB, LEGACY_HISTORY_FILE)
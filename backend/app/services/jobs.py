@@ -0,0 +1,119 @@
+import multiprocessing
+import threading
+import uuid
+from concurrent.futures import Future, ProcessPoolExecutor
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional
+
+from app.core.config import settings as config_settings
+
+# Finished jobs kept in memory for polling
+MAX_FINISHED_JOBS = 200
+
+
+class QueueFullError(Exception):
+    pass
+
+
+class JobError(Exception):
+    pass
+
+
+def _run_job(fn: Callable, *args) -> Any:
+    # Runs in the worker process. Exceptions are re-raised as JobError since
+    # some (e.g. HTTPException) cannot be unpickled in the parent, which
+    # would break the whole pool.
+    try:
+        return fn(*args)
+    except Exception as exc:
+        raise JobError(str(getattr(exc, "detail", exc))) from None
+
+
+class Job:
+    def __init__(self, job_id: str, future: Future):
+        self.id = job_id
+        self.future = future
+        self.created_at = datetime.now().isoformat()
+        self.finished_at = None
+        self.cancel_requested = False
+
+    @property
+    def status(self) -> str:
+        if self.cancel_requested or self.future.cancelled():
+            return "cancelled"
+        if not self.future.done():
+            return "running" if self.future.running() else "queued"
+        return "failed" if self.future.exception() is not None else "completed"
+
+    @property
+    def done(self) -> bool:
+        return self.future.done()
+
+    def result(self) -> Optional[Any]:
+        if self.status != "completed":
+            return None
+        return self.future.result()
+
+    def error(self) -> Optional[str]:
+        if self.cancel_requested or not self.future.done() or self.future.cancelled():
+            return None
+        exc = self.future.exception()
+        if exc is None:
+            return None
+        return str(exc)
+
+
+class JobManager:
+    # CPU-heavy work submitted to a bounded process pool, so a large
+    # simulation never runs on the event loop of the API worker.
+    def __init__(self, max_workers: int, queue_depth: int):
+        self.max_workers = max(1, max_workers)
+        self.queue_depth = max(1, queue_depth)
+        self._executor = None
+        self._jobs: Dict[str, Job] = {}
+        self._lock = threading.Lock()
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # spawn: workers must not inherit the threads/locks of the server
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers,
+                                                 mp_context=multiprocessing.get_context("spawn"))
+        return self._executor
+
+    def pending_count(self) -> int:
+        return sum(1 for job in self._jobs.values() if not job.done)
+
+    def submit(self, fn: Callable, *args) -> Job:
+        with self._lock:
+            if self.pending_count() >= self.queue_depth:
+                raise QueueFullError(f"{self.queue_depth} jobs already queued or running")
+            self._prune()
+            job = Job(uuid.uuid4().hex, self._get_executor().submit(_run_job, fn, *args))
+            job.future.add_done_callback(lambda _: setattr(job, "finished_at", datetime.now().isoformat()))
+            self._jobs[job.id] = job
+            return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self._jobs.get(job_id)
+
+    def cancel(self, job_id: str) -> Optional[Job]:
+        # Queued jobs are removed from the pool; a job already running in a
+        # worker process cannot be interrupted, its result is discarded instead.
+        job = self._jobs.get(job_id)
+        if job is not None and not job.done:
+            if not job.future.cancel():
+                job.cancel_requested = True
+        return job
+
+    def _prune(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job.done]
+        for job_id in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+            del self._jobs[job_id]
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+job_manager = JobManager(config_settings.OPTIMIZATION_WORKERS, config_settings.OPTIMIZATION_QUEUE_DEPTH)
@@ -0,0 +1,118 @@
+import os
+import threading
+from typing import Callable, Dict, Iterable, List, Optional
+
+import pandas as pd
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import letter
+from reportlab.lib.styles import getSampleStyleSheet
+from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+
+from app.services.jobs import Job, job_manager
+
+# Rendered PDF reports, one file per planning fingerprint + settings version
+REPORT_DIR = "data/reports"
+MAX_CACHED_REPORTS = 100
+
+# Group table rows per Table flowable. ReportLab splits an oversized table by
+# re-measuring the remainder at each page (quadratic); tables of about one
+# page keep the rendering linear in the number of groups.
+PDF_TABLE_ROWS = 35
+
+GROUP_TABLE_HEADER = ['Start', 'Count', 'Vehicle', 'Occupancy', 'Cost']
+GROUP_TABLE_STYLE = TableStyle([('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+                                ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+                                ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+                                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+                                ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+                                ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+                                ('GRID', (0, 0), (-1, -1), 1, colors.black)])
+
+
+def group_rows(groups: pd.DataFrame) -> List[List[str]]:
+    return [[str(start), str(count), str(vehicle), f"{occupancy:.0f}%", f"{cost:,.0f}"]
+            for start, count, vehicle, occupancy, cost
+            in groups[["start_time", "count", "vehicle", "occupancy", "cost"]].itertuples(index=False, name=None)]
+
+
+def write_pdf_report(path: str, summary_lines: List[str], group_chunks: Iterable[pd.DataFrame]):
+    styles = getSampleStyleSheet()
+    elements = []
+
+    elements.append(Paragraph("Transport Optimization Report", styles['Title']))
+    elements.append(Spacer(1, 12))
+    for line in summary_lines:
+        elements.append(Paragraph(line, styles['Normal']))
+    elements.append(Spacer(1, 24))
+
+    # Table of every vehicle group of the simulation, one page-sized table at a time
+    pending = []
+    for chunk in group_chunks:
+        pending.extend(group_rows(chunk))
+        while len(pending) >= PDF_TABLE_ROWS:
+            elements.append(Table([GROUP_TABLE_HEADER] + pending[:PDF_TABLE_ROWS], style=GROUP_TABLE_STYLE))
+            pending = pending[PDF_TABLE_ROWS:]
+    if pending:
+        elements.append(Table([GROUP_TABLE_HEADER] + pending, style=GROUP_TABLE_STYLE))
+
+    # Rendered next to the target, then moved in place: readers never see a partial file
+    tmp_path = path + ".tmp"
+    try:
+        SimpleDocTemplate(tmp_path, pagesize=letter).build(elements)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+class PdfReportCache:
+    # Reports are rendered on the job process pool (see app.services.jobs)
+    # and kept on disk, so repeated downloads are plain file reads.
+    def __init__(self, directory: str, max_files: int):
+        self.directory = directory
+        self.max_files = max_files
+        self._renders: Dict[str, Job] = {}
+        self._lock = threading.Lock()
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.pdf")
+
+    def cached(self, key: str) -> Optional[str]:
+        path = self.path(key)
+        if not os.path.exists(path):
+            return None
+        os.utime(path) # most recently used, see _prune
+        return path
+
+    def render(self, key: str, fn: Callable, *args) -> Job:
+        # fn(*args, path) writes the report; concurrent requests for the same
+        # report share one render
+        with self._lock:
+            job = self._renders.get(key)
+            if job is None or job.done:
+                os.makedirs(self.directory, exist_ok=True)
+                job = job_manager.submit(fn, *args, self.path(key))
+                job.future.add_done_callback(lambda _: self._finished(key, job))
+                self._renders[key] = job
+            return job
+
+    def _finished(self, key: str, job: Job):
+        with self._lock:
+            if self._renders.get(key) is job:
+                del self._renders[key]
+        self._prune()
+
+    def _prune(self):
+        try:
+            reports = [os.path.join(self.directory, name) for name in os.listdir(self.directory) if name.endswith(".pdf")]
+        except OSError:
+            return
+        reports.sort(key=os.path.getmtime)
+        for path in reports[:max(0, len(reports) - self.max_files)]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+pdf_reports = PdfReportCache(REPORT_DIR, MAX_CACHED_REPORTS)
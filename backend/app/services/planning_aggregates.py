@@ -0,0 +1,142 @@
+from collections import Counter
+from typing import Any, Dict, Hashable, Iterable, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from app.services.planning_schema import PARTITION_COLUMNS, ZONE_COLUMN, coverage_direction, time_of_day_counts
+
+EMPLOYEE_COLUMN = "Employee ID"
+LINE_COLUMN = "Ligne_Bus_Option_2"
+
+
+def sort_by_employee(frame: pd.DataFrame) -> pd.DataFrame:
+    # Rows in Employee ID order (by value, not by category code: stored
+    # categories are in order of appearance), so the option 1 details are
+    # the same whichever path computed them
+    ids = frame[EMPLOYEE_COLUMN].astype(object)
+    try:
+        order = ids.sort_values(kind="stable").index
+    except TypeError:
+        # Mixed numeric / text IDs
+        order = ids.astype(str).sort_values(kind="stable").index
+    return frame.loc[order].reset_index(drop=True)
+
+
+def _key(value: Any) -> Hashable:
+    # Missing values (NaN, None, NaT) share one key
+    return None if pd.isna(value) else value
+
+
+def partition_key(values: Iterable[Any]) -> Tuple:
+    return tuple(_key(v) for v in values)
+
+
+def _row_counts(df: pd.DataFrame, columns: List[str]) -> Dict[Hashable, int]:
+    # Rows per distinct value of `columns` (a tuple key when several columns)
+    if any(c not in df.columns for c in columns) or not len(df):
+        return {}
+    sizes = df.groupby(columns if len(columns) > 1 else columns[0], dropna=False, observed=True, sort=False).size()
+    if len(columns) > 1:
+        return {partition_key(key): int(n) for key, n in sizes.items()}
+    return {_key(key): int(n) for key, n in sizes.items()}
+
+
+def partition_rows(df: pd.DataFrame) -> Dict[Tuple, np.ndarray]:
+    # Row positions of each (Date, Dropoff Point) partition
+    columns = [c for c in PARTITION_COLUMNS if c in df.columns]
+    if not columns:
+        return {(): np.arange(len(df))} if len(df) else {}
+    groups = df.groupby(columns, dropna=False, observed=True, sort=False).indices
+    return {partition_key(key if isinstance(key, tuple) else (key,)): rows for key, rows in groups.items()}
+
+
+class PlanningAggregates:
+    # Row counts the cost breakdown, the coverage and the grouping partitions
+    # are derived from. Kept with a stored planning (see planning_store) and
+    # updated from the rows added / removed by each patch, so a patch costs
+    # in proportion to its rows, not to the whole planning.
+    def __init__(self):
+        self.fingerprint = None
+        self.n_rows = 0
+        self.employee_zones = Counter()  # (employee, zone code) -> rows
+        self.lines = Counter()           # option 2 line -> rows
+        self.dates = Counter()           # date -> rows
+        self.times = Counter()           # morning / evening / invalid -> rows
+        self.partitions = Counter()      # (date, dropoff point) -> rows
+        # Partition -> planning revision (see planning_store.commit_patch) of
+        # its last change: cached partition groupings stay valid while their
+        # revision is unchanged. Set `revision` before add / remove.
+        self.revision = 0
+        self.partition_revisions: Dict[Tuple, int] = {}
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, revision: int = 0) -> "PlanningAggregates":
+        aggregates = cls()
+        aggregates.revision = revision
+        aggregates.add(df)
+        return aggregates
+
+    def _update(self, df: pd.DataFrame, sign: int):
+        self.n_rows += sign * len(df)
+        partitions = {partition: len(rows) for partition, rows in partition_rows(df).items()}
+        for counter, counts in ((self.employee_zones, _row_counts(df, [EMPLOYEE_COLUMN, ZONE_COLUMN])),
+                                (self.lines, _row_counts(df, [LINE_COLUMN])),
+                                (self.dates, _row_counts(df, ["Date"])),
+                                (self.partitions, partitions)):
+            if sign > 0:
+                counter.update(counts)
+            else:
+                counter.subtract(counts)
+                for key in counts:
+                    if counter[key] <= 0:
+                        del counter[key]
+        if "Time" in df.columns and len(df):
+            morning, evening, invalid = time_of_day_counts(df["Time"])
+            counts = {"morning": morning, "evening": evening, "invalid": invalid}
+            if sign > 0:
+                self.times.update(counts)
+            else:
+                self.times.subtract(counts)
+        for partition in partitions:
+            if partition in self.partitions:
+                self.partition_revisions[partition] = self.revision
+            else:
+                self.partition_revisions.pop(partition, None)
+
+    def add(self, df: pd.DataFrame):
+        self._update(df, 1)
+
+    def remove(self, df: pd.DataFrame):
+        self._update(df, -1)
+
+    def merge(self, other: "PlanningAggregates"):
+        # Counts of rows stored after ours (e.g. the next file of a batch upload)
+        self.n_rows += other.n_rows
+        for name in ("employee_zones", "lines", "dates", "times", "partitions"):
+            getattr(self, name).update(getattr(other, name))
+        for partition in other.partitions:
+            self.partition_revisions[partition] = self.revision
+
+    @property
+    def observed_days(self) -> int:
+        # Like Series.nunique: rows without a date are not a day
+        return sum(1 for date in self.dates if date is not None)
+
+    @property
+    def coverage_direction(self) -> str:
+        return coverage_direction(self.times["morning"] > 0, self.times["evening"] > 0, self.times["invalid"] > 0)
+
+    def employee_max_zones(self) -> pd.DataFrame:
+        # Option 1 basis: max zone per employee (rows without employee ignored),
+        # in Employee ID order like the inline path (see sort_by_employee)
+        pairs = [key for key in self.employee_zones if key[0] is not None]
+        frame = pd.DataFrame(pairs, columns=[EMPLOYEE_COLUMN, ZONE_COLUMN])
+        if frame.empty:
+            return pd.DataFrame({EMPLOYEE_COLUMN: pd.Series(dtype=object), ZONE_COLUMN: pd.Series(dtype=np.int8)})
+        frame[ZONE_COLUMN] = frame[ZONE_COLUMN].astype(np.int8)
+        return sort_by_employee(frame.groupby(EMPLOYEE_COLUMN, sort=False)[ZONE_COLUMN].max().reset_index())
+
+    def partition_list(self) -> List[Tuple[Tuple, int]]:
+        # (partition, revision) of every non-empty partition
+        return [(partition, self.partition_revisions.get(partition, 0)) for partition in self.partitions]
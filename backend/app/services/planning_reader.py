@@ -0,0 +1,168 @@
+import codecs
+import csv
+import importlib.util
+import io
+from typing import Any, BinaryIO, Callable, Dict, Iterator, List, Optional, Tuple
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+
+# Workbooks are read with calamine (Rust, python-calamine) when installed,
+# else with the pandas default engine (openpyxl for .xlsx)
+EXCEL_ENGINE = "calamine" if importlib.util.find_spec("python_calamine") else None
+
+# Bytes parsed per block by the (multithreaded) Arrow CSV reader
+CSV_BLOCK_SIZE = 4 * 1024 * 1024
+
+# Cells read as missing, as pandas.read_csv does by default
+NA_VALUES = ["", "#N/A", "#N/A N/A", "#NA", "-1.#IND", "-1.#QNAN", "-NaN", "-nan", "1.#IND", "1.#QNAN",
+             "<NA>", "N/A", "NA", "NULL", "NaN", "None", "n/a", "nan", "null"]
+
+
+class CsvReread(Exception):
+    # The file cannot be read as sniffed: the caller discards the chunks
+    # already yielded and reads it again from the start, passing `options`
+    # to iter_csv_chunks
+    options: Dict[str, Any] = {}
+
+
+class NotUtf8Error(CsvReread):
+    # The sample decoded as UTF-8 but a later block does not: read as latin-1
+    options = {"encoding": "latin-1"}
+
+
+class ShortRowsError(CsvReread):
+    # Rows with fewer fields than the header: read by pandas, which fills
+    # the missing fields with NaN (Arrow can only skip or reject them)
+    options = {"pad_rows": True}
+
+
+def sniff_csv(sample: bytes) -> Tuple[str, str]:
+    # Encoding and separator are decided once from the head of the file
+    if sample.startswith(codecs.BOM_UTF8):
+        encoding = "utf-8-sig"
+    else:
+        try:
+            codecs.getincrementaldecoder("utf-8")().decode(sample, final=False)
+            encoding = "utf-8"
+        except UnicodeDecodeError:
+            # Fallback to latin-1 for Excel-generated CSVs
+            encoding = "latin-1"
+    header = sample.decode(encoding, errors="ignore").splitlines()[0] if sample else ""
+    # Semicolon is common in FR exports, comma otherwise
+    sep = ";" if ";" in header else ","
+    return sep, encoding
+
+
+def csv_header(sample: bytes, sep: str, encoding: str) -> List[str]:
+    # Column names as pandas names them: blank -> "Unnamed: i", repeated -> "name.1"
+    text = sample.decode(encoding, errors="ignore")
+    header = next(csv.reader(io.StringIO(text), delimiter=sep), [])
+    names, seen = [], {}
+    for i, name in enumerate(header):
+        name = name if name.strip() else f"Unnamed: {i}"
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}.{seen[name]}"
+        seen.setdefault(name, 0)
+        names.append(name)
+    return names
+
+
+def iter_csv_chunks(source: BinaryIO, sample: bytes, chunk_rows: int, encoding: Optional[str] = None,
+                    pad_rows: bool = False) -> Iterator[pd.DataFrame]:
+    # Single pass over the file: dialect from the sample, then blocks parsed
+    # in parallel by Arrow and re-cut into chunks of chunk_rows rows. Every
+    # column is text, so all chunks share one schema.
+    # Raises CsvReread (read again with its options, chunks already yielded),
+    # UnicodeError (bad encoding) or ValueError (malformed rows).
+    sep, sniffed = sniff_csv(sample)
+    encoding = encoding or sniffed
+    names = csv_header(sample, sep, encoding)
+    if not names:
+        raise ValueError("fichier vide")
+    if pad_rows:
+        yield from _iter_padded_chunks(source, sep, encoding, names, chunk_rows)
+        return
+    short_rows = []
+
+    def invalid_row(row) -> str:
+        if row.actual_columns < row.expected_columns:
+            short_rows.append(row.number)
+            return "skip"
+        return "error"
+
+    pending = []
+    try:
+        reader = pa_csv.open_csv(
+            source,
+            read_options=pa_csv.ReadOptions(column_names=names, skip_rows=1, block_size=CSV_BLOCK_SIZE,
+                                            encoding="latin-1" if encoding == "latin-1" else "utf8"),
+            parse_options=pa_csv.ParseOptions(delimiter=sep, invalid_row_handler=invalid_row),
+            convert_options=pa_csv.ConvertOptions(column_types={name: pa.string() for name in names},
+                                                  null_values=NA_VALUES, strings_can_be_null=True)
+        )
+        for batch in reader:
+            # A block is parsed before its batch is returned: no chunk with a
+            # skipped row is ever yielded
+            if short_rows:
+                raise ShortRowsError(f"{len(short_rows)} ligne(s) incomplète(s)")
+            pending.append(batch)
+            if sum(b.num_rows for b in pending) < chunk_rows:
+                continue
+            table = pa.Table.from_batches(pending)
+            while table.num_rows >= chunk_rows:
+                yield table.slice(0, chunk_rows).to_pandas()
+                table = table.slice(chunk_rows)
+            pending = table.to_batches()
+    except pa.ArrowInvalid as e:
+        if "UTF8" in str(e):
+            if encoding in ("utf-8", "utf-8-sig"):
+                raise NotUtf8Error(str(e))
+            raise UnicodeError(str(e))
+        raise ValueError(str(e))
+    if short_rows:
+        raise ShortRowsError(f"{len(short_rows)} ligne(s) incomplète(s)")
+    if any(b.num_rows for b in pending):
+        yield pa.Table.from_batches(pending).to_pandas()
+
+
+def _iter_padded_chunks(source: BinaryIO, sep: str, encoding: str, names: List[str],
+                        chunk_rows: int) -> Iterator[pd.DataFrame]:
+    # Historical pandas reader (single thread), same names, text columns and
+    # missing values as the Arrow path
+    try:
+        reader = pd.read_csv(source, sep=sep, encoding=encoding, index_col=False, dtype=str,
+                             na_values=NA_VALUES, keep_default_na=False, chunksize=chunk_rows)
+        for chunk in reader:
+            chunk.columns = names
+            yield chunk.reset_index(drop=True)
+    except UnicodeDecodeError as e:
+        if encoding in ("utf-8", "utf-8-sig"):
+            raise NotUtf8Error(str(e))
+        raise UnicodeError(str(e))
+    except pd.errors.ParserError as e:
+        raise ValueError(str(e))
+
+
+def read_workbook(source: BinaryIO, planning_columns: Callable[[List[str]], List[str]]) -> pd.DataFrame:
+    # Whole sheet in one frame (cell types inferred by pandas), restricted to
+    # the planning columns (planning_columns: header -> columns used). With
+    # several sheets, the one with the most planning columns is parsed (the
+    # first one, as is, when none has any).
+    with pd.ExcelFile(source, engine=EXCEL_ENGINE) as book:
+        if len(book.sheet_names) == 1:
+            # Single sheet: parsed once (calamine loads a sheet whole even
+            # for its header), then restricted
+            df = book.parse(book.sheet_names[0])
+            wanted = set(planning_columns([str(c) for c in df.columns]))
+            return df[[c for c in df.columns if str(c) in wanted]] if wanted else df
+        sheet, wanted = book.sheet_names[0], set()
+        for name in book.sheet_names:
+            columns = planning_columns([str(c) for c in book.parse(name, nrows=0).columns])
+            if len(columns) > len(wanted):
+                sheet, wanted = name, set(columns)
+        if not wanted:
+            return book.parse(sheet)
+        return book.parse(sheet, usecols=lambda column: str(column) in wanted)
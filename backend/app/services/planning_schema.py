@@ -0,0 +1,172 @@
+import hashlib
+import numpy as np
+import pandas as pd
+from typing import Optional, Sequence, Tuple
+
+# Canonical planning schema. Derived columns are computed once (at upload for
+# stored plannings) so the compute endpoints never re-parse strings.
+ZONE_COLUMN = "Zone_Int"             # int8 zone code
+DATETIME_COLUMN = "Pickup_Datetime"  # datetime64 of Date + Time
+DERIVED_COLUMNS = [ZONE_COLUMN, DATETIME_COLUMN]
+CATEGORICAL_COLUMNS = ["Employee ID", "Ligne_Bus_Option_2", "Pickup Point", "Dropoff Point"]
+
+# Pickups are only grouped with pickups of the same day and drop-off site
+PARTITION_COLUMNS = ["Date", "Dropoff Point"]
+
+COVERAGE_ATTR = "coverage_direction"
+FINGERPRINT_ATTR = "fingerprint"
+
+_INT8_MIN, _INT8_MAX = np.iinfo(np.int8).min, np.iinfo(np.int8).max
+
+
+def parse_zone_codes(values: pd.Series) -> np.ndarray:
+    # Vectorized version of the historical parse_zone:
+    # int value -> itself, else first number in the text, else A/B/C -> 1/2/3, else 1.
+    # Codes are clipped to the int8 range (out-of-range zones have no price anyway).
+    if pd.api.types.is_bool_dtype(values):
+        codes = values.astype(np.int64).to_numpy()
+    elif pd.api.types.is_numeric_dtype(values):
+        codes = np.trunc(values.to_numpy(dtype=np.float64, na_value=1.0))
+    else:
+        text = values.astype("string").str.upper()
+        int_like = text.str.fullmatch(r"\s*[+-]?\d+\s*").fillna(False).to_numpy(dtype=bool)
+        as_int = pd.to_numeric(text.where(int_like), errors="coerce")
+        digits = pd.to_numeric(text.str.extract(r"(\d+)", expand=False), errors="coerce")
+        codes = np.select(
+            [int_like, digits.notna().to_numpy(),
+             text.str.contains("A", regex=False).fillna(False).to_numpy(dtype=bool),
+             text.str.contains("B", regex=False).fillna(False).to_numpy(dtype=bool),
+             text.str.contains("C", regex=False).fillna(False).to_numpy(dtype=bool)],
+            [as_int.to_numpy(dtype=np.float64, na_value=1.0), digits.to_numpy(dtype=np.float64, na_value=1.0), 1, 2, 3],
+            default=1
+        )
+    return np.clip(codes, _INT8_MIN, _INT8_MAX).astype(np.int8)
+
+
+def _as_text(values: pd.Series) -> pd.Series:
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return values.dt.strftime("%Y-%m-%d")
+    return values.astype("string")
+
+
+def parse_pickup_datetimes(df: pd.DataFrame) -> pd.Series:
+    # Date + ' ' + Time, unparseable rows become NaT
+    if "Date" not in df.columns or "Time" not in df.columns:
+        return pd.Series(pd.NaT, index=df.index, dtype="datetime64[ns]")
+    stamps = _as_text(df["Date"]) + " " + _as_text(df["Time"])
+    return pd.to_datetime(stamps, errors="coerce").astype("datetime64[ns]")
+
+
+class CoverageTracker:
+    # Morning/evening presence across one or many chunks. Like the historical
+    # detection, a single Time not in HH:MM format disables it (ALLER_RETOUR).
+    def __init__(self):
+        self.has_morning = False
+        self.has_evening = False
+        self.invalid = False
+
+    def update(self, times: pd.Series):
+        morning, evening, invalid = time_of_day_counts(times)
+        self.invalid = self.invalid or invalid > 0
+        self.has_morning = self.has_morning or morning > 0
+        self.has_evening = self.has_evening or evening > 0
+
+    @property
+    def direction(self) -> str:
+        return coverage_direction(self.has_morning, self.has_evening, self.invalid)
+
+
+def time_of_day_counts(times: pd.Series) -> Tuple[int, int, int]:
+    # (morning, evening, not HH:MM) pickup counts
+    parsed = pd.to_datetime(_as_text(times), format="%H:%M", errors="coerce")
+    hours = parsed.dt.hour
+    return int((hours < 12).sum()), int((hours >= 12).sum()), int(parsed.isna().sum())
+
+
+def coverage_direction(has_morning: bool, has_evening: bool, invalid: bool) -> str:
+    if invalid:
+        return "ALLER_RETOUR"
+    if has_morning and not has_evening:
+        return "ALLER"
+    if has_evening and not has_morning:
+        return "RETOUR"
+    return "ALLER_RETOUR"
+
+
+def add_canonical_columns(df: pd.DataFrame) -> pd.DataFrame:
+    df = df.copy()
+    df[ZONE_COLUMN] = parse_zone_codes(df["Zone"]) if "Zone" in df.columns else np.int8(1)
+    df[DATETIME_COLUMN] = parse_pickup_datetimes(df)
+    return df
+
+
+class PlanningFingerprint:
+    # Content hash of the uploaded columns, fed chunk by chunk at ingest.
+    # Chunk boundaries do not change the result. A patched planning chains
+    # the previous fingerprint with the removed and added rows, each set
+    # behind a marker (see section) so deleting a row and appending it back
+    # do not hash alike.
+    def __init__(self, previous: Optional[str] = None):
+        self._hash = hashlib.sha1()
+        self._columns = None
+        if previous:
+            self._hash.update(previous.encode())
+
+    def update(self, df: pd.DataFrame):
+        columns = raw_columns(df)
+        if self._columns is None:
+            self._columns = columns
+            self._hash.update("\x1f".join(map(str, columns)).encode())
+        if len(df):
+            values = df[self._columns]
+            try:
+                row_hashes = pd.util.hash_pandas_object(values, index=False)
+            except TypeError:
+                # Unhashable cells (lists, dicts) in posted rows
+                row_hashes = pd.util.hash_pandas_object(values.astype(str), index=False)
+            self._hash.update(row_hashes.to_numpy().tobytes())
+
+    def section(self, marker: bytes, row_count: int):
+        # Starts a set of rows (b"-" removed, b"+" added) of row_count rows
+        self._hash.update(marker + row_count.to_bytes(8, "little"))
+
+    def hexdigest(self) -> str:
+        return self._hash.hexdigest()
+
+
+def combine_fingerprints(fingerprints: Sequence[str]) -> str:
+    # Planning merged from several files (batch upload), in file order
+    return hashlib.sha1("\x1f".join(fingerprints).encode()).hexdigest()
+
+
+def planning_fingerprint(df: pd.DataFrame) -> str:
+    # Computed once per frame, then carried in df.attrs
+    if FINGERPRINT_ATTR not in df.attrs:
+        fingerprint = PlanningFingerprint()
+        fingerprint.update(df)
+        df.attrs[FINGERPRINT_ATTR] = fingerprint.hexdigest()
+    return df.attrs[FINGERPRINT_ATTR]
+
+
+def canonicalize(df: pd.DataFrame, coverage_direction: Optional[str] = None,
+                 fingerprint: Optional[str] = None) -> pd.DataFrame:
+    # Brings any planning frame (posted rows, legacy stored file) to the canonical schema
+    if any(col not in df.columns for col in DERIVED_COLUMNS):
+        df = add_canonical_columns(df)
+    else:
+        df = df.copy()
+    for col in CATEGORICAL_COLUMNS:
+        if col in df.columns and not isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].astype("category")
+    if coverage_direction is None:
+        tracker = CoverageTracker()
+        tracker.update(df["Time"] if "Time" in df.columns else pd.Series("00:00", index=df.index))
+        coverage_direction = tracker.direction
+    df.attrs[COVERAGE_ATTR] = coverage_direction
+    if fingerprint:
+        df.attrs[FINGERPRINT_ATTR] = fingerprint
+    return df
+
+
+def raw_columns(df: pd.DataFrame) -> list:
+    return [c for c in df.columns if c not in DERIVED_COLUMNS]
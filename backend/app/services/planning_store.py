@@ -0,0 +1,457 @@
+import json
+import os
+import pickle
+import re
+import threading
+import uuid
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.ipc as ipc
+
+from app.services.planning_aggregates import PlanningAggregates
+from app.services.planning_schema import CATEGORICAL_COLUMNS, FINGERPRINT_ATTR
+
+# Uploaded plannings are kept as Arrow IPC files (one per planning_id) so the
+# compute endpoints can memory-map them instead of receiving the rows again.
+# Patches add segment files (appended rows) and a tombstone file (deleted
+# row positions) next to it, listed in the planning meta.
+PLANNING_DIR = "data/plannings"
+CURRENT_PLANNING_POINTER = os.path.join(PLANNING_DIR, "current.json")
+# A patched planning is rewritten as a single file past this many segments,
+# or once this share of its stored rows is deleted
+MAX_SEGMENTS = 16
+MAX_DELETED_SHARE = 0.25
+
+# Patches of a planning are applied one at a time (read, match, write)
+patch_lock = threading.Lock()
+
+_PLANNING_ID_RE = re.compile(r"^[0-9a-f]{32}$")
+
+
+def new_planning_id() -> str:
+    return uuid.uuid4().hex
+
+
+def is_valid_planning_id(planning_id: str) -> bool:
+    return bool(planning_id) and _PLANNING_ID_RE.match(planning_id) is not None
+
+
+def planning_path(planning_id: str) -> str:
+    return os.path.join(PLANNING_DIR, f"{planning_id}.arrow")
+
+
+def planning_meta_path(planning_id: str) -> str:
+    return os.path.join(PLANNING_DIR, f"{planning_id}.json")
+
+
+def planning_aggregates_path(planning_id: str) -> str:
+    return os.path.join(PLANNING_DIR, f"{planning_id}.agg.pkl")
+
+
+def planning_exists(planning_id: str) -> bool:
+    # A compacted planning has no {planning_id}.arrow anymore (see _base_path)
+    return is_valid_planning_id(planning_id) and (os.path.exists(planning_meta_path(planning_id))
+                                                  or os.path.exists(planning_path(planning_id)))
+
+
+def to_arrow_table(df: pd.DataFrame) -> pa.Table:
+    # Spreadsheet columns often mix numbers and text (e.g. Zone "2" / "Zone B"),
+    # which Arrow cannot type: store those as strings, keeping the nulls.
+    df = df.copy()
+    for col in df.columns:
+        if df[col].dtype == object and pd.api.types.infer_dtype(df[col], skipna=True).startswith("mixed"):
+            df[col] = df[col].map(lambda v: None if v is None or (isinstance(v, float) and pd.isna(v)) else str(v))
+    df.columns = [str(c) for c in df.columns]
+    return pa.Table.from_pandas(df, preserve_index=False)
+
+
+class PlanningWriter:
+    # Appends DataFrame chunks to a new planning file. The file only becomes
+    # visible under its planning_id once the writer is closed successfully.
+    def __init__(self, planning_id: Optional[str] = None, make_current: bool = True):
+        self.planning_id = planning_id or new_planning_id()
+        self.make_current = make_current
+        self.row_count = 0
+        # Extra planning-level metadata saved with the file (e.g. coverage_direction)
+        self.meta = {}
+        # Row counts maintained while writing (see planning_aggregates)
+        self.aggregates: Optional[PlanningAggregates] = None
+        self._tmp_path = planning_path(self.planning_id) + ".tmp"
+        self._sink = None
+        self._writer = None
+        self._schema = None
+
+    def write(self, df: pd.DataFrame):
+        self.write_table(to_arrow_table(df))
+
+    def write_table(self, table: pa.Table):
+        table = table.replace_schema_metadata(None)
+        if self._writer is None:
+            os.makedirs(PLANNING_DIR, exist_ok=True)
+            self._schema = table.schema
+            self._sink = pa.OSFile(self._tmp_path, "wb")
+            self._writer = ipc.new_file(self._sink, self._schema)
+        else:
+            # Later chunks must follow the schema of the first one
+            table = table.select(self._schema.names).cast(self._schema)
+        self._writer.write_table(table)
+        self.row_count += table.num_rows
+
+    def close(self) -> str:
+        if self._writer is None:
+            self.write(pd.DataFrame())
+        self._writer.close()
+        self._sink.close()
+        os.replace(self._tmp_path, planning_path(self.planning_id))
+
+        if self.aggregates is not None:
+            self.aggregates.fingerprint = self.meta.get(FINGERPRINT_ATTR)
+            save_aggregates(self.planning_id, self.aggregates)
+        write_planning_meta(self.planning_id, {
+            "planning_id": self.planning_id,
+            "row_count": self.row_count,
+            "columns": self._schema.names,
+            "created_at": datetime.now().isoformat(),
+            **self.meta
+        })
+        if self.make_current:
+            set_current_planning_id(self.planning_id)
+        return self.planning_id
+
+    def abort(self):
+        if self._sink is not None:
+            self._sink.close()
+        if os.path.exists(self._tmp_path):
+            os.remove(self._tmp_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+        return False
+
+
+def save_planning(df: pd.DataFrame, planning_id: Optional[str] = None, make_current: bool = True) -> str:
+    with PlanningWriter(planning_id, make_current) as writer:
+        writer.write(df)
+    return writer.planning_id
+
+
+def _read_arrow(path: str) -> pa.Table:
+    # Memory-mapped: the buffers stay backed by the page cache
+    with pa.memory_map(path, "r") as source:
+        return ipc.open_file(source).read_all()
+
+
+def _deleted_rows(meta: Dict[str, Any]) -> np.ndarray:
+    # Sorted positions (in base + segments order) of the deleted rows
+    name = meta.get("tombstones")
+    if not name:
+        return np.empty(0, dtype=np.int64)
+    return np.load(os.path.join(PLANNING_DIR, name))
+
+
+def _base_path(planning_id: str, meta: Dict[str, Any]) -> str:
+    # The uploaded file, until a compaction names its rewritten file in the
+    # meta (see compact_planning)
+    if meta.get("base"):
+        return os.path.join(PLANNING_DIR, meta["base"])
+    return planning_path(planning_id)
+
+
+def _stored_table(planning_id: str, meta: Dict[str, Any]) -> pa.Table:
+    # Base file and segments, deleted rows included
+    table = _read_arrow(_base_path(planning_id, meta))
+    segments = [_read_arrow(os.path.join(PLANNING_DIR, name)) for name in meta.get("segments", [])]
+    return pa.concat_tables([table] + segments) if segments else table
+
+
+def read_stored_rows(planning_id: str) -> Tuple[pa.Table, Optional[np.ndarray]]:
+    # Base file and segments, deleted rows included, with the mask of the
+    # live rows (None when nothing is deleted)
+    for attempt in range(2):
+        meta = load_planning_meta(planning_id)
+        try:
+            table = _stored_table(planning_id, meta)
+            deleted = _deleted_rows(meta)
+            break
+        except FileNotFoundError:
+            # Files removed by a concurrent patch or compaction: read its meta again
+            if attempt:
+                raise
+    if not len(deleted):
+        return table, None
+    live = np.ones(table.num_rows, dtype=bool)
+    live[deleted] = False
+    return table, live
+
+
+def take_rows(table: pa.Table, positions: np.ndarray) -> pa.Table:
+    # Rows at sorted positions. A boolean filter works chunk by chunk where
+    # take would first concatenate the chunks of the memory-mapped table.
+    mask = np.zeros(table.num_rows, dtype=bool)
+    mask[positions] = True
+    return table.filter(pa.array(mask))
+
+
+def read_planning_table(planning_id: str) -> pa.Table:
+    table, live = read_stored_rows(planning_id)
+    return table if live is None else table.filter(pa.array(live))
+
+
+def load_planning(planning_id: str) -> pd.DataFrame:
+    table = read_planning_table(planning_id)
+    # Text identifiers are dictionary-encoded straight into pandas categoricals
+    categories = [c for c in CATEGORICAL_COLUMNS if c in table.column_names]
+    return table.to_pandas(categories=categories)
+
+
+def row_mask(table: pa.Table, filters: Dict[str, Sequence[Any]]) -> Optional[pa.ChunkedArray]:
+    # Rows matching every filter (column -> accepted values, compared in the
+    # column's stored type); None when there is no filter
+    mask = None
+    for column, values in filters.items():
+        if column not in table.column_names:
+            return pa.chunked_array([np.zeros(table.num_rows, dtype=bool)], type=pa.bool_())
+        value_type = table.schema.field(column).type
+        if pa.types.is_dictionary(value_type):
+            value_type = value_type.value_type
+        try:
+            value_set = pa.array(list(values)).cast(value_type)
+        except (pa.ArrowInvalid, pa.ArrowNotImplementedError, pa.ArrowTypeError) as e:
+            raise ValueError(f"{column}: {e}")
+        matches = pc.is_in(table[column], value_set=value_set)
+        mask = matches if mask is None else pc.and_(mask, matches)
+    return mask
+
+
+def query_planning(planning_id: str, columns: Optional[List[str]] = None,
+                   filters: Optional[Dict[str, Sequence[Any]]] = None,
+                   offset: int = 0, limit: Optional[int] = None) -> Tuple[pd.DataFrame, int]:
+    # One page of a stored planning: rows matching every filter (column ->
+    # accepted values), projected on `columns`. Filters and slicing run on the
+    # memory-mapped Arrow table; only the page is converted to pandas.
+    # Deleted rows are skipped through the same mask: only the page is copied.
+    # Returns the page and the number of matching rows.
+    table, live = read_stored_rows(planning_id)
+    mask = row_mask(table, filters or {})
+    if mask is not None:
+        matched = mask.to_numpy(zero_copy_only=False)
+        live = matched if live is None else live & matched
+    if live is None:
+        total = table.num_rows
+        page = table.slice(offset, limit) if limit is not None else table.slice(offset)
+    else:
+        positions = np.flatnonzero(live)
+        total = len(positions)
+        page = take_rows(table, positions[offset:None if limit is None else offset + limit])
+    if columns is not None:
+        page = page.select(columns)
+    return page.to_pandas(), total
+
+
+def write_planning_meta(planning_id: str, meta: Dict[str, Any]):
+    # Written aside then moved: the meta is the commit point of a patch
+    tmp_path = planning_meta_path(planning_id) + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(meta, f)
+    os.replace(tmp_path, planning_meta_path(planning_id))
+
+
+def save_aggregates(planning_id: str, aggregates: PlanningAggregates):
+    tmp_path = planning_aggregates_path(planning_id) + ".tmp"
+    with open(tmp_path, "wb") as f:
+        pickle.dump(aggregates, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, planning_aggregates_path(planning_id))
+
+
+def load_aggregates(planning_id: str, fingerprint: Optional[str]) -> Optional[PlanningAggregates]:
+    # None when missing or not matching the planning content (rebuilt by the caller)
+    try:
+        with open(planning_aggregates_path(planning_id), "rb") as f:
+            aggregates = pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError):
+        return None
+    if not isinstance(aggregates, PlanningAggregates) or aggregates.fingerprint != fingerprint:
+        return None
+    return aggregates
+
+
+def conform_rows(planning_id: str, df: pd.DataFrame) -> pd.DataFrame:
+    # Rows as they will read back once stored: columns and types of the
+    # planning file (absent columns empty). Unknown columns are an error.
+    schema = _read_arrow(_base_path(planning_id, load_planning_meta(planning_id))).schema
+    unknown = [str(c) for c in df.columns if c not in schema.names]
+    if unknown:
+        raise ValueError(f"colonnes inconnues {', '.join(unknown)}")
+    return conform_table(to_arrow_table(df), schema).to_pandas()
+
+
+def conform_table(table: pa.Table, schema: pa.Schema) -> pa.Table:
+    # Columns of schema, cast to its types (absent columns empty)
+    arrays = []
+    for field in schema:
+        if field.name not in table.column_names:
+            arrays.append(pa.nulls(table.num_rows, field.type))
+            continue
+        column = table[field.name]
+        try:
+            if _is_text(field.type) and not _is_text(column.type):
+                column = _text_column(column)
+            arrays.append(column.cast(field.type))
+        except (pa.ArrowInvalid, pa.ArrowNotImplementedError, pa.ArrowTypeError) as e:
+            raise ValueError(f"{field.name}: {e}")
+    return pa.Table.from_arrays(arrays, schema=schema.remove_metadata())
+
+
+def _is_text(data_type: pa.DataType) -> bool:
+    return pa.types.is_string(data_type) or pa.types.is_large_string(data_type)
+
+
+def _text_column(column: pa.ChunkedArray) -> pa.ChunkedArray:
+    # Dates and times as CSV exports write them (2024-01-02, 08:00), so a
+    # column read as text from one file and typed from another keeps one
+    # value per day / hour
+    if pa.types.is_timestamp(column.type):
+        whole_days = pc.all(pc.equal(pc.floor_temporal(column, unit="day"), column)).as_py() is not False
+        return pc.strftime(column, format="%Y-%m-%d" if whole_days else "%Y-%m-%d %H:%M:%S")
+    if pa.types.is_date(column.type):
+        return pc.strftime(column, format="%Y-%m-%d")
+    if pa.types.is_time(column.type):
+        whole_minutes = pc.all(pc.equal(pc.second(column), 0)).as_py() is not False
+        return pc.strftime(column, format="%H:%M" if whole_minutes else "%H:%M:%S")
+    return column.cast(pa.string())
+
+
+def retyped_columns(table: pa.Table, schema: pa.Schema) -> List[str]:
+    # Columns of table whose values change type when conformed to schema
+    return [field.name for field in table.schema
+            if field.type != schema.field(field.name).type
+            and not (_is_text(field.type) and _is_text(schema.field(field.name).type))]
+
+
+def merged_schema(tables: Sequence[pa.Table]) -> pa.Schema:
+    # One schema for tables read from different files: every column, in
+    # first-seen order, numeric types widened (int / float -> float) and any
+    # other type conflict (e.g. Zone 2 / "Zone B") stored as text
+    types: Dict[str, List[pa.DataType]] = {}
+    for table in tables:
+        for field in table.schema:
+            found = types.setdefault(field.name, [])
+            if field.type not in found:
+                found.append(field.type)
+    fields = []
+    for name, found in types.items():
+        try:
+            merged = pa.unify_schemas([pa.schema([pa.field(name, t)]) for t in found],
+                                      promote_options="permissive").field(name).type
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            merged = pa.large_string()
+        fields.append(pa.field(name, merged))
+    return pa.schema(fields)
+
+
+def commit_patch(planning_id: str, appended: Optional[pd.DataFrame], deleted_rows: np.ndarray,
+                 aggregates: PlanningAggregates, meta_updates: Dict[str, Any]) -> Dict[str, Any]:
+    # Appended rows go to a new segment, deleted rows to a new tombstone file;
+    # the meta listing them is written last. Call with patch_lock held.
+    meta = load_planning_meta(planning_id)
+    previous_files = _patch_files(meta)
+    revision = int(meta.get("revision", 0)) + 1
+    segments = list(meta.get("segments", []))
+    stored_rows = _stored_table(planning_id, meta).num_rows
+
+    deleted = _deleted_rows(meta)
+    if len(deleted_rows):
+        # Stored positions (see read_stored_rows)
+        deleted = np.union1d(deleted, deleted_rows).astype(np.int64)
+        name = f"{planning_id}.deleted.{revision}.npy"
+        with open(os.path.join(PLANNING_DIR, name), "wb") as f:
+            np.save(f, deleted)
+        meta["tombstones"] = name
+
+    if appended is not None and len(appended):
+        schema = _read_arrow(_base_path(planning_id, meta)).schema
+        name = f"{planning_id}.seg{revision}.arrow"
+        table = to_arrow_table(appended).replace_schema_metadata(None)
+        with pa.OSFile(os.path.join(PLANNING_DIR, name), "wb") as sink:
+            with ipc.new_file(sink, schema) as writer:
+                writer.write_table(table.select(schema.names).cast(schema))
+        segments.append(name)
+        stored_rows += len(appended)
+
+    meta.update(meta_updates)
+    meta["segments"] = segments
+    meta["revision"] = revision
+    meta["row_count"] = stored_rows - len(deleted)
+    aggregates.fingerprint = meta.get(FINGERPRINT_ATTR)
+    save_aggregates(planning_id, aggregates)
+    write_planning_meta(planning_id, meta)
+    _remove_files(previous_files - _patch_files(meta) - set(segments))
+
+    if len(segments) > MAX_SEGMENTS or len(deleted) > MAX_DELETED_SHARE * stored_rows:
+        compact_planning(planning_id)
+    return meta
+
+
+def _patch_files(meta: Dict[str, Any]) -> set:
+    return set(meta.get("segments", [])) | ({meta["tombstones"]} if meta.get("tombstones") else set())
+
+
+def _remove_files(names):
+    for name in names:
+        try:
+            os.remove(os.path.join(PLANNING_DIR, name))
+        except OSError:
+            pass
+
+
+def compact_planning(planning_id: str):
+    # Live rows rewritten as a new base file: no segments, no tombstones.
+    # No file a reader may hold is modified: the meta switches to the new
+    # base, then the previous base, segments and tombstones are removed (a
+    # reader of the previous meta then reads again, see read_stored_rows).
+    # Call with patch_lock held.
+    meta = load_planning_meta(planning_id)
+    table = read_planning_table(planning_id)
+    name = f"{planning_id}.base{int(meta.get('revision', 0))}.arrow"
+    with pa.OSFile(os.path.join(PLANNING_DIR, name), "wb") as sink:
+        with ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    previous_files = _patch_files(meta) | {os.path.basename(_base_path(planning_id, meta))}
+    meta.update(base=name, segments=[])
+    meta.pop("tombstones", None)
+    write_planning_meta(planning_id, meta)
+    _remove_files(previous_files)
+
+
+def load_planning_meta(planning_id: str) -> Dict[str, Any]:
+    try:
+        with open(planning_meta_path(planning_id), "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {"planning_id": planning_id}
+
+
+def set_current_planning_id(planning_id: str):
+    os.makedirs(PLANNING_DIR, exist_ok=True)
+    with open(CURRENT_PLANNING_POINTER, "w") as f:
+        json.dump({"planning_id": planning_id}, f)
+
+
+def get_current_planning_id() -> Optional[str]:
+    try:
+        with open(CURRENT_PLANNING_POINTER, "r") as f:
+            planning_id = json.load(f).get("planning_id")
+    except (OSError, ValueError):
+        return None
+    return planning_id if planning_exists(planning_id) else None
@@ -0,0 +1,55 @@
+import numpy as np
+import pandas as pd
+from typing import Any
+
+from app.services.grouping import VehicleTable
+
+# Zone codes are int8 (see planning_schema): a flat array covers every code
+_ZONE_OFFSET = 128
+_ZONE_SLOTS = 256
+
+DEFAULT_MAX_CAPACITY = 13 # default Hiace
+
+
+def group_max_capacity(vehicle_types) -> int:
+    # Groups are filled up to the Hiace capacity
+    hiace = next((v for v in vehicle_types if "hiace" in v.name.lower()), None)
+    return hiace.capacity if hiace else DEFAULT_MAX_CAPACITY
+
+
+class PricingTables:
+    # Lookup structures compiled once per settings version, so the cost and
+    # optimization paths never do per-row dict lookups.
+    def __init__(self, settings: Any):
+        forfait_prices = settings.option_1_forfait_prices
+        # Unknown zones pay the zone 1 forfait; without one, pricing any
+        # employee fails (KeyError) as the per-row lookup did
+        self.has_zone_1_forfait = 1 in forfait_prices
+        self.forfait_by_zone = np.full(_ZONE_SLOTS, forfait_prices.get(1, np.nan), dtype=np.float64)
+        for zone, price in forfait_prices.items():
+            if -_ZONE_OFFSET <= zone < _ZONE_SLOTS - _ZONE_OFFSET:
+                self.forfait_by_zone[zone + _ZONE_OFFSET] = price
+
+        self.line_prices = dict(settings.option_2_line_prices)
+        self.default_pickup_price = settings.option_2_default_pickup_price
+
+        self.max_capacity = group_max_capacity(settings.vehicle_types)
+        self.vehicles = VehicleTable(settings.vehicle_types, self.max_capacity)
+
+    def forfait_costs(self, zone_codes) -> np.ndarray:
+        codes = np.asarray(zone_codes, dtype=np.int64)
+        if not self.has_zone_1_forfait and len(codes):
+            raise KeyError(1)
+        return self.forfait_by_zone[np.clip(codes, -_ZONE_OFFSET, _ZONE_SLOTS - _ZONE_OFFSET - 1) + _ZONE_OFFSET]
+
+    def pickup_price(self, line) -> float:
+        return self.line_prices.get(line, self.default_pickup_price)
+
+    def pickup_costs(self, lines: pd.Series) -> np.ndarray:
+        # Categorical lines: one lookup per category, then gather by code
+        if not isinstance(lines.dtype, pd.CategoricalDtype):
+            lines = lines.astype("category")
+        category_prices = np.array([self.pickup_price(line) for line in lines.cat.categories] + [self.default_pickup_price],
+                                   dtype=np.float64)
+        # Missing lines have code -1, which picks the trailing default price
+        return category_prices[lines.cat.codes.to_numpy()]
@@ -0,0 +1,80 @@
+import os
+import tempfile
+from typing import Iterable, Iterator, List, Tuple
+
+import pandas as pd
+from openpyxl import Workbook
+
+# Exported tables are produced as DataFrame chunks of this many rows, so an
+# export never holds every formatted row in memory
+EXPORT_CHUNK_ROWS = 10000
+# Data rows per worksheet (Excel limit minus the header); longer tables
+# continue on "<name> (2)", "<name> (3)"...
+EXCEL_MAX_ROWS = 1_048_575
+FILE_CHUNK_SIZE = 64 * 1024
+
+ExportTable = Tuple[str, Iterable[pd.DataFrame]]
+
+
+def frame_chunks(df: pd.DataFrame, chunk_rows: int = EXPORT_CHUNK_ROWS) -> Iterator[pd.DataFrame]:
+    for start in range(0, len(df), chunk_rows):
+        yield df.iloc[start:start + chunk_rows]
+
+
+def _cell_values(chunk: pd.DataFrame) -> Iterator[tuple]:
+    # Plain Python values, missing cells left empty
+    values = chunk.astype(object).where(chunk.notna(), None)
+    return values.itertuples(index=False, name=None)
+
+
+def iter_csv(chunks: Iterable[pd.DataFrame], sep: str = ";") -> Iterator[bytes]:
+    # Each chunk is encoded as soon as it is produced: the download starts
+    # with the first chunk. BOM so that Excel reads the accents as UTF-8.
+    first = True
+    for chunk in chunks:
+        yield chunk.to_csv(index=False, header=first, sep=sep).encode("utf-8-sig" if first else "utf-8")
+        first = False
+
+
+def write_xlsx(tables: List[ExportTable], path: str):
+    # Write-only workbook: rows are streamed to the sheet files instead of
+    # building every cell object in memory
+    workbook = Workbook(write_only=True)
+    for name, chunks in tables:
+        sheet, sheet_rows, part = None, 0, 0
+        for chunk in chunks:
+            for row in _cell_values(chunk):
+                if sheet is None or sheet_rows >= EXCEL_MAX_ROWS:
+                    part += 1
+                    sheet = workbook.create_sheet(name if part == 1 else f"{name} ({part})")
+                    sheet.append([str(c) for c in chunk.columns])
+                    sheet_rows = 0
+                sheet.append(row)
+                sheet_rows += 1
+        if sheet is None:
+            workbook.create_sheet(name)
+    workbook.save(path)
+
+
+def xlsx_tempfile(tables: List[ExportTable]) -> str:
+    fd, path = tempfile.mkstemp(suffix=".xlsx")
+    os.close(fd)
+    try:
+        write_xlsx(tables, path)
+    except Exception:
+        os.remove(path)
+        raise
+    return path
+
+
+def iter_file(path: str, remove: bool = False) -> Iterator[bytes]:
+    try:
+        with open(path, "rb") as f:
+            while True:
+                block = f.read(FILE_CHUNK_SIZE)
+                if not block:
+                    break
+                yield block
+    finally:
+        if remove:
+            os.remove(path)
@@ -0,0 +1,130 @@
+import itertools
+import sys
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+
+import numpy as np
+import pandas as pd
+
+from app.core.config import settings as config_settings
+
+# Items measured per container by estimate_size (the rest extrapolated)
+SIZE_SAMPLE = 32
+# Deeper values are counted at their shallow size
+SIZE_MAX_DEPTH = 6
+SCALAR_TYPES = frozenset((str, bytes, bytearray, int, float, bool, type(None), np.int64, np.float64))
+
+
+def _sampled_size(items: list, total: int, depth: int) -> int:
+    if not items:
+        return 0
+    return sum(estimate_size(item, depth) for item in items) * total // len(items)
+
+
+def estimate_size(value: Any, depth: int = 0) -> int:
+    # Approximate memory footprint of a cached result, without serializing it:
+    # arrays (and objects defining nbytes) by nbytes, containers from a sample
+    # of their items (results hold long lists of same-shaped records)
+    if type(value) in SCALAR_TYPES or depth >= SIZE_MAX_DEPTH:
+        # Most of the values met (record fields, sampled items)
+        return sys.getsizeof(value)
+    if isinstance(value, np.ndarray):
+        size = value.nbytes
+        if value.dtype == object and value.size:
+            flat = value.reshape(-1)
+            sample = flat[::max(1, len(flat) // SIZE_SAMPLE)][:SIZE_SAMPLE]
+            size += _sampled_size(list(sample), len(flat), depth + 1)
+        return size
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=True, deep=False).sum())
+    if isinstance(value, (pd.Series, pd.Index)):
+        return int(value.memory_usage(deep=False))
+    if isinstance(value, (str, bytes, bytearray, int, float)):
+        # Subclasses (e.g. str enums)
+        return sys.getsizeof(value)
+    if isinstance(value, dict):
+        # Text keys (field / column names) are shared by every record: not counted
+        items = list(itertools.islice(value.items(), SIZE_SAMPLE))
+        keys = [] if all(isinstance(k, str) for k, _ in items) else [k for k, _ in items]
+        return (sys.getsizeof(value) + _sampled_size([v for _, v in items], len(value), depth + 1)
+                + _sampled_size(keys, len(value), depth + 1))
+    if isinstance(value, (list, tuple)):
+        sample = value[::max(1, len(value) // SIZE_SAMPLE)][:SIZE_SAMPLE]
+        return sys.getsizeof(value) + _sampled_size(list(sample), len(value), depth + 1)
+    if isinstance(value, (set, frozenset)):
+        return sys.getsizeof(value) + _sampled_size(list(itertools.islice(value, SIZE_SAMPLE)), len(value), depth + 1)
+    nbytes = getattr(value, "nbytes", None)
+    if isinstance(nbytes, int):
+        # Objects sizing themselves, like numpy arrays (e.g. group listings)
+        return nbytes
+    if hasattr(value, "__dict__"):
+        # Result objects and pydantic models: their attributes
+        return sys.getsizeof(value) + estimate_size(vars(value), depth + 1)
+    return sys.getsizeof(value)
+
+
+class ResultCache:
+    # LRU cache of computed results (cost breakdowns, optimization results)
+    # bounded by an approximate memory budget in bytes.
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # key -> (value, size)
+        self._lock = threading.Lock()
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key: Hashable, value: Any):
+        size = estimate_size(value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.current_bytes -= previous[1]
+            self._entries[key] = (value, size)
+            self.current_bytes += size
+            while self.current_bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.current_bytes -= evicted_size
+                self.evictions += 1
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        value = self.get(key)
+        if value is None:
+            value = compute()
+            self.put(key, value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self.current_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0
+            }
+
+
+result_cache = ResultCache(config_settings.RESULT_CACHE_MAX_BYTES)
@@ -0,0 +1,93 @@
+import json
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+
+class UserStore(ABC):
+    # Lookup of user records ({"username", "full_name", "hashed_password",
+    # "disabled"}) by username. Backends: see create_user_store.
+    @abstractmethod
+    def get(self, username: str) -> Optional[Dict[str, Any]]:
+        ...
+
+
+class InMemoryUserStore(UserStore):
+    def __init__(self, users: Dict[str, Dict[str, Any]]):
+        self._users = dict(users)
+
+    def get(self, username: str) -> Optional[Dict[str, Any]]:
+        return self._users.get(username)
+
+
+class JsonFileUserStore(UserStore):
+    # JSON list (or username -> record map) indexed once, re-read only when
+    # the file changes on disk
+    def __init__(self, path: str):
+        self.path = path
+        self._users: Dict[str, Dict[str, Any]] = {}
+        self._mtime = None
+        self._lock = threading.Lock()
+
+    def _refresh(self):
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError:
+            self._users, self._mtime = {}, None
+            return
+        if mtime == self._mtime:
+            return
+        with open(self.path, "r") as f:
+            data = json.load(f)
+        records = data.values() if isinstance(data, dict) else data
+        self._users = {record["username"]: record for record in records}
+        self._mtime = mtime
+
+    def get(self, username: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            self._refresh()
+            return self._users.get(username)
+
+
+def create_user_store(backend: str, users_file: str, default_users: Dict[str, Dict[str, Any]]) -> UserStore:
+    if backend == "json":
+        return JsonFileUserStore(users_file)
+    if backend == "memory":
+        return InMemoryUserStore(default_users)
+    raise ValueError(f"Unknown user store backend: {backend}")
+
+
+class TokenCache:
+    # Verified access tokens -> username, each entry valid until the token's
+    # own expiry, bounded in size (least recently used evicted first)
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # token -> (username, exp timestamp)
+        self._lock = threading.Lock()
+
+    def get(self, token: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None:
+                return None
+            if entry[1] <= time.time():
+                del self._entries[token]
+                return None
+            self._entries.move_to_end(token)
+            return entry[0]
+
+    def put(self, token: str, username: str, expires_at: float):
+        if self.max_entries <= 0 or expires_at <= time.time():
+            return
+        with self._lock:
+            self._entries[token] = (username, expires_at)
+            self._entries.move_to_end(token)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
@@ -0,0 +1,58 @@
+import asyncio
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable
+
+from app.core.config import settings as config_settings
+
+
+class WorkerError(Exception):
+    # Picklable form of an exception raised in a worker process: the HTTP
+    # status (HTTPException) and message are kept for the caller
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(status_code, detail)
+        self.status_code = status_code
+        self.detail = detail
+
+    def __str__(self) -> str:
+        return self.detail
+
+
+def _run_task(fn: Callable, *args) -> Any:
+    try:
+        return fn(*args)
+    except Exception as exc:
+        raise WorkerError(getattr(exc, "status_code", 500), str(getattr(exc, "detail", exc))) from None
+
+
+class WorkerPool:
+    # CPU-bound steps that must run side by side (e.g. the files of a batch
+    # upload): unlike the compute pool threads, the worker processes do not
+    # share the GIL. Arguments and results are pickled.
+    def __init__(self, max_workers: int):
+        # More processes than cores would only add memory
+        self.max_workers = max(1, min(max_workers, os.cpu_count() or 1))
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                # spawn: workers must not inherit the threads/locks of the server
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers,
+                                                     mp_context=multiprocessing.get_context("spawn"))
+            return self._executor
+
+    async def run(self, fn: Callable, *args) -> Any:
+        return await asyncio.get_running_loop().run_in_executor(self._get_executor(), _run_task, fn, *args)
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+
+worker_pool = WorkerPool(config_settings.PLANNING_PARSE_WORKERS)
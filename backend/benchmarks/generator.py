@@ -0,0 +1,90 @@
+import argparse
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+# Zone spellings found in real plannings: "2", "Zone B", "zone 2", "Z2"
+ZONE_LETTERS = "ABCDEFGHI"
+UNDEFINED_LINE = "Ligne Indéfinie"
+
+
+def _zone_labels(zones: int) -> np.ndarray:
+    # labels[zone - 1, format]
+    return np.array([[str(z), f"Zone {ZONE_LETTERS[z - 1]}", f"zone {z}", f"Z{z}"] for z in range(1, zones + 1)],
+                    dtype=object)
+
+
+# "HH:MM" label of every minute of the day
+TIME_LABELS = np.array([f"{m // 60:02d}:{m % 60:02d}" for m in range(24 * 60)], dtype=object)
+
+
+def generate_planning(rows: int, seed: int = 0, days: int = 22, start_date: str = "2024-01-01",
+                      sites: int = 3, zones: int = 3, round_trip: bool = False,
+                      undefined_line_share: float = 0.05) -> pd.DataFrame:
+    # Synthetic planning in the upload format: each employee has a home zone,
+    # a pickup point, a site and a usual shift start (+/- a few minutes),
+    # and appears on most of the working days.
+    if not 1 <= zones <= len(ZONE_LETTERS):
+        raise ValueError(f"zones must be between 1 and {len(ZONE_LETTERS)}")
+    rng = np.random.default_rng(seed)
+    dates = np.array(pd.bdate_range(start_date, periods=days).strftime("%Y-%m-%d"), dtype=object)
+    legs = 2 if round_trip else 1
+    employees = max(1, -(-rows // (days * legs)))
+
+    employee = rng.integers(0, employees, rows)
+    home_zone = rng.integers(1, zones + 1, employees)
+    site = rng.integers(1, sites + 1, employees)
+    shift_start = rng.choice(np.arange(6 * 60, 9 * 60 + 1, 30), employees)
+    zone = home_zone[employee]
+
+    minutes = shift_start[employee] + rng.integers(-10, 11, rows)
+    if round_trip:
+        evening = rng.random(rows) < 0.5
+        minutes = np.where(evening, minutes + 9 * 60, minutes)
+    minutes = np.clip(minutes, 0, 24 * 60 - 1)
+
+    # Text columns are built once per employee and indexed per row
+    ids = np.arange(employees)
+    employee_ids = np.array([f"EMP{i:06d}" for i in ids], dtype=object)
+    pickup_points = np.array([f"Point {z}-{i % 50}" for i, z in zip(ids, home_zone)], dtype=object)
+    site_names = np.array([f"Site {s}" for s in site], dtype=object)
+    # One bus line per (site, zone), some rows without a line
+    bus_lines = np.array([f"Ligne {s}-{z}" for s, z in zip(site, home_zone)], dtype=object)
+    lines = np.where(rng.random(rows) < undefined_line_share, UNDEFINED_LINE, bus_lines[employee])
+
+    df = pd.DataFrame({
+        "Employee ID": employee_ids[employee],
+        "Date": dates[rng.integers(0, days, rows)],
+        "Time": TIME_LABELS[minutes],
+        "Pickup Point": pickup_points[employee],
+        "Dropoff Point": site_names[employee],
+        "Zone": _zone_labels(zones)[zone - 1, rng.integers(0, 4, rows)],
+        "Ligne_Bus_Option_2": lines,
+    })
+    return df.sort_values(["Date", "Time"], kind="stable", ignore_index=True)
+
+
+def planning_csv(df: pd.DataFrame, sep: str = ";") -> bytes:
+    return df.to_csv(index=False, sep=sep).encode("utf-8")
+
+
+def main(argv: Optional[list] = None):
+    parser = argparse.ArgumentParser(description="Write a synthetic planning CSV")
+    parser.add_argument("rows", type=int)
+    parser.add_argument("-o", "--output", default="planning.csv")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--days", type=int, default=22)
+    parser.add_argument("--sites", type=int, default=3)
+    parser.add_argument("--zones", type=int, default=3)
+    parser.add_argument("--round-trip", action="store_true", help="morning and evening pickups")
+    args = parser.parse_args(argv)
+    df = generate_planning(args.rows, seed=args.seed, days=args.days, sites=args.sites, zones=args.zones,
+                           round_trip=args.round_trip)
+    with open(args.output, "wb") as f:
+        f.write(planning_csv(df))
+    print(f"{len(df)} rows -> {args.output}")
+
+
+if __name__ == "__main__":
+    main()
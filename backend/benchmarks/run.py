@@ -0,0 +1,285 @@
+# Backend benchmark suite.
+#
+#   python -m benchmarks.run --sizes 1000 10000 100000 --save benchmarks/baselines/local.json
+#   python -m benchmarks.run --sizes 1000 10000 100000 --compare benchmarks/baselines/local.json
+#
+# benchmarks/baselines/baseline.json is the committed reference: default
+# sizes and seed, measured when the suite was added (machine in its meta).
+# Timings only compare on the same machine: re-save a local baseline first
+# when running elsewhere.
+#
+# Each case runs against a synthetic planning (benchmarks.generator) in a
+# throw-away data directory, with the result cache and the PDF cache emptied
+# before every run: timings are cold computations, not cache hits.
+# --compare flags the cases slower than the baseline by more than
+# --tolerance (and --min-delta seconds) and exits with status 1.
+import argparse
+import io
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+from benchmarks.generator import generate_planning, planning_csv
+
+DEFAULT_SIZES = [1000, 10000, 100000]
+# Sizes accepted by --sizes (1M rows: expect minutes for the Excel/PDF exports)
+MIN_ROWS = 1000
+MAX_ROWS = 1_000_000
+
+
+class BenchmarkContext:
+    # One planning uploaded through the API, shared by the cases of a size
+    def __init__(self, client, rows: int, seed: int):
+        from app.api.planning import load_planning_frame
+        from app.api.settings import settings_cache
+
+        self.client = client
+        self.rows = rows
+        self.source = generate_planning(rows, seed=seed)
+        self.csv = planning_csv(self.source)
+        self._workbook = None
+        self.planning_id = check(self.upload()).json()["planning_id"]
+        self.frame = load_planning_frame(self.planning_id, None)
+        self.settings = settings_cache.get()
+
+    def upload(self):
+        return self.client.post("/planning/upload", files={"file": ("planning.csv", self.csv, "text/csv")})
+
+    def workbook(self) -> bytes:
+        # Same planning as an .xlsx upload, written on first use (slow)
+        if self._workbook is None:
+            buffer = io.BytesIO()
+            self.source.to_excel(buffer, index=False)
+            self._workbook = buffer.getvalue()
+        return self._workbook
+
+    def batch_files(self, parts: int = 4) -> list:
+        # Same planning split in consecutive parts, one CSV file per part (sites)
+        size = -(-len(self.source) // parts)
+        return [("files", (f"site_{i + 1}.csv", planning_csv(self.source.iloc[i * size:(i + 1) * size])))
+                for i in range(parts)]
+
+    def post(self, url: str, **kwargs):
+        return check(self.client.post(url, **kwargs))
+
+    def export(self, format: str):
+        return self.post(f"/dashboard/export/{format}", params={"planning_id": self.planning_id})
+
+
+def check(response):
+    if response.status_code != 200:
+        raise RuntimeError(f"{response.request.url}: HTTP {response.status_code} {response.text[:200]}")
+    return response
+
+
+def _grouping(ctx: BenchmarkContext):
+    # Sort + grouping loop alone, without the HTTP and cost layers
+    from app.api.optimization import Simulation
+    Simulation(ctx.frame, ctx.settings)
+
+
+def _warm_stored(ctx: BenchmarkContext):
+    ctx.post("/costs/calculate", json={"planning_id": ctx.planning_id})
+    ctx.post("/optimization/analyze", json={"planning_id": ctx.planning_id})
+
+
+def _patch(ctx: BenchmarkContext):
+    # One row replaced (same size across runs), then the stored costs and
+    # optimization: aggregates and untouched partition groupings are reused
+    row = {"Employee ID": "BENCH", "Date": "2024-01-02", "Time": "07:00", "Pickup Point": "Bench",
+           "Dropoff Point": "Site 1", "Zone": "2", "Ligne_Bus_Option_2": "Ligne 1"}
+    check(ctx.client.patch(f"/planning/{ctx.planning_id}", json={"append": [row], "delete": [{"Employee ID": "BENCH"}]}))
+    _warm_stored(ctx)
+
+
+# Untimed setup run after the caches are reset
+_patch.prepare = _warm_stored
+
+
+def _upload_excel(ctx: BenchmarkContext):
+    check(ctx.client.post("/planning/upload", files={"file": ("planning.xlsx", ctx.workbook())}))
+
+
+_upload_excel.prepare = lambda ctx: ctx.workbook()
+
+
+def _scenarios(ctx: BenchmarkContext):
+    # 50 tariff variants (forfaits, line prices, one vehicle capacity in 5)
+    scenarios = []
+    for k in range(50):
+        scenario = {"name": f"S{k}", "option_1_forfait_prices": {1: 40000.0 + 500 * k, 2: 50000.0, 3: 60000.0 + 250 * k},
+                    "option_2_line_prices": {"Ligne 1": 2000.0 + 20 * k}}
+        if k % 5 == 0:
+            scenario["vehicle_types"] = [{"name": "Berline", "capacity": 4, "base_price": 5000.0},
+                                         {"name": "Hiace", "capacity": 10 + k // 5 % 4, "base_price": 25000.0}]
+        scenarios.append(scenario)
+    ctx.post("/scenarios/compare", json={"planning_id": ctx.planning_id, "scenarios": scenarios})
+
+
+def _upload_batch(ctx: BenchmarkContext):
+    check(ctx.client.post("/planning/upload/batch", files=ctx.batch_files()))
+
+
+CASES: Dict[str, Callable[[BenchmarkContext], Any]] = {
+    "upload": lambda ctx: check(ctx.upload()),
+    "upload_excel": _upload_excel,
+    "upload_batch": _upload_batch,
+    "costs": lambda ctx: ctx.post("/costs/calculate", json={"planning_id": ctx.planning_id}),
+    "grouping": _grouping,
+    "optimization": lambda ctx: ctx.post("/optimization/analyze", json={"planning_id": ctx.planning_id}),
+    "dashboard_kpi": lambda ctx: ctx.post("/dashboard/kpi", params={"planning_id": ctx.planning_id}),
+    "dashboard_summary": lambda ctx: ctx.post("/dashboard/summary", json={"planning_id": ctx.planning_id}),
+    "export_csv": lambda ctx: ctx.export("csv"),
+    "export_excel": lambda ctx: ctx.export("excel"),
+    "export_pdf": lambda ctx: ctx.export("pdf"),
+    "patch": _patch,
+    "scenarios": _scenarios,
+}
+
+
+def reset_caches():
+    from app.services.pdf_reports import pdf_reports
+    from app.services.result_cache import result_cache
+
+    result_cache.clear()
+    shutil.rmtree(pdf_reports.directory, ignore_errors=True)
+
+
+def time_case(fn: Callable, ctx: BenchmarkContext, repeat: int, warmup: int) -> Dict[str, float]:
+    for _ in range(warmup):
+        reset_caches()
+        fn(ctx)
+    timings = []
+    prepare = getattr(fn, "prepare", None)
+    for _ in range(repeat):
+        reset_caches()
+        if prepare is not None:
+            prepare(ctx)
+        start = time.perf_counter()
+        fn(ctx)
+        timings.append(time.perf_counter() - start)
+    return {"median_s": statistics.median(timings), "min_s": min(timings), "runs": repeat}
+
+
+def run_suite(sizes: List[int], cases: List[str], repeat: int, warmup: int, seed: int) -> Dict[str, Any]:
+    from fastapi.testclient import TestClient
+    from app.main import app
+
+    results = {}
+    with TestClient(app) as client:
+        for rows in sizes:
+            ctx = BenchmarkContext(client, rows, seed)
+            for name in cases:
+                result = time_case(CASES[name], ctx, repeat, warmup)
+                result["rows"] = rows
+                results[f"{name}@{rows}"] = result
+                print(f"{name:<18} {rows:>9} rows  median {result['median_s']:8.3f}s  min {result['min_s']:8.3f}s", flush=True)
+    return {
+        "meta": {
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "machine": platform.platform(),
+            # Planning generated by benchmarks.generator.generate_planning(rows, seed=seed)
+            "seed": seed,
+            "sizes": sizes,
+            "cases": cases,
+            "repeat": repeat,
+            "warmup": warmup,
+        },
+        "results": results,
+    }
+
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any], tolerance: float, min_delta: float) -> List[Dict[str, Any]]:
+    # Median against median; small absolute differences are noise, not regressions
+    rows = []
+    for key, result in current["results"].items():
+        reference = baseline["results"].get(key)
+        if reference is None:
+            rows.append({"case": key, "status": "new", "current_s": result["median_s"]})
+            continue
+        delta = result["median_s"] - reference["median_s"]
+        ratio = result["median_s"] / reference["median_s"] if reference["median_s"] > 0 else float("inf")
+        if ratio > 1 + tolerance and delta > min_delta:
+            status = "regression"
+        elif ratio < 1 - tolerance and -delta > min_delta:
+            status = "improved"
+        else:
+            status = "ok"
+        rows.append({"case": key, "status": status, "baseline_s": reference["median_s"],
+                     "current_s": result["median_s"], "ratio": ratio})
+    return rows
+
+
+def print_comparison(rows: List[Dict[str, Any]]):
+    for row in rows:
+        if row["status"] == "new":
+            print(f"{row['case']:<30} {'':>9} -> {row['current_s']:8.3f}s  new")
+        else:
+            print(f"{row['case']:<30} {row['baseline_s']:8.3f}s -> {row['current_s']:8.3f}s  "
+                  f"x{row['ratio']:.2f}  {row['status']}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the backend pipelines on synthetic plannings")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="planning rows")
+    parser.add_argument("--cases", nargs="+", choices=list(CASES), default=list(CASES))
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--warmup", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--save", help="write the results to this JSON file (new baseline)")
+    parser.add_argument("--compare", help="baseline JSON file to compare the results with")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed slowdown ratio (0.2 = +20%%)")
+    parser.add_argument("--min-delta", type=float, default=0.005, help="ignored slowdowns below this (seconds)")
+    args = parser.parse_args(argv)
+
+    for rows in args.sizes:
+        if not MIN_ROWS <= rows <= MAX_ROWS:
+            parser.error(f"sizes must be between {MIN_ROWS} and {MAX_ROWS}")
+    if args.repeat < 1:
+        parser.error("--repeat must be at least 1")
+    # Paths are resolved before moving to the throw-away data directory
+    save_path = os.path.abspath(args.save) if args.save else None
+    baseline = None
+    if args.compare:
+        with open(args.compare, "r") as f:
+            baseline = json.load(f)
+
+    workdir = tempfile.mkdtemp(prefix="opc-bench-")
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        current = run_suite(args.sizes, args.cases, args.repeat, args.warmup, args.seed)
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    if save_path:
+        os.makedirs(os.path.dirname(save_path), exist_ok=True)
+        with open(save_path, "w") as f:
+            json.dump(current, f, indent=2)
+        print(f"Baseline saved to {save_path}")
+
+    if baseline is not None:
+        rows = compare(baseline, current, args.tolerance, args.min_delta)
+        print_comparison(rows)
+        regressions = [row["case"] for row in rows if row["status"] == "regression"]
+        if regressions:
+            print(f"{len(regressions)} regression(s): {', '.join(regressions)}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,22 @@
+import os
+import sys
+
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    # API client over a throw-away data directory (plannings, settings, caches)
+    from fastapi.testclient import TestClient
+    from app.main import app
+    from app.services.result_cache import result_cache
+
+    monkeypatch.chdir(tmp_path)
+    result_cache.clear()
+    with TestClient(app) as client:
+        yield client
+    result_cache.clear()
@@ -0,0 +1,17 @@
+from app.services.result_cache import result_cache
+from benchmarks.generator import generate_planning, planning_csv
+
+
+def test_option_1_details_in_employee_order_on_both_paths(client):
+    # Rows shuffled: employees appear out of ID order in the stored categories
+    source = generate_planning(500, seed=2).sample(frac=1, random_state=0)
+    response = client.post("/planning/upload", files={"file": ("planning.csv", planning_csv(source), "text/csv")})
+    planning_id = response.json()["planning_id"]
+
+    stored = client.post("/costs/calculate", json={"planning_id": planning_id}).json()
+    result_cache.clear()
+    inline = client.post("/costs/calculate", json={"planning_data": source.to_dict(orient="records")}).json()
+
+    employees = [row["Employee ID"] for row in stored["details_option_1"]]
+    assert employees == sorted(employees)
+    assert stored["details_option_1"] == inline["details_option_1"]
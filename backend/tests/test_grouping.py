@@ -0,0 +1,114 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.api.settings import VehicleType
+from app.services.grouping import VehicleTable, group_pickups, partition_order
+
+VEHICLE_SETS = [
+    [VehicleType(name="Berline", capacity=4, base_price=5000.0, zone_prices={1: 5000.0, 2: 7500.0, 3: 10000.0}),
+     VehicleType(name="Hiace", capacity=13, base_price=25000.0, zone_prices={1: 25000.0, 2: 35000.0, 3: 45000.0})],
+    [VehicleType(name="Van", capacity=7, base_price=12000.0, zone_prices={1: 11000.0}),
+     VehicleType(name="Hiace", capacity=5, base_price=20000.0, zone_prices={2: 26000.0})],
+    [],
+]
+
+
+def historical_groups(df: pd.DataFrame, window: float, vehicle_types, max_capacity: int) -> list:
+    # Row-by-row greedy loop of the original /optimization/analyze, run on
+    # one partition sorted by datetime (stable sort, as today)
+    df = df.sort_values(by="datetime", kind="stable")
+    groups = []
+    i = 0
+    while i < len(df):
+        start_time = df.iloc[i]["datetime"]
+        group_indices = [i]
+        j = i + 1
+        while j < len(df) and len(group_indices) < max_capacity:
+            time_diff = (df.iloc[j]["datetime"] - start_time).total_seconds() / 60.0
+            if time_diff <= window:
+                group_indices.append(j)
+                j += 1
+            else:
+                break
+        current_group = df.iloc[group_indices]
+        group_count = len(current_group)
+        sorted_vehicles = sorted(vehicle_types, key=lambda x: x.capacity)
+        selected_vehicle = next((v for v in sorted_vehicles if group_count <= v.capacity),
+                                sorted_vehicles[-1] if sorted_vehicles else None)
+        if selected_vehicle:
+            vehicle_name = selected_vehicle.name
+            max_zone = int(current_group["Zone_Int"].max())
+            cost = selected_vehicle.zone_prices.get(max_zone, selected_vehicle.base_price)
+            capacity = selected_vehicle.capacity
+        else:
+            vehicle_name, cost, capacity = "Inconnu", 0, group_count
+        groups.append((tuple(current_group["row"]), vehicle_name, float(cost), capacity,
+                       (group_count / capacity) * 100 if capacity > 0 else 0))
+        i = j
+    return groups
+
+
+def random_planning(rng: np.random.Generator, rows: int) -> pd.DataFrame:
+    # Pickups on a coarse grid (many tied timestamps), some without time
+    minutes = rng.integers(0, 90, rows) // 3 * 3
+    times = pd.Timestamp("2024-01-01 06:00") + pd.to_timedelta(minutes, unit="min")
+    times = times.where(rng.random(rows) > 0.05)
+    return pd.DataFrame({
+        "row": np.arange(rows),
+        "datetime": times,
+        "Zone_Int": rng.integers(1, 4, rows),
+        "Date": rng.choice(["2024-01-01", "2024-01-02"], rows),
+        "Dropoff Point": rng.choice(["Site 1", "Site 2", None], rows),
+    })
+
+
+def vectorized_groups(df: pd.DataFrame, window: float, vehicles: VehicleTable) -> list:
+    order, partitions = partition_order(df["datetime"].to_numpy(dtype="datetime64[ns]"),
+                                        [df["Date"], df["Dropoff Point"]])
+    df = df.iloc[order]
+    grouping = group_pickups(df["datetime"].to_numpy(dtype="datetime64[ns]"), df["Zone_Int"].to_numpy(),
+                             window, vehicles, partitions)
+    rows = df["row"].to_numpy()
+    return [(tuple(rows[start:start + count]), vehicles.names[v] if v >= 0 else "Inconnu", float(cost), int(capacity),
+             float(occupancy))
+            for start, count, v, cost, capacity, occupancy in zip(grouping.starts, grouping.counts, grouping.vehicle_idx,
+                                                                  grouping.cost, grouping.capacity, grouping.occupancy)]
+
+
+@pytest.mark.parametrize("seed", range(6))
+def test_vectorized_grouping_matches_historical_loop(seed):
+    rng = np.random.default_rng(seed)
+    df = random_planning(rng, int(rng.integers(50, 400)))
+    window = [0, 5, 20, 45][seed % 4]
+    vehicle_types = VEHICLE_SETS[seed % len(VEHICLE_SETS)]
+    max_capacity = int(rng.integers(2, 14))
+    vehicles = VehicleTable(vehicle_types, max_capacity)
+
+    expected = []
+    for _, partition in df.groupby(["Date", "Dropoff Point"], dropna=False, sort=False):
+        expected.extend(historical_groups(partition, window, vehicle_types, max_capacity))
+    actual = vectorized_groups(df, window, vehicles)
+
+    assert sorted(actual) == sorted(expected)
+    assert sum(g[2] for g in actual) == pytest.approx(sum(g[2] for g in expected))
+
+
+def test_tied_pickups_keep_input_order():
+    # Tied pickups are grouped in input order (stable sort). The original
+    # endpoint sorted with the default quicksort, whose tie order is
+    # unspecified: with a full vehicle the groups, and so the budget, could
+    # differ from the ones below.
+    df = pd.DataFrame({
+        "row": [0, 1, 2, 3],
+        "datetime": pd.to_datetime(["2024-01-01 07:00"] * 3 + ["2024-01-01 06:50"]),
+        "Zone_Int": [3, 1, 1, 2],
+        "Date": "2024-01-01",
+        "Dropoff Point": "Site 1",
+    })
+    vehicles = VehicleTable(VEHICLE_SETS[0], 2)
+
+    groups = vectorized_groups(df, 20, vehicles)
+
+    assert [g[0] for g in groups] == [(3, 0), (1, 2)]
+    assert [g[2] for g in groups] == [10000.0, 5000.0]
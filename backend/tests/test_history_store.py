@@ -0,0 +1,28 @@
+import json
+
+import pytest
+
+from app.services.history_store import HistoryStore
+
+
+def entry(entry_id: str, day: str) -> dict:
+    return {"id": entry_id, "date": day, "total_cost": 1000.0, "savings": 100.0,
+            "total_vehicles": 2, "total_employees": 8, "data_snapshot": {}}
+
+
+def test_failed_legacy_import_is_retried(tmp_path):
+    legacy = tmp_path / "history.json"
+    broken = entry("a", "2024-01-02")
+    del broken["total_cost"]
+    legacy.write_text(json.dumps([entry("b", "2024-01-01"), broken]))
+    store = HistoryStore(str(tmp_path / "history.db"), str(legacy))
+
+    with pytest.raises(KeyError):
+        store.append(entry("c", "2024-01-03"))
+    assert legacy.exists()
+
+    legacy.write_text(json.dumps([entry("b", "2024-01-01"), entry("a", "2024-01-02")]))
+    store.append(entry("c", "2024-01-03"))
+    entries, _ = store.list(10)
+    assert [e["id"] for e in entries] == ["c", "a", "b"]
+    assert not legacy.exists()
@@ -0,0 +1,29 @@
+from concurrent.futures import Future
+
+import pytest
+
+from app.services.jobs import Job, JobError
+from app.services.pdf_reports import pdf_reports
+
+PLANNING = [{"Employee ID": str(i), "Date": "2024-01-01", "Pickup Time": "07:00", "Dropoff Point": "Site 1", "Zone": 1}
+            for i in range(5)]
+
+
+def finished_job(error: Exception = None) -> Job:
+    future = Future()
+    if error is None:
+        future.cancel()
+    else:
+        future.set_exception(error)
+    return Job("job", future)
+
+
+@pytest.mark.parametrize("job, detail", [
+    (finished_job(JobError("planning introuvable")), "planning introuvable"),
+    (finished_job(), "rendu annulé"),
+])
+def test_failed_render_is_reported(client, monkeypatch, job, detail):
+    monkeypatch.setattr(pdf_reports, "render", lambda *args: job)
+    response = client.post("/dashboard/export/pdf", json=PLANNING)
+    assert response.status_code == 500
+    assert response.json()["detail"] == f"Erreur de génération du rapport : {detail}"
@@ -0,0 +1,65 @@
+import os
+
+import pytest
+
+from app.services import planning_store
+from app.services.planning_schema import FINGERPRINT_ATTR
+from benchmarks.generator import generate_planning, planning_csv
+
+
+def upload(client, csv: bytes) -> str:
+    response = client.post("/planning/upload", files={"file": ("planning.csv", csv, "text/csv")})
+    assert response.status_code == 200, response.text
+    return response.json()["planning_id"]
+
+
+def fingerprint(planning_id: str) -> str:
+    return planning_store.load_planning_meta(planning_id)[FINGERPRINT_ATTR]
+
+
+def test_delete_and_append_of_same_row_differ(client):
+    source = generate_planning(2000, seed=1)
+    # A row that appears once, so deleting it removes exactly that row
+    unique = source[~source.duplicated(keep=False)]
+    row = {column: str(value) for column, value in unique.iloc[0].items()}
+
+    csv = planning_csv(source)
+    deleted_id, appended_id = upload(client, csv), upload(client, csv)
+    assert fingerprint(deleted_id) == fingerprint(appended_id)
+
+    response = client.patch(f"/planning/{deleted_id}", json={"delete": [row]})
+    assert response.json()["row_count"] == 1999
+    response = client.patch(f"/planning/{appended_id}", json={"append": [row]})
+    assert response.json()["row_count"] == 2001
+
+    assert fingerprint(deleted_id) != fingerprint(appended_id)
+    # Fingerprint-keyed results are not shared between the two plannings
+    deleted_costs = client.post("/costs/calculate", json={"planning_id": deleted_id}).json()
+    appended_costs = client.post("/costs/calculate", json={"planning_id": appended_id}).json()
+    assert (deleted_costs["n_lines"], appended_costs["n_lines"]) == (1999, 2001)
+
+
+def test_compaction_switches_base_through_meta(client, monkeypatch):
+    # Second patch: two segments, above the limit, rewritten as one base file
+    monkeypatch.setattr(planning_store, "MAX_SEGMENTS", 1)
+    source = generate_planning(500, seed=2)
+    planning_id = upload(client, planning_csv(source))
+    row = {column: str(value) for column, value in source.iloc[0].items()}
+    client.patch(f"/planning/{planning_id}", json={"append": [row], "delete": [row]})
+    before = planning_store.load_planning_meta(planning_id)
+    assert before["segments"] and before["tombstones"]
+    response = client.patch(f"/planning/{planning_id}", json={"append": [row]})
+    assert response.json()["row_count"] == 501
+
+    meta = planning_store.load_planning_meta(planning_id)
+    assert meta["base"] == f"{planning_id}.base{meta['revision']}.arrow"
+    assert meta["segments"] == [] and "tombstones" not in meta
+    assert sorted(os.listdir(planning_store.PLANNING_DIR)) == sorted(
+        ["current.json", meta["base"], f"{planning_id}.json", f"{planning_id}.agg.pkl"])
+    assert planning_store.planning_exists(planning_id)
+    assert planning_store.read_planning_table(planning_id).num_rows == 501
+    # A reader of the previous meta finds its files gone and reads again,
+    # instead of combining the new base with the old segments
+    with pytest.raises(FileNotFoundError):
+        planning_store._stored_table(planning_id, before)
+    assert client.post("/costs/calculate", json={"planning_id": planning_id}).json()["n_lines"] == 501
@@ -0,0 +1,75 @@
+import os
+
+from app.api.planning import load_planning_frame, parse_planning_file
+from app.core.config import settings as config_settings
+from app.services import planning_reader, planning_store
+from benchmarks.generator import generate_planning
+
+
+def latin1_csv(rows: int) -> bytes:
+    # ASCII for well over the sniffed sample, one latin-1 byte in the last row
+    source = generate_planning(rows, seed=3, undefined_line_share=0)
+    source.loc[len(source) - 1, "Dropoff Point"] = "Thiès"
+    return source.to_csv(index=False, sep=";").encode("latin-1")
+
+
+def test_latin1_byte_after_the_sample(client, monkeypatch):
+    # Small blocks and chunks: several chunks are stored before the bad byte
+    monkeypatch.setattr(planning_reader, "CSV_BLOCK_SIZE", 16 * 1024)
+    monkeypatch.setattr(config_settings, "PLANNING_CHUNK_ROWS", 500)
+    content = latin1_csv(3000)
+    assert content[:64 * 1024].isascii() and not content.isascii()
+
+    response = client.post("/planning/upload", files={"file": ("planning.csv", content, "text/csv")})
+
+    assert response.status_code == 200, response.text
+    assert response.json()["row_count"] == 3000
+    df = load_planning_frame(response.json()["planning_id"], None)
+    assert len(df) == 3000
+    assert (df["Dropoff Point"] == "Thiès").sum() == 1
+    # The partial planning written before the fallback was discarded
+    stored = os.listdir(planning_store.PLANNING_DIR)
+    assert [name for name in stored if name.endswith((".arrow", ".tmp"))] == [f"{response.json()['planning_id']}.arrow"]
+
+
+def test_latin1_byte_after_the_sample_in_a_batch_file():
+    parsed = parse_planning_file("site.csv", latin1_csv(3000))
+
+    assert parsed.row_count == 3000
+    assert sum((table.column("Dropoff Point").to_pylist().count("Thiès") for table in parsed.tables)) == 1
+
+
+def short_rows_csv(rows: int, short: list) -> bytes:
+    # Rows listed in `short` lose their last two fields (no trailing separators)
+    lines = generate_planning(rows, seed=5, undefined_line_share=0).to_csv(index=False, sep=";").splitlines()
+    for i in short:
+        lines[i + 1] = ";".join(lines[i + 1].split(";")[:-2])
+    return ("\n".join(lines) + "\n").encode("utf-8")
+
+
+def test_short_rows_are_padded(client, monkeypatch):
+    # One short row in the first chunk, one after several stored chunks
+    monkeypatch.setattr(planning_reader, "CSV_BLOCK_SIZE", 16 * 1024)
+    monkeypatch.setattr(config_settings, "PLANNING_CHUNK_ROWS", 500)
+    content = short_rows_csv(3000, [10, 2600])
+    columns = content.decode().splitlines()[0].split(";")
+    response = client.post("/planning/upload", files={"file": ("planning.csv", content, "text/csv")})
+    assert response.status_code == 200, response.text
+    assert response.json()["row_count"] == 3000
+    df = load_planning_frame(response.json()["planning_id"], None)
+    assert len(df) == 3000
+    missing = df[columns[-1]].isna()
+    assert missing[[10, 2600]].all()
+    assert df[columns[-3]].notna()[[10, 2600]].all()
+
+
+def test_short_rows_in_a_batch_file():
+    parsed = parse_planning_file("site.csv", short_rows_csv(3000, [2600]))
+    assert parsed.row_count == 3000
+
+
+def test_rows_with_extra_fields_are_rejected(client):
+    content = b"Employee ID;Date\n1;2024-01-01\n2;2024-01-01;x\n"
+    response = client.post("/planning/upload", files={"file": ("planning.csv", content, "text/csv")})
+    assert response.status_code == 400
+    assert "Fichier CSV invalide" in response.json()["detail"]
@@ -0,0 +1,17 @@
+import numpy as np
+import pytest
+
+from app.api.settings import Settings
+from app.services.pricing import PricingTables
+
+
+def test_unknown_zones_pay_the_zone_1_forfait():
+    pricing = PricingTables(Settings())
+    assert pricing.forfait_costs([1, 3, 7, -1]).tolist() == [45000.0, 65000.0, 45000.0, 45000.0]
+
+
+def test_missing_zone_1_forfait_is_an_error():
+    pricing = PricingTables(Settings(option_1_forfait_prices={2: 55000.0, 3: 65000.0}))
+    with pytest.raises(KeyError):
+        pricing.forfait_costs([2, 7])
+    assert len(pricing.forfait_costs(np.empty(0, dtype=np.int8))) == 0
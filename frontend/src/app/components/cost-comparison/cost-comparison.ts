@@ -240,7 +240,7 @@ export class CostComparisonComponent {
   results: CostBreakdown | null = null;
   loading = false;
   selectedCoverage = 'ALLER_RETOUR';
-  hasData = computed(() => this.planningService.currentPlanning().length > 0);
+  hasData = computed(() => this.planningService.rowCount() > 0);
 
   constructor(
     private costsService: CostsService,
@@ -256,7 +256,7 @@ import { FormsModule } from '@angular/forms';
 })
 export class DashboardHomeComponent {
   analysis: CostBreakdown | null = null;
-  hasData = computed(() => this.planningService.currentPlanning().length > 0);
+  hasData = computed(() => this.planningService.rowCount() > 0);
   selectedCoverage = 'ALLER_RETOUR';
   @Output() goToUpload = new EventEmitter<void>();
 
@@ -298,7 +298,7 @@ export class DashboardHomeComponent {
       savings: this.analysis.savings,
       details: this.analysis,
       total_vehicles: this.analysis.best_option?.includes('Option 1') ? this.analysis.n_employees : this.analysis.n_lines,
-      total_employees: this.planningService.currentPlanning().length
+      total_employees: this.planningService.rowCount()
     };
     
     this.historyService.archive(archiveData).subscribe({
@@ -78,6 +78,11 @@ import { HistoryService, HistoryEntry } from '../../services/history.service';
           <tr mat-header-row *matHeaderRowDef="displayedColumns"></tr>
           <tr mat-row *matRowDef="let row; columns: displayedColumns;"></tr>
         </table>
+        <div class="load-more" *ngIf="nextCursor">
+          <button mat-button color="primary" (click)="loadMore()">
+            <mat-icon>expand_more</mat-icon> Charger plus
+          </button>
+        </div>
       </div>
 
       <ng-template #emptyState>
@@ -108,6 +113,7 @@ import { HistoryService, HistoryEntry } from '../../services/history.service';
 
     .table-container { border-radius: 12px; overflow: auto; background: var(--surface); border: 1px solid var(--border-color); }
     table { width: 100%; min-width: 600px; }
+    .load-more { display: flex; justify-content: center; padding: 12px; }
     
     .text-success { color: var(--success); font-weight: 600; }
     .font-bold { font-weight: 700; color: var(--text-main); }
@@ -131,17 +137,28 @@ import { HistoryService, HistoryEntry } from '../../services/history.service';
 })
 export class HistoryViewComponent implements OnInit {
   entries: HistoryEntry[] = [];
+  nextCursor: string | null = null;
   displayedColumns: string[] = ['date', 'vehicles', 'cost', 'savings', 'actions'];
 
   constructor(private historyService: HistoryService) {}
 
   ngOnInit() {
-    this.historyService.getHistory().subscribe(data => {
-      this.entries = data;
+    this.loadMore();
+  }
+
+  loadMore() {
+    this.historyService.getHistory(this.nextCursor).subscribe(page => {
+      this.entries = [...this.entries, ...page.entries];
+      this.nextCursor = page.next_cursor;
     });
   }
 
-  downloadProof(entry: HistoryEntry) {
+  downloadProof(summary: HistoryEntry) {
+    // The list has no snapshots: fetch the full archived entry
+    this.historyService.getEntry(summary.id).subscribe(entry => this.saveProof(entry));
+  }
+
+  private saveProof(entry: HistoryEntry) {
     const filename = `preuve_opti_${entry.date.split('T')[0]}_${entry.id}.json`;
     const blob = new Blob([JSON.stringify(entry, null, 2)], { type: 'application/json' });
     const url = window.URL.createObjectURL(blob);
@@ -233,7 +233,7 @@ export class OptimizationDashboardComponent {
   loading = false;
   windowMinutes = 20; 
   selectedCoverage = 'ALLER_RETOUR';
-  hasData = computed(() => this.planningService.currentPlanning().length > 0);
+  hasData = computed(() => this.planningService.rowCount() > 0);
 
 
   constructor(
@@ -258,7 +258,7 @@ export class OptimizationDashboardComponent {
       savings: 0, 
       details: this.results,
       total_vehicles: this.results.total_vehicles,
-      total_employees: this.planningService.currentPlanning().length
+      total_employees: this.planningService.rowCount()
     };
     
     this.historyService.archive(archiveData).subscribe({
@@ -224,7 +224,7 @@ export class UploadPlanning {
   uploading = false;
   
   previewData = computed(() => this.planningService.currentPlanning().slice(0, 50));
-  totalRows = computed(() => this.planningService.currentPlanning().length);
+  totalRows = computed(() => this.planningService.rowCount());
   
   displayedColumns: string[] = ["Employee ID", "Date", "Time", "Pickup Point", "Dropoff Point"];
   isDragging = false;
@@ -1,6 +1,7 @@
 import { Injectable } from '@angular/core';
 import { HttpClient } from '@angular/common/http';
 import { Observable } from 'rxjs';
+import { PlanningService } from './planning.service';
 
 export interface KPIDetail {
   cost_per_person_zone_1: number;
@@ -30,19 +31,63 @@ export interface CostBreakdown {
   details_option_2: any[];
 }
 
+export interface PricingScenario {
+  name: string;
+  option_1_forfait_prices?: Record<number, number>;
+  option_2_default_pickup_price?: number;
+  option_2_line_prices?: Record<string, number>;
+  vehicle_types?: { name: string; capacity: number; base_price: number; zone_prices: Record<number, number> }[];
+}
+
+export interface ScenarioResult {
+  rank: number;
+  name: string;
+  is_current: boolean;
+  option_1_contractual_total: number;
+  option_2_contractual_total: number;
+  best_option: string;
+  best_total: number;
+  savings: number;
+  delta_vs_current: number;
+  estimated_logistic_budget?: number | null;
+}
+
+export interface ScenarioComparison {
+  n_lines: number;
+  n_employees: number;
+  nb_jours_observes: number;
+  coverage_type: string;
+  is_extrapolated: boolean;
+  can_recommend: boolean;
+  scenarios: ScenarioResult[];
+}
+
 @Injectable({
   providedIn: 'root'
 })
 export class CostsService {
   private apiUrl = '/api/costs';
 
-  constructor(private http: HttpClient) {}
+  constructor(private http: HttpClient, private planningService: PlanningService) {}
 
   calculateCosts(planningData: any[], coverage?: string): Observable<CostBreakdown> {
+    // Reference the stored planning instead of re-posting every row when possible
+    const planningId = this.planningService.currentPlanningId();
     const payload = {
-      planning_data: planningData,
+      ...(planningId ? { planning_id: planningId } : { planning_data: planningData }),
       override_coverage: coverage
     };
     return this.http.post<CostBreakdown>(`${this.apiUrl}/calculate`, payload);
   }
+
+  compareScenarios(planningData: any[], scenarios: PricingScenario[], coverage?: string): Observable<ScenarioComparison> {
+    // Tariff proposals ranked against the current settings, in one request
+    const planningId = this.planningService.currentPlanningId();
+    const payload = {
+      ...(planningId ? { planning_id: planningId } : { planning_data: planningData }),
+      scenarios,
+      override_coverage: coverage
+    };
+    return this.http.post<ScenarioComparison>('/api/scenarios/compare', payload);
+  }
 }
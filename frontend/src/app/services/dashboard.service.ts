@@ -1,6 +1,7 @@
 import { Injectable } from '@angular/core';
 import { HttpClient } from '@angular/common/http';
 import { Observable } from 'rxjs';
+import { PlanningService } from './planning.service';
 
 export interface KPIDetail {
   cost_per_person_zone_1: number;
@@ -36,12 +37,13 @@ export interface CostBreakdown {
 export class DashboardService {
   private apiUrl = '/api'; // Pointing to main API for flexibility
 
-  constructor(private http: HttpClient) {}
+  constructor(private http: HttpClient, private planningService: PlanningService) {}
 
   // Renamed to match the strict logic
   getKpiAnalysis(planningData: any[], coverage?: string): Observable<CostBreakdown> {
+    const planningId = this.planningService.currentPlanningId();
     const payload = {
-      planning_data: planningData,
+      ...(planningId ? { planning_id: planningId } : { planning_data: planningData }),
       override_coverage: coverage
     };
     return this.http.post<CostBreakdown>(`${this.apiUrl}/costs/calculate`, payload);
@@ -49,6 +51,13 @@ export class DashboardService {
 
   // Kept for legacy if needed, or redirect to calculate
   exportReport(format: 'excel' | 'pdf', planningData: any[]) {
+    const planningId = this.planningService.currentPlanningId();
+    if (planningId) {
+      return this.http.post(`${this.apiUrl}/dashboard/export/${format}`, null, {
+        params: { planning_id: planningId },
+        responseType: 'blob'
+      });
+    }
     return this.http.post(`${this.apiUrl}/dashboard/export/${format}`, planningData, {
       responseType: 'blob'
     });
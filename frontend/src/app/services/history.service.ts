@@ -9,7 +9,22 @@ export interface HistoryEntry {
   savings: number;
   total_vehicles?: number;
   total_employees?: number;
-  data_snapshot: any;
+  data_snapshot?: any; // Only on single entries (getEntry)
+}
+
+export interface HistoryPage {
+  entries: HistoryEntry[];
+  next_cursor: string | null;
+}
+
+export interface HistoryStats {
+  period_start: string;
+  label: string;
+  entries: number;
+  total_cost: number;
+  savings: number;
+  total_vehicles: number;
+  total_employees: number;
 }
 
 export interface ArchiveRequest {
@@ -28,12 +43,22 @@ export class HistoryService {
 
   constructor(private http: HttpClient) {}
 
-  getHistory(): Observable<HistoryEntry[]> {
-    return this.http.get<HistoryEntry[]>(this.apiUrl);
+  getHistory(cursor?: string | null, limit = 50): Observable<HistoryPage> {
+    // Newest first; pass next_cursor back to load older entries
+    const params: any = { limit };
+    if (cursor) params.cursor = cursor;
+    return this.http.get<HistoryPage>(this.apiUrl, { params });
+  }
+
+  getEntry(id: string): Observable<HistoryEntry> {
+    return this.http.get<HistoryEntry>(`${this.apiUrl}/${id}`);
   }
 
-  getStats(): Observable<any> {
-    return this.http.get<any>(`${this.apiUrl}/stats`);
+  getStats(granularity: 'day' | 'week' | 'month' | 'quarter' = 'month', start?: string, end?: string): Observable<HistoryStats[]> {
+    const params: any = { granularity };
+    if (start) params.start = start;
+    if (end) params.end = end;
+    return this.http.get<HistoryStats[]>(`${this.apiUrl}/stats`, { params });
   }
 
   archive(data: ArchiveRequest): Observable<any> {
@@ -1,6 +1,7 @@
 import { Injectable } from '@angular/core';
 import { HttpClient } from '@angular/common/http';
 import { Observable } from 'rxjs';
+import { PlanningService } from './planning.service';
 
 export interface OptimizationResult {
   total_vehicles: number;
@@ -10,20 +11,62 @@ export interface OptimizationResult {
   details: any;
 }
 
+export interface WindowSweepPoint {
+  window_minutes: number;
+  total_vehicles: number;
+  avg_occupancy_rate: number;
+  estimated_logistic_budget: number;
+}
+
+export interface WindowSweepResult {
+  points: WindowSweepPoint[];
+}
+
+export interface GroupsPage {
+  groups: any[];
+  total_groups: number;
+  next_cursor: string | null;
+}
+
 @Injectable({
   providedIn: 'root'
 })
 export class OptimizationService {
   private apiUrl = '/api/optimization';
 
-  constructor(private http: HttpClient) {}
+  constructor(private http: HttpClient, private planningService: PlanningService) {}
 
   analyze(planningData: any[], windowMinutes: number | undefined, coverage?: string): Observable<OptimizationResult> {
+    // Reference the stored planning instead of re-posting every row when possible
+    const planningId = this.planningService.currentPlanningId();
     const payload = {
-      planning_data: planningData,
+      ...(planningId ? { planning_id: planningId } : { planning_data: planningData }),
       window_minutes: windowMinutes,
       override_coverage: coverage
     };
     return this.http.post<OptimizationResult>(`${this.apiUrl}/analyze`, payload);
   }
+
+  sweep(planningData: any[], windows: number[], coverage?: string): Observable<WindowSweepResult> {
+    // Cost / vehicle curve over several grouping windows in one request
+    const planningId = this.planningService.currentPlanningId();
+    const payload = {
+      ...(planningId ? { planning_id: planningId } : { planning_data: planningData }),
+      windows,
+      override_coverage: coverage
+    };
+    return this.http.post<WindowSweepResult>(`${this.apiUrl}/sweep`, payload);
+  }
+
+  groups(planningData: any[], windowMinutes: number | undefined, cursor?: string | null, limit = 500): Observable<GroupsPage> {
+    // One page of the simulation's groups; pass next_cursor to get the following one
+    const planningId = this.planningService.currentPlanningId();
+    const payload = {
+      ...(planningId ? { planning_id: planningId } : { planning_data: planningData }),
+      window_minutes: windowMinutes,
+      cursor,
+      limit
+    };
+    return this.http.post<GroupsPage>(`${this.apiUrl}/groups`, payload);
+  }
 }
@@ -1,38 +1,124 @@
 import { Injectable, signal } from '@angular/core';
-import { HttpClient } from '@angular/common/http';
+import { HttpClient, HttpParams } from '@angular/common/http';
 import { Observable, tap } from 'rxjs';
 
+export interface PlanningQuery {
+  limit?: number;
+  cursor?: string | null;
+  columns?: string[];
+  date?: string[];
+  zone?: string[];
+  dropoff?: string[];
+}
+
+export interface PlanningPage {
+  planning_id?: string;
+  columns?: string[];
+  rows: any[];
+  row_count: number;
+  matched_rows: number;
+  next_cursor: string | null;
+}
+
+// Rows are matched on column values, e.g. { 'Employee ID': 'E12' }
+export interface PlanningPatch {
+  append?: Record<string, any>[];
+  delete?: Record<string, any>[];
+  update?: { match: Record<string, any>; set: Record<string, any> }[];
+}
+
+export interface PlanningPatchResult {
+  planning_id: string;
+  row_count: number;
+  appended: number;
+  deleted: number;
+  updated: number;
+  revision: number;
+}
+
+export interface PlanningFileResult {
+  filename: string;
+  row_count: number;
+  mapped_columns: Record<string, string>;
+}
+
+export interface PlanningBatchResult {
+  planning_id: string;
+  row_count: number;
+  preview: any[];
+  files: PlanningFileResult[];
+}
+
+// Rows of the current planning fetched for the preview table
+const PREVIEW_ROWS = 50;
+
 @Injectable({
   providedIn: 'root'
 })
 export class PlanningService {
   private apiUrl = '/api/planning';
   
-  // Shared state for the uploaded planning
+  // Shared state for the uploaded planning: first page of rows (preview)
+  // and the total row count, the full planning stays on the server
   currentPlanning = signal<any[]>([]);
+  rowCount = signal(0);
+  // Server-side planning reference: compute endpoints load the rows from it
+  currentPlanningId = signal<string | null>(null);
 
   constructor(private http: HttpClient) {
     this.restoreState();
   }
 
   private restoreState() {
-    this.http.get<any>(`${this.apiUrl}/current`).subscribe({
+    this.http.get<any>(`${this.apiUrl}/current`, { params: { limit: PREVIEW_ROWS } }).subscribe({
       next: (res) => {
         if (res.rows && res.rows.length > 0) {
           this.currentPlanning.set(res.rows);
         }
+        this.rowCount.set(res.row_count ?? 0);
+        this.currentPlanningId.set(res.planning_id ?? null);
       }
     });
   }
 
+  getRows(query: PlanningQuery = {}): Observable<PlanningPage> {
+    // One page of the stored planning (projection / filters applied server-side)
+    let params = new HttpParams();
+    if (query.limit) params = params.set('limit', query.limit);
+    if (query.cursor) params = params.set('cursor', query.cursor);
+    if (query.columns?.length) params = params.set('columns', query.columns.join(','));
+    query.date?.forEach(value => params = params.append('date', value));
+    query.zone?.forEach(value => params = params.append('zone', value));
+    query.dropoff?.forEach(value => params = params.append('dropoff', value));
+    return this.http.get<PlanningPage>(`${this.apiUrl}/current`, { params });
+  }
+
+  patchPlanning(planningId: string, patch: PlanningPatch): Observable<PlanningPatchResult> {
+    // Rows added / removed / changed in place: costs and grouping are updated incrementally
+    return this.http.patch<PlanningPatchResult>(`${this.apiUrl}/${planningId}`, patch).pipe(
+      tap(() => this.restoreState())
+    );
+  }
+
   uploadPlanning(file: File): Observable<any> {
     const formData = new FormData();
     formData.append('file', file);
     return this.http.post(`${this.apiUrl}/upload`, formData).pipe(
       tap((res: any) => {
-        // Here we ideally want use the data returned by upload or re-fetch.
-        // Since the upload now returns a preview, but the server saves full data,
-        // let's re-fetch the full data to ensure the app has everything.
+        this.currentPlanningId.set(res.planning_id ?? null);
+        // Re-fetch the preview page and row count of the stored planning
+        this.restoreState();
+      })
+    );
+  }
+
+  uploadPlanningBatch(files: File[]): Observable<PlanningBatchResult> {
+    // One file per site, merged server-side into one planning (rows tagged with their file)
+    const formData = new FormData();
+    files.forEach(file => formData.append('files', file));
+    return this.http.post<PlanningBatchResult>(`${this.apiUrl}/upload/batch`, formData).pipe(
+      tap(res => {
+        this.currentPlanningId.set(res.planning_id ?? null);
         this.restoreState();
       })
     );